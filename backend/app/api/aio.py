@@ -0,0 +1,79 @@
+""" Asynchronous variants of the routes """
+import functools
+import inspect
+from collections.abc import Callable, Container
+
+from fastapi import APIRouter
+from fastapi.routing import APIRoute
+
+from app.api.deps import AsyncSessionDep, SessionDep
+from app.core.bridge import run_sync
+
+
+def async_endpoint(endpoint: Callable) -> Callable:
+    """
+    Turns a route taking a `SessionDep` into a coroutine taking an `AsyncSessionDep`.
+
+    The body of the route runs unchanged with `run_sync`, its queries suspend the coroutine
+    instead of blocking one of the threads of the threadpool.
+
+    Args:
+        endpoint (Callable): The synchronous route function.
+
+    Returns:
+        Callable: The coroutine function, with the same parameters and documentation.
+    """
+    signature = inspect.signature(endpoint)
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        return await run_sync(endpoint, **kwargs)
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        parameter.replace(annotation=AsyncSessionDep) if parameter.annotation == SessionDep else parameter
+        for parameter in signature.parameters.values()
+    ])
+    return wrapper
+
+
+def async_router(router: APIRouter, *, exclude: Container[str] = ()) -> APIRouter:
+    """
+    Copies a router, serving the routes that use the database session as coroutines.
+
+    Args:
+        router (APIRouter): The router of the synchronous routes.
+        exclude (Container[str]): Names of the routes kept synchronous.
+
+    Returns:
+        APIRouter: The router with the same paths and options.
+    """
+    aio_router = APIRouter()
+    for route in router.routes:
+        uses_session = isinstance(route, APIRoute) and any(
+            parameter.annotation == SessionDep
+            for parameter in inspect.signature(route.endpoint).parameters.values()
+        )
+        if not uses_session or route.name in exclude:
+            aio_router.routes.append(route)
+            continue
+
+        aio_router.add_api_route(
+            route.path,
+            async_endpoint(route.endpoint),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            response_description=route.response_description,
+            responses=route.responses,
+            deprecated=route.deprecated,
+            methods=route.methods,
+            operation_id=route.operation_id,
+            include_in_schema=route.include_in_schema,
+            response_class=route.response_class,
+            name=route.name,
+            route_class_override=type(route),
+        )
+    return aio_router
@@ -0,0 +1,181 @@
+""" Cached routes """
+import hashlib
+from collections.abc import Callable
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.dependencies.utils import get_flat_dependant, request_params_to_args
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from app.core.response_cache import response_cache
+
+
+class CacheControl:
+    """
+    Dependency setting the Cache-Control header of the responses of a router.
+
+    Given to `include_router`, e.g. ``dependencies=[Depends(CacheControl("no-cache"))]``.
+    FastAPI does not add it to the responses returned by the routes themselves, such as
+    `FastJSONResponse`, routers returning them must use `CachedRoute`, which does.
+    """
+
+    def __init__(self, policy: str):
+        self.policy = policy
+
+    async def __call__(self, response: Response) -> None:
+        response.headers["Cache-Control"] = self.policy
+
+
+def cache_response(*tags: str, validate: Callable | None = None) -> Callable:
+    """
+    Marks a route of a router using `CachedRoute` as cached.
+
+    Args:
+        tags (str): Tags the responses are cached under, formatted with the path parameters,
+            e.g. "book:{book_id}".
+        validate (Callable, optional): Checks the parameters the route validates itself, e.g. a
+            pagination cursor. Called with the validated parameters as keyword arguments, raises
+            ValueError when the route would reject them.
+
+    Returns:
+        Callable: The decorator, which returns the route unchanged.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__cache_tags__ = tags
+        endpoint.__cache_validate__ = validate
+        return endpoint
+    return decorator
+
+
+async def cache_key(request: Request) -> str:
+    """ Key of a request: its method, path, sorted query parameters and the digest of its body """
+    key = f"{request.method} {request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+    body = await request.body()
+    if body:
+        key += " " + hashlib.sha256(body).hexdigest()
+    return key
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """
+    Whether the validators of a conditional request still match the current response.
+
+    Args:
+        request (Request): The request, with its If-None-Match or If-Modified-Since header.
+        etag (str): The weak ETag of the current response.
+        last_modified (float): The last modification time of the current response.
+
+    Returns:
+        bool: True if the client copy is up to date.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, as the ETags are weak
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class CachedRoute(APIRoute):
+    """
+    Route answering from `response_cache` when its endpoint is marked with `cache_response`.
+
+    The path, query, header and cookie parameters are validated first, with the ``validate``
+    check of the route if any: invalid requests go straight to the route, which rejects them.
+    Then GET requests are validated against the versions of the tags, a client copy still up
+    to date is answered with a 304, and the cache is looked up. All of it happens before the
+    dependencies are solved, so neither checks a connection out of the pool nor runs the
+    route. Only successful JSON responses are cached. The `CacheControl` of the router is
+    sent with every response of its routes, cached or not.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        tags = getattr(self.endpoint, "__cache_tags__", None)
+        cache_control = next((
+            dependency.dependency.policy for dependency in self.dependencies
+            if isinstance(dependency.dependency, CacheControl)
+        ), None)
+
+        if tags is None:
+            if cache_control is None:
+                return handler
+
+            async def cache_control_handler(request: Request) -> Response:
+                response = await handler(request)
+                response.headers.setdefault("Cache-Control", cache_control)
+                return response
+
+            return cache_control_handler
+
+        dependant = get_flat_dependant(self.dependant, skip_repeats=True)
+        validate = getattr(self.endpoint, "__cache_validate__", None)
+
+        def is_valid(request: Request) -> bool:
+            values, errors = {}, []
+            for params, received in (
+                (dependant.path_params, request.path_params),
+                (dependant.query_params, request.query_params),
+                (dependant.header_params, request.headers),
+                (dependant.cookie_params, request.cookies),
+            ):
+                param_values, param_errors = request_params_to_args(params, received)
+                values.update(param_values)
+                errors.extend(param_errors)
+            if errors:
+                return False
+            if validate is not None:
+                try:
+                    validate(**values)
+                except ValueError:
+                    return False
+            return True
+
+        async def call(function, *args, **kwargs):
+            if response_cache.backend.blocking:
+                return await run_in_threadpool(function, *args, **kwargs)
+            return function(*args, **kwargs)
+
+        async def cached_handler(request: Request) -> Response:
+            if not is_valid(request):
+                return await handler(request)
+
+            request_tags = [tag.format(**request.path_params) for tag in tags]
+            headers = {"Cache-Control": cache_control} if cache_control else {}
+            if request.method == "GET" and response_cache.versions is not None:
+                # Computed before reading, a write made meanwhile gives the response a stale ETag,
+                # which is only revalidated again
+                etag, last_modified = response_cache.versions.validators(request_tags)
+                headers.update({"ETag": etag, "Last-Modified": formatdate(last_modified, usegmt=True)})
+                if is_not_modified(request, etag, last_modified):
+                    return Response(status_code=304, headers=headers)
+
+            if not response_cache.enabled:
+                response = await handler(request)
+                if response.status_code == 200:
+                    response.headers.update(headers)
+                return response
+
+            key = await cache_key(request)
+            body = await call(response_cache.get, key)
+            if body is not None:
+                return Response(body, media_type="application/json", headers={**headers, "X-Cache": "HIT"})
+
+            # A write committed while rendering invalidates the tags, the response is not cached
+            snapshot = response_cache.snapshot(request_tags)
+            response = await handler(request)
+            if response.status_code == 200 and response.media_type == "application/json":
+                await call(response_cache.set, key, response.body, tags=request_tags, snapshot=snapshot)
+                response.headers.update({**headers, "X-Cache": "MISS"})
+            return response
+
+        return cached_handler
@@ -1,17 +1,21 @@
 """ Authenticated related dependencies """
-from collections.abc import Generator
+import hashlib
+import time
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import ValidationError
 from mysql.connector import MySQLConnection
 
 from app.core import security
+from app.core.aiodb import BridgedConnection, get_async_pool
 from app.core.config import settings
-from app.core.db import get_db_connection
-from app.models import User, TokenPayload
+from app.core.db import get_pool
+from app.crud.user import token_user_cache
+from app.models import BookField, User, TokenPayload
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -19,24 +23,38 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 
 def get_db() -> Generator:
-    """ Get a db connection to the db and yield the session """
-    db_connection = get_db_connection()
-    print('DB connection established')
+    """ Check out a pooled db connection and yield it as the session """
+    with get_pool().connection() as db_connection:
+        yield db_connection
 
-    if db_connection.is_connected():
-        print('Successfully connected to db')
-        try:
-            yield db_connection
-        finally:
-            db_connection.close()
-            print('DB connection closed')
+
+async def get_async_db() -> AsyncGenerator:
+    """ Check out a connection from the asynchronous pool and yield it bridged as the session """
+    async with get_async_pool().connection() as db_connection:
+        yield BridgedConnection(db_connection)
 
 
 SessionDep = Annotated[MySQLConnection, Depends(get_db)]
+AsyncSessionDep = Annotated[BridgedConnection, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
+# Book fields a listing is restricted to, only those columns are read from the database
+BookFieldsQuery = Annotated[list[BookField] | None, Query()]
+
 
+def get_current_user(token: TokenDep) -> User:
+    """
+    Returns the user of the access token.
+
+    Verified tokens are cached by digest with their user until they expire, so following
+    requests skip the signature check and the user query, and check out no connection: one is
+    taken from the pool only on a cache miss. The entries of a user are dropped once its
+    update is committed.
+    """
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = token_user_cache.get(digest)
+    if cached is not None:
+        return cached[1]
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
@@ -48,15 +66,20 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
             detail="Could not validate credentials",
         )
 
-    cursor = session.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE id_user = %s", (token_data.sub,))
-    user = cursor.fetchone()
-    cursor.close()
+    with get_pool().connection() as session:
+        cursor = session.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM users WHERE id_user = %s", (token_data.sub,))
+        user = cursor.fetchone()
+        cursor.close()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if not user.is_active:
+    if not user.get("is_active", True):
         raise HTTPException(status_code=400, detail="Inactive user")
+
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_user_cache.set(digest, (token_data, user), ttl=expires_in)
     return user
 
 
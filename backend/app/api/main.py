@@ -1,12 +1,29 @@
 """ Main API routes definition """
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from app.api.routes import login, users, books, signup, mybooks, readbooks
+from app.api.aio import async_router
+from app.api.cache import CacheControl
+from app.api.routes import login, users, books, signup, mybooks, readbooks, monitoring
+from app.core.config import settings
+
+if settings.DB_ASYNC:
+    # The bulk import reads its upload and commits batches with blocking calls, it keeps its thread
+    books_router = async_router(books.router, exclude={"import_books"})
+    mybooks_router = async_router(mybooks.router)
+    readbooks_router = async_router(readbooks.router)
+else:
+    books_router, mybooks_router, readbooks_router = books.router, mybooks.router, readbooks.router
+
+# Cache-Control of the responses of each router. The catalog is public and revalidated with its
+# ETag on every use, the shelves are specific to a user
+catalog_cache = [Depends(CacheControl("public, no-cache"))]
+shelf_cache = [Depends(CacheControl("private, no-cache"))]
 
 api_router = APIRouter()
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(signup.router, tags=["signup"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
-api_router.include_router(books.router, prefix="/books", tags=["books"])
-api_router.include_router(mybooks.router, prefix="/mybooks", tags=["mybooks"])
-api_router.include_router(readbooks.router, prefix="/readbooks", tags=["readbooks"]) 
+api_router.include_router(books_router, prefix="/books", tags=["books"], dependencies=catalog_cache)
+api_router.include_router(mybooks_router, prefix="/mybooks", tags=["mybooks"], dependencies=shelf_cache)
+api_router.include_router(readbooks_router, prefix="/readbooks", tags=["readbooks"], dependencies=shelf_cache)
+api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"])
@@ -0,0 +1,32 @@
+""" Response classes """
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    """ Converts the values orjson does not know natively """
+    if isinstance(value, BaseModel):
+        # The fields of a model are kept in its __dict__, much faster to read than dict(model)
+        return value.__dict__
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson straight from the models returned by the CRUD methods.
+
+    A route returning it directly skips the validation against its ``response_model`` and
+    the ``jsonable_encoder`` pass, so it must only be used with models built from trusted
+    database rows. The ``response_model`` is still used to document the route. The models,
+    which must not be table models, are encoded field by field, without aliases or custom
+    serializers.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
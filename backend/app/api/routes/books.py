@@ -1,22 +1,39 @@
-from typing import Any
-from fastapi import APIRouter, HTTPException
+import io
+from typing import Annotated, Any, Literal
+from fastapi import APIRouter, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 import mysql.connector
 
-from app.models import BookCreate, BookOut, BooksOut, BookUpdate
+from app.models import BookCreate, BookImportOut, BookOut, BooksOut, BookUpdate, GenreBooksOut
 
-from app.api.deps import SessionDep
+from app.api.cache import CachedRoute, cache_response
+from app.api.deps import BookFieldsQuery, SessionDep
+from app.api.responses import FastJSONResponse
 from app import crud
+from app.core import book_export, book_import
+from app.core.config import settings
+from app.core.db import transaction
+from app.crud.pagination import decode_cursor
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
-@router.post("/filter-by-genres", response_model=BooksOut)
-def filter_books_by_genres(session: SessionDep, genres: list[str]) -> Any:
+@router.post("/filter-by-genres", response_model=GenreBooksOut)
+@cache_response("books")
+def filter_books_by_genres(
+        session: SessionDep,
+        genres: list[str],
+        skip: int = 0,
+        limit: int = 100,
+        fields: BookFieldsQuery = None) -> Any:
     """
-    Retrieve books that match any of the genres provided in the list.
+    Retrieve books that match any of the genres provided in the list, with how many of them have each genre.
+
+    Only the given `fields` of the books are returned, all of them by default.
     """
     try:
         cursor = session.cursor()
-        return crud.book.get_books_by_genres(cursor=cursor, genres=genres)
+        return FastJSONResponse(crud.book.get_books_by_genres(
+            cursor=cursor, genres=genres, skip=skip, limit=limit, fields=fields))
 
     except mysql.connector.Error as e:
         print(f"Error al conectar a MySQL: {e}")
@@ -27,12 +44,39 @@ def filter_books_by_genres(session: SessionDep, genres: list[str]) -> Any:
             cursor.close()
 
 
+@router.get("/export")
+def export_books(format: Literal["csv", "jsonl"] = "jsonl", gzip: bool = False) -> StreamingResponse:
+    """
+    Download the whole catalog as JSON Lines or CSV, optionally gzip-compressed.
+
+    Books are streamed in ID order as they are read from the database, in the format accepted by `/books/import`.
+    """
+    filename = f"books.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        book_export.stream_books(export_format=format, compress=gzip),
+        media_type="application/gzip" if gzip else book_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/{keyword}", response_model=BooksOut)
-def read_top5_matched_books(session: SessionDep, keyword: str) -> Any:
+def read_top5_matched_books(
+        session: SessionDep,
+        keyword: str,
+        skip: int = 0,
+        limit: int = 5,
+        include_count: bool = True,
+        fields: BookFieldsQuery = None) -> Any:
+    """
+    Search books by title, authors, editorial and synopsis, best matches first.
+
+    Only the given `fields` of the books are returned, all of them by default.
+    """
     try:
         cursor = session.cursor()
 
-        return crud.book.get_books_by_key(cursor=cursor, keyword=keyword)
+        return FastJSONResponse(crud.book.get_books_by_key(
+            cursor=cursor, keyword=keyword, skip=skip, limit=limit, include_count=include_count, fields=fields))
 
     except mysql.connector.Error as err:
         print(f"Error al conectar a MySQL: {err}")
@@ -43,15 +87,60 @@ def read_top5_matched_books(session: SessionDep, keyword: str) -> Any:
             cursor.close()
 
 
+@router.get("/complete/{prefix}", response_model=BooksOut)
+def read_book_completions(session: SessionDep, prefix: str, limit: int = 5, fields: BookFieldsQuery = None) -> Any:
+    """
+    Autocomplete book titles and authors, best rated first.
+
+    Only the given `fields` of the books are returned, by default the ID, title, authors, image and rating.
+    """
+    try:
+        cursor = session.cursor()
+
+        return FastJSONResponse(crud.book.get_book_completions(
+            cursor=cursor, prefix=prefix, limit=limit, fields=fields or crud.book.BOOK_CARD_FIELDS))
+
+    except mysql.connector.Error as e:
+        print(f"Error al conectar a MySQL: {e}")
+        raise HTTPException(status_code=500, detail="Error connecting to the database.")
+
+    finally:
+        if session.is_connected():
+            cursor.close()
+
+
+def check_page_cursor(*, sort: str, after: str | None, **_params) -> None:
+    """ Rejects an `after` cursor that is malformed or was issued for another sort order """
+    if after is not None:
+        decode_cursor(after, sort=sort)
+
+
 @router.get("/", response_model=BooksOut)
-def read_books(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+@cache_response("books", validate=check_page_cursor)
+def read_books(
+        session: SessionDep,
+        skip: int = 0,
+        limit: int = 100,
+        sort: Literal["id", "rating", "publication_date"] = "id",
+        after: str | None = None,
+        include_count: bool = True,
+        fields: BookFieldsQuery = None) -> Any:
     """
     Retrieve books with pagination.
+
+    Use the `next_cursor` of a page as `after` to get the following one without scanning the skipped books.
+    Set `include_count` to false when the total number of books is not needed.
+    Only the given `fields` of the books are returned, all of them by default.
     """
     try:
         cursor = session.cursor()
 
-        return crud.book.get_all_books(cursor=cursor, skip=skip, limit=limit)
+        return FastJSONResponse(crud.book.get_all_books(
+            cursor=cursor, skip=skip, limit=limit, sort=sort, after=after, include_count=include_count,
+            fields=fields))
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     except mysql.connector.Error as e:
         print(f"Error al conectar a MySQL: {e}")
@@ -63,6 +152,7 @@ def read_books(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
 
 
 @router.get("/book/{book_id}", response_model=BookOut)
+@cache_response("book", "book:{book_id}")
 def read_book(session: SessionDep, book_id: int) -> Any:
     """
     Retrieve a specific book by its ID.
@@ -109,8 +199,8 @@ def create_comment_rating(
             raise HTTPException(status_code=404, detail="User not found.")
 
         # Insertar comentario y calificación
-        crud.rating.create_rating(cursor=cursor, id=id, user_id=user_id, comment=comment, rating=rating)
-        session.commit()
+        with transaction(session):
+            crud.rating.create_rating(cursor=cursor, id=id, user_id=user_id, comment=comment, rating=rating)
 
         return {"message": "Comment and rating successfully added."}
 
@@ -123,6 +213,7 @@ def create_comment_rating(
             cursor.close()
 
 @router.get("/CommentRatingPerBook/{idBook}")
+@cache_response("ratings", "ratings:{idBook}")
 def get_comments_ratings(
         session: SessionDep,
         idBook: int):
@@ -178,11 +269,9 @@ def create_book(session: SessionDep, book_in: BookCreate) -> Any:
                 detail="The book with this title already exists in the system."
             )
 
-        book_out = crud.book.create_book(cursor=cursor, book_in=book_in)
-
         # Confirmar la transacción
-        session.commit()
-
+        with transaction(session):
+            book_out = crud.book.create_book(cursor=cursor, book_in=book_in)
 
         return book_out
 
@@ -195,6 +284,36 @@ def create_book(session: SessionDep, book_in: BookCreate) -> Any:
             cursor.close()
 
 
+@router.post("/import", response_model=BookImportOut)
+def import_books(
+        session: SessionDep,
+        file: UploadFile,
+        format: Literal["csv", "jsonl"] | None = None,
+        batch_size: Annotated[int, Query(gt=0, le=settings.BOOK_IMPORT_MAX_BATCH_SIZE)] = settings.BOOK_IMPORT_BATCH_SIZE) -> Any:
+    """
+    Import books in bulk from a CSV file with a header row or a JSON Lines file.
+
+    The format is taken from the file extension unless given. Rows are committed in batches of
+    `batch_size`, titles already in the catalog are skipped and invalid rows are reported.
+    """
+    try:
+        import_format = format or book_import.guess_format(file.filename)
+        lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+
+        return book_import.import_books(
+            connection=session,
+            rows=book_import.read_rows(lines, import_format=import_format),
+            batch_size=batch_size
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except mysql.connector.Error as e:
+        print(f"Error al conectar a MySQL: {e}")
+        raise HTTPException(status_code=500, detail="Error connecting to the database.")
+
+
 @router.put("/{book_id}", response_model=BookOut)
 def update_book(session: SessionDep, book_id: int, book_in: BookUpdate) -> Any:
     """
@@ -212,11 +331,9 @@ def update_book(session: SessionDep, book_id: int, book_in: BookUpdate) -> Any:
                 detail="Book not found with the provided id"
             )
 
-        # Actualizar el libro
-        updated_book_out = crud.book.update_book(cursor=cursor, book_id=book_id, book_in=book_in)
-
-        # Confirmar la transacción
-        session.commit()
+        # Actualizar el libro y confirmar la transacción
+        with transaction(session):
+            updated_book_out = crud.book.update_book(cursor=cursor, book_id=book_id, book_in=book_in)
 
         return updated_book_out
 
@@ -246,11 +363,9 @@ def delete_book(session: SessionDep, book_id: int) -> Any:
                 detail="Book not found with the provided id"
             )
 
-        # Eliminar el libro
-        crud.book.delete_book(cursor=cursor, book_id=book_id)
-
-        # Confirmar la transacción
-        session.commit()
+        # Eliminar el libro y confirmar la transacción
+        with transaction(session):
+            crud.book.delete_book(cursor=cursor, book_id=book_id)
 
         return {"message": "Book successfully deleted."}
 
@@ -270,25 +385,21 @@ def delete_comment(session: SessionDep, comment_id: int):
     try:
         cursor = session.cursor()
 
-        # Verificar que el comentario existe
-        result = crud.rating.get_rating_by_id(cursor=cursor, comment_id=comment_id)
+        # Verificar que el comentario existe y obtener el IdBook y la calificación
+        result = crud.rating.get_rated_book(cursor=cursor, comment_id=comment_id)
         if not result:
             raise HTTPException(status_code=404, detail="Comment not found.")
 
-        # Obtener el IdBook del comentario
-        id_book = result[0]
-
-        # Eliminar el comentario
-        crud.rating.delete_rating(cursor=cursor, comment_id=comment_id)
+        id_book, rating, id_user = result
 
-        # Recalcular el promedio de calificación
-        crud.rating.calculate_rating(cursor=cursor, book_id=id_book)
+        with transaction(session):
+            # Eliminar el comentario, solo quien lo elimina descuenta su calificación
+            if crud.rating.delete_rating(cursor=cursor, comment_id=comment_id, book_id=id_book) != 1:
+                raise HTTPException(status_code=404, detail="Comment not found.")
+            crud.stats.invalidate_user_stats(id_user)
 
-        # Actualizar el promedio en la tabla de libros
-        avg_rating = cursor.fetchone()[0] or 0
-        crud.book.update_avg(cursor=cursor, id_book=id_book, avg_rating=avg_rating)
-
-        session.commit()
+            # Descontar la calificación del promedio del libro
+            crud.rating.record_rating_delta(cursor=cursor, book_id=id_book, rating_sum=-rating, rating_count=-1)
         return {"message": "Comment successfully deleted."}
 
     except mysql.connector.Error as e:
@@ -304,7 +415,10 @@ def get_books_ratings_by_user(
         session: SessionDep,
         idUser: int,
         skip: int = 0,
-        limit: int = 100):
+        limit: int = 100,
+        sort: Literal["id", "rating", "publication_date"] = "id",
+        after: str | None = None,
+        fields: BookFieldsQuery = None):
     try:
         cursor = session.cursor()
 
@@ -313,33 +427,24 @@ def get_books_ratings_by_user(
             raise HTTPException(status_code=404, detail="User not found.")
 
         # Obtener los libros y calificaciones del usuario
-        rows = crud.rating.get_books_with_ratings_by_user(cursor=cursor, user_id=idUser, skip=skip, limit=limit)
+        try:
+            rows = crud.rating.get_books_with_ratings_by_user(
+                cursor=cursor, user_id=idUser, skip=skip, limit=limit, sort=sort, after=after, fields=fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         if not rows:
             return {"message": "No ratings found for this user."}
 
         # Crear lista de respuestas
         books_data = [
-            {
-                "book": {
-                    "id_book": row["book"]["id_book"],
-                    "title": row["book"]["title"],
-                    "authors": row["book"]["authors"],
-                    "synopsis": row["book"]["synopsis"],
-                    "buy_link": row["book"]["buy_link"],
-                    "genres": row["book"]["genres"],
-                    "rating": float(row["book"]["rating"]) if row["book"]["rating"] else None,
-                    "editorial": row["book"]["editorial"],
-                    "comments": row["book"]["comments"],
-                    "publication_date": row["book"]["publication_date"],
-                    "image": row["book"]["image"]
-                },
-                "user_rating": row["user_rating"] if row["user_rating"] else None
-            }
+            {"book": row["book"], "user_rating": row["user_rating"] if row["user_rating"] else None}
             for row in rows['data']
         ]
 
-        return {"data": books_data, "count": len(books_data)}
+        return FastJSONResponse({"data": books_data, "count": len(books_data), "next_cursor": rows["next_cursor"]})
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,8 +1,9 @@
 """ Login related routes """
+import time
 from datetime import timedelta
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -10,6 +11,9 @@ from app import crud
 from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
 from app.core import security
 from app.core.config import settings
+from app.core.db import transaction
+from app.core.hashing import HashingBusyError, password_hasher
+from app.core.metrics import PhaseTimer
 from app.core.security import get_password_hash
 from app.models import Message, NewPassword, Token, UserOut
 from app.utils import (
@@ -19,62 +23,74 @@ from app.utils import (
     verify_password_reset_token,
 )
 import mysql.connector
-import bcrypt
 
 router = APIRouter()
-host = settings.HOST
-user = settings.USERDB
-password = settings.PASSWORD
-database = settings.DATABASE
+
+# Outcomes and phase durations of the logins, served by the monitoring routes
+login_metrics = PhaseTimer()
 
 
 @router.post("/login", response_model=Token)
-def login_user(*, email: str, pswd_input: str) -> Any:
+def login_user(*, session: SessionDep, response: Response, email: str, pswd_input: str) -> Any:
     """
     Login a user by email and password.
+
+    The time spent looking up the user, checking the password, storing a rehashed password
+    and signing the token is returned in the Server-Timing header.
     """
+    start = time.perf_counter()
+    phases: dict[str, float] = {}
+    outcome = "error"
+    cursor = session.cursor()
     try:
-        # Conexión a la base de datos
-        conexion = mysql.connector.connect(
-            host=host,
-            user=user,
-            password=password,
-            database=database,
-            port=3306
-        )
-
-        if conexion.is_connected():
-            print("Conexión exitosa a la base de datos")
-            cursor = conexion.cursor()
-
-            # Consulta para obtener el hash de la contraseña del usuario por email
-            query_user = "SELECT id_user, name, surname, username, email, password FROM users WHERE email = %s"
-            cursor.execute(query_user, (email,))
-            user_row = cursor.fetchone()
-
-            if not user_row:
-                raise HTTPException(
-                    status_code=404,
-                    detail="User not found with the provided email",
-                )
-
-            # Extraer el hash almacenado y verificar la contraseña ingresada
-            stored_hashed_password = user_row[5].encode('utf-8')
+        # Obtener el id y el hash de la contraseña del usuario por email
+        credentials = crud.user.get_login_credentials(cursor=cursor, email=email)
+        phases["lookup"] = time.perf_counter() - start
+
+        if credentials is None:
+            outcome = "unknown_email"
+            raise HTTPException(
+                status_code=404,
+                detail="User not found with the provided email",
+            )
+        user_id, stored_hashed_password = credentials
+
+        # Verificar la contraseña ingresada contra el hash almacenado
+        mark = time.perf_counter()
+        matches, new_hashed_password = password_hasher.verify_and_update(pswd_input, stored_hashed_password)
+        phases["verify"] = time.perf_counter() - mark
+        if not matches:
+            outcome = "wrong_password"
+            raise HTTPException(
+                status_code=400,
+                detail="Incorrect password.",
+            )
 
-            # Verificar la contraseña ingresada contra el hash almacenado
-            if not bcrypt.checkpw(pswd_input.encode('utf-8'), stored_hashed_password):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Incorrect password.",
+        # Guardar el hash con el coste de bcrypt actual si se creó con otro
+        if new_hashed_password:
+            mark = time.perf_counter()
+            with transaction(session):
+                crud.user.update_password_hash(
+                    cursor=cursor, user_id=user_id, hashed_password=new_hashed_password
                 )
+            phases["rehash"] = time.perf_counter() - mark
 
-            print("Inicio de sesión exitoso")
-            access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-            return Token(
-                access_token=security.create_access_token(
-                    user_row[0], expires_delta=access_token_expires
-                )
+        mark = time.perf_counter()
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        token = Token(
+            access_token=security.create_access_token(
+                user_id, expires_delta=access_token_expires
             )
+        )
+        phases["token"] = time.perf_counter() - mark
+        outcome = "success"
+        return token
+
+    except HTTPException:
+        raise
+    except HashingBusyError:
+        outcome = "busy"
+        raise
     except mysql.connector.Error as e:
         print(f"Error al conectar a MySQL: {e}")
         raise HTTPException(status_code=500, detail="Error connecting to the database.")
@@ -83,10 +99,13 @@ def login_user(*, email: str, pswd_input: str) -> Any:
         raise HTTPException(status_code=400, detail=str(ex))
 
     finally:
-        if conexion.is_connected():
+        phases["total"] = time.perf_counter() - start
+        login_metrics.record(outcome, phases)
+        response.headers["Server-Timing"] = ", ".join(
+            f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in phases.items()
+        )
+        if session.is_connected():
             cursor.close()
-            conexion.close()
-            print("Conexión cerrada")
 
 
 @router.post("/login/access-token")
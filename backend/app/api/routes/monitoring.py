@@ -0,0 +1,97 @@
+""" Monitoring routes """
+from typing import Any
+from fastapi import APIRouter
+
+from app.api.routes.login import login_metrics
+from app.core.aiodb import get_async_pool
+from app.core.db import get_pool
+from app.core.hashing import password_hasher
+from app.core.outbox import email_outbox
+from app.core.response_cache import response_cache
+from app.core.singleflight import crud_reads
+from app.crud.rating import rating_aggregator
+from app.crud.user import login_cache
+from app.models import (
+    DeadLetter,
+    EmailOutboxStats,
+    LoginStats,
+    Message,
+    PasswordHashingStats,
+    PoolStats,
+    RatingQueueStats,
+    ResponseCacheStats,
+    SingleFlightStats
+)
+
+router = APIRouter()
+
+@router.get("/db-pool", response_model=PoolStats)
+def read_db_pool_stats() -> Any:
+    """
+    Retrieve the usage statistics of the database connection pool.
+    """
+    return get_pool().stats()
+
+@router.get("/async-db-pool", response_model=PoolStats)
+def read_async_db_pool_stats() -> Any:
+    """
+    Retrieve the usage statistics of the asynchronous database pool used when `DB_ASYNC` is set.
+    """
+    return get_async_pool().stats()
+
+@router.get("/response-cache", response_model=ResponseCacheStats)
+def read_response_cache_stats() -> Any:
+    """
+    Retrieve the hits, misses and invalidations of the catalog response cache.
+    """
+    return response_cache.stats()
+
+@router.get("/single-flight", response_model=SingleFlightStats)
+def read_single_flight_stats() -> Any:
+    """
+    Retrieve how many catalog queries were shared between identical concurrent calls.
+    """
+    return crud_reads.stats()
+
+@router.get("/rating-queue", response_model=RatingQueueStats)
+def read_rating_queue_stats() -> Any:
+    """
+    Retrieve the state of the write-behind rating queue, including the lag of the oldest pending update.
+    """
+    return rating_aggregator.stats()
+
+@router.get("/password-hashing", response_model=PasswordHashingStats)
+def read_password_hashing_stats() -> Any:
+    """
+    Retrieve the state of the password hashing pool, including queue wait and hashing times.
+    """
+    return password_hasher.stats()
+
+@router.get("/login", response_model=LoginStats)
+def read_login_stats() -> Any:
+    """
+    Retrieve the outcomes of the logins and the time spent in each of their phases.
+    """
+    return {**login_metrics.stats(), "cache": login_cache.stats()}
+
+@router.get("/email-outbox", response_model=EmailOutboxStats)
+def read_email_outbox_stats() -> Any:
+    """
+    Retrieve the state of the email outbox.
+    """
+    return email_outbox.stats()
+
+@router.get("/email-outbox/dead-letters", response_model=list[DeadLetter])
+def read_email_dead_letters() -> Any:
+    """
+    Retrieve the emails that could not be sent after every retry.
+    """
+    return email_outbox.dead_letters()
+
+@router.post("/email-outbox/dead-letters/retry", response_model=Message)
+def retry_email_dead_letters() -> Any:
+    """
+    Queue the emails that could not be sent again.
+    """
+    count = email_outbox.retry_dead_letters()
+    return Message(message=f"{count} emails queued again")
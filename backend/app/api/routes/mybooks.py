@@ -3,10 +3,13 @@ from fastapi import APIRouter, HTTPException
 import mysql.connector
 
 from app.models import MyBookCreate, MyBookOut, MyBooksOut, BooksOut
-from app.api.deps import SessionDep
+from app.api.cache import CachedRoute
+from app.api.deps import BookFieldsQuery, SessionDep
+from app.api.responses import FastJSONResponse
+from app.core.db import transaction
 from app import crud
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 @router.post("/mybooks", response_model=MyBookOut)
 def create_mybook(session: SessionDep, mybook_in: MyBookCreate) -> Any:
@@ -15,8 +18,8 @@ def create_mybook(session: SessionDep, mybook_in: MyBookCreate) -> Any:
     """
     try:
         cursor = session.cursor()
-        mybook_out = crud.mybooks.create_mybook(cursor=cursor, mybook_in=mybook_in)
-        session.commit()
+        with transaction(session):
+            mybook_out = crud.mybooks.create_mybook(cursor=cursor, mybook_in=mybook_in)
 
         return mybook_out
 
@@ -35,12 +38,12 @@ def delete_user_book(session: SessionDep, id_user: int, id_book: int) -> Any:
     """
     try:
         cursor = session.cursor()
-        success = crud.mybooks.delete_user_book(cursor=cursor, id_user=id_user, id_book=id_book)
-        
-        if not success:
-            raise HTTPException(status_code=404, detail="Entry not found")
+        with transaction(session):
+            success = crud.mybooks.delete_user_book(cursor=cursor, id_user=id_user, id_book=id_book)
+
+            if not success:
+                raise HTTPException(status_code=404, detail="Entry not found")
 
-        session.commit()
         return success
 
     except mysql.connector.Error as e:
@@ -52,30 +55,23 @@ def delete_user_book(session: SessionDep, id_user: int, id_book: int) -> Any:
             cursor.close()
 
 @router.get("/{id_user}", response_model=BooksOut)
-def get_mybooks(session: SessionDep, id_user: int) -> Any:
+def get_mybooks(
+        session: SessionDep, id_user: int, skip: int = 0, limit: int = 100,
+        fields: BookFieldsQuery = None) -> Any:
     """
-    Get all books entry for a user based on user_id from the 'mybooks' table.
+    Get the books saved by a user in the 'mybooks' table, with pagination.
+
+    Only the given `fields` of the books are returned, all of them by default.
     """
     try:
         cursor = session.cursor()
-        mybook_out = crud.mybooks.get_mybooks(cursor=cursor, id_user=id_user)
-        
-        if not mybook_out:
-            raise HTTPException(status_code=404, detail="Entry not found")
-
-        # Inicializar una lista para los libros
-        books_data = []
+        books_out = crud.mybooks.get_mybooks_books(
+            cursor=cursor, id_user=id_user, skip=skip, limit=limit, fields=fields)
 
-        # Obtener información de cada libro utilizando id_book de mybook_out
-        for mybook in mybook_out.data:
-            book_details = crud.book.get_book_by_id(cursor=cursor, book_id=mybook.id_book)
-            if book_details:
-                books_data.append(book_details)
-            else:
-                print(f"Book with id {mybook.id_book} not found.")
+        if not books_out.count:
+            raise HTTPException(status_code=404, detail="Entry not found")
 
-        # Crear y devolver la respuesta BooksOut con los libros obtenidos
-        return BooksOut(data=books_data, count=len(books_data))
+        return FastJSONResponse(books_out)
 
     except mysql.connector.Error as e:
         print(f"Error connecting to MySQL: {e}")
@@ -1,13 +1,16 @@
-from typing import Any, List
+from typing import Any
 from fastapi import APIRouter, HTTPException
 import mysql.connector
 
-from app.models import ReadBookCreate, ReadBookOut, BookOut
+from app.models import ReadBookCreate, ReadBookOut, BooksOut
 
-from app.api.deps import SessionDep
+from app.api.cache import CachedRoute
+from app.api.deps import BookFieldsQuery, SessionDep
+from app.api.responses import FastJSONResponse
+from app.core.db import transaction
 from app import crud
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 @router.post("/readbooks", response_model=ReadBookOut)
@@ -23,8 +26,8 @@ def create_readbook(session: SessionDep, readbook_in: ReadBookCreate) -> Any:
                 status_code=400,
                 detail="The book is already marked as read for this user."
             )
-        readbook_out = crud.readbooks.create_readbook(cursor=cursor, readbook_in=readbook_in)
-        session.commit()
+        with transaction(session):
+            readbook_out = crud.readbooks.create_readbook(cursor=cursor, readbook_in=readbook_in)
 
         return readbook_out
 
@@ -44,12 +47,12 @@ def delete_user_readbook(session: SessionDep, id_user: int, id_book: int) -> Any
     """
     try:
         cursor = session.cursor()
-        success = crud.readbooks.delete_user_readbook(cursor=cursor, id_user=id_user, id_book=id_book)
+        with transaction(session):
+            success = crud.readbooks.delete_user_readbook(cursor=cursor, id_user=id_user, id_book=id_book)
 
-        if not success:
-            raise HTTPException(status_code=404, detail="Entry not found")
+            if not success:
+                raise HTTPException(status_code=404, detail="Entry not found")
 
-        session.commit()
         return success
 
     except mysql.connector.Error as e:
@@ -60,25 +63,42 @@ def delete_user_readbook(session: SessionDep, id_user: int, id_book: int) -> Any
         if session.is_connected():
             cursor.close()
 
-@router.get("/{id_user}", response_model=List[BookOut])
-def get_readbook(session: SessionDep, id_user: int) -> Any:
+@router.get("/{id_user}/{id_book}", response_model=bool)
+def is_readbook(session: SessionDep, id_user: int, id_book: int) -> Any:
     """
-    Get a book entry for a user based on user_id and book_id from the 'readbooks' table.
+    Check whether a user marked a book as read, without listing the books.
     """
     try:
         cursor = session.cursor()
-        readbook_out = crud.readbooks.get_readbook(cursor=cursor, id_user=id_user)
+        return crud.readbooks.check_readbook_exists(
+            cursor=cursor, readbook_in=ReadBookCreate(id_user=id_user, id_book=id_book))
 
-        if not readbook_out:
-            raise HTTPException(status_code=404, detail="Entry not found")
+    except mysql.connector.Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        raise HTTPException(status_code=500, detail="Error connecting to the database.")
+
+    finally:
+        if session.is_connected():
+            cursor.close()
+
+@router.get("/{id_user}", response_model=BooksOut)
+def get_readbook(
+        session: SessionDep, id_user: int, skip: int = 0, limit: int = 100,
+        fields: BookFieldsQuery = None) -> Any:
+    """
+    Get the books marked as read by a user in the 'readbooks' table, with pagination.
+
+    Only the given `fields` of the books are returned, by default the ID, title, authors, image and rating.
+    """
+    try:
+        cursor = session.cursor()
+        books_out = crud.readbooks.get_readbooks_books(
+            cursor=cursor, id_user=id_user, skip=skip, limit=limit, fields=fields or crud.book.BOOK_CARD_FIELDS)
 
-        books_out = []
-        for readbook in readbook_out:
-            book_details = crud.book.get_book_by_id(cursor=cursor, book_id=readbook.id_book)
-            if book_details:
-                books_out.append(book_details)
+        if not books_out.count:
+            raise HTTPException(status_code=404, detail="Entry not found")
 
-        return books_out
+        return FastJSONResponse(books_out)
 
     except mysql.connector.Error as e:
         print(f"Error connecting to MySQL: {e}")
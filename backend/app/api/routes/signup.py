@@ -1,8 +1,11 @@
 """ SignUp related routes """
 from fastapi import APIRouter, HTTPException
 import mysql.connector
-import bcrypt
+from app import crud
 from app.api.deps import SessionDep
+from app.core.hashing import HashingBusyError, password_hasher
+from app.crud.counts import count_cache
+from app.core.typeahead import user_typeahead
 from app.models import UserCreate, UserOut
 from typing import Any
 
@@ -28,7 +31,7 @@ def signup_user(*, session: SessionDep, user_in: UserCreate) -> Any:
             )
 
         # Hash the password
-        hashed_password = bcrypt.hashpw(user_in.password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = password_hasher.hash(user_in.password)
         # Insert the new user into the database
         insert_user_query = """
         INSERT INTO users (name, surname, username, email, password) 
@@ -42,9 +45,12 @@ def signup_user(*, session: SessionDep, user_in: UserCreate) -> Any:
             hashed_password,
         ))
         session.commit()  # Commit the transaction
+        count_cache.adjust("users", 1)
+        crud.user.forget_login_credentials(email=user_in.email)
 
         # Get the id of the new user
         new_user_id = cursor.lastrowid
+        user_typeahead.add(new_user_id, [f"{user_in.name} {user_in.surname or ''}", user_in.username])
 
         # Return the created user object
         user_out = UserOut(
@@ -61,6 +67,8 @@ def signup_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     except mysql.connector.Error as e:
         print(f"Error al conectar a MySQL: {e}")
         raise HTTPException(status_code=500, detail="Error connecting to the database.")
+    except HashingBusyError:
+        raise
     except Exception as ex:
         print(f"Error al crear el usuario: {ex}")
         raise HTTPException(status_code=400, detail=str(ex))
@@ -1,24 +1,30 @@
 """ User management routes """
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
 import mysql.connector
-import bcrypt
 
-from app.api.deps import SessionDep
+from app.api.deps import BookFieldsQuery, SessionDep
+from app.api.responses import FastJSONResponse
+from app.core import profile
+from app.core.db import transaction
+from app.core.hashing import HashingBusyError
 from app.models import (
+    ProfileSection,
     UserCreate,
     UserOut,
     UsersOut,
-    UserUpdate
+    UserUpdate,
+    UserProfileOut,
+    UserStats
 )
 from app import crud
 
 router = APIRouter()
 
 @router.get("/{keyword}", response_model=UsersOut)
-def read_top5_matched_users(session: SessionDep, keyword: str) -> Any:
+def read_top5_matched_users(session: SessionDep, keyword: str, include_count: bool = True) -> Any:
     """
     Retrieve matched users by the keyword.
     """
@@ -26,7 +32,8 @@ def read_top5_matched_users(session: SessionDep, keyword: str) -> Any:
         # Conexión a la base de datos
         cursor = session.cursor()
 
-        return crud.user.read_top5_matched_users(cursor=cursor, keyword=keyword)
+        return FastJSONResponse(
+            crud.user.read_top5_matched_users(cursor=cursor, keyword=keyword, include_count=include_count))
 
     except mysql.connector.Error as err:
         print(f"Error al conectar a MySQL: {err}")
@@ -68,6 +75,52 @@ def read_user(session: SessionDep, user_id: int) -> Any:
         if session.is_connected():
             cursor.close()
 
+@router.get("/{user_id}/stats", response_model=UserStats)
+def read_user_stats(session: SessionDep, user_id: int) -> Any:
+    """
+    Retrieve the rating and genre statistics of a user.
+    """
+    try:
+        cursor = session.cursor()
+
+        # Verificar que el usuario existe
+        if not crud.user.get_user_by_id(cursor=cursor, user_id=user_id):
+            raise HTTPException(status_code=404, detail="User not found with the provided id")
+
+        return crud.stats.get_user_stats(cursor=cursor, user_id=user_id)
+
+    except mysql.connector.Error as e:
+        print(f"Error al conectar a MySQL: {e}")
+        raise HTTPException(status_code=500, detail="Error connecting to the database.")
+    finally:
+        if session.is_connected():
+            cursor.close()
+
+@router.get("/{user_id}/profile", response_model=UserProfileOut)
+def read_user_profile(
+        user_id: int,
+        sections: Annotated[list[ProfileSection] | None, Query()] = None,
+        limit: int = 20,
+        fields: BookFieldsQuery = None) -> Any:
+    """
+    Retrieve a user with its saved books, read books, rated books and statistics in one response.
+
+    The `sections` are queried concurrently, all of them by default. Every list returns up to `limit` books
+    and only the given `fields` of the books, as the separate endpoints do.
+    """
+    try:
+        user_profile = profile.get_user_profile(
+            user_id=user_id, sections=sections or profile.PROFILE_SECTIONS, limit=limit, fields=fields)
+
+    except mysql.connector.Error as e:
+        print(f"Error al conectar a MySQL: {e}")
+        raise HTTPException(status_code=500, detail="Error connecting to the database.")
+
+    if user_profile is None:
+        raise HTTPException(status_code=404, detail="User not found with the provided id")
+
+    return FastJSONResponse(user_profile)
+
 @router.get("/by-email/{user_mail}", response_model=UserOut)
 def read_user_by_email(session: SessionDep, user_mail: str) -> Any:
     """
@@ -106,14 +159,15 @@ def read_user_by_email(session: SessionDep, user_mail: str) -> Any:
             cursor.close()
 
 @router.get("/")
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(session: SessionDep, skip: int = 0, limit: int = 100, include_count: bool = True) -> Any:
     """
     Retrieve users.
     """
     try:
         cursor = session.cursor()
 
-        return crud.user.read_users(cursor=cursor, skip=skip, limit=limit)
+        return FastJSONResponse(
+            crud.user.read_users(cursor=cursor, skip=skip, limit=limit, include_count=include_count))
 
     except mysql.connector.Error as e:
         print(f"Error al conectar a MySQL: {e}")
@@ -143,21 +197,22 @@ def update_user_fields(
                 detail="User not found with the provided ID",
             )
 
-        update_fields = crud.user.update_user(cursor=cursor, user_id=user_id, user_in=user_in)
+        with transaction(session):
+            update_fields = crud.user.update_user(cursor=cursor, user_id=user_id, user_in=user_in)
 
-        if not update_fields:
-            raise HTTPException(
-                status_code=400,
-                detail="No fields provided for update",
-            )
-
-        session.commit()
+            if not update_fields:
+                raise HTTPException(
+                    status_code=400,
+                    detail="No fields provided for update",
+                )
 
         return {"message": "User updated successfully"}
 
     except mysql.connector.Error as e:
         print(f"Error al conectar a MySQL: {e}")
         raise HTTPException(status_code=500, detail="Error connecting to the database.")
+    except HashingBusyError:
+        raise
     except Exception as ex:
         print(f"Error inesperado: {ex}")
         raise HTTPException(status_code=400, detail=str(ex))
@@ -186,10 +241,9 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
                 detail="The user with this email already exists in the system.",
             )
 
-        crud.user.create_user(cursor=cursor, user_in=user_in)
-
         # Confirmar la transacción
-        session.commit()
+        with transaction(session):
+            crud.user.create_user(cursor=cursor, user_in=user_in)
 
         # Obtener el ID del usuario recién creado
         new_user_id = cursor.lastrowid
@@ -0,0 +1,313 @@
+""" Asynchronous database access """
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import mysql.connector
+from mysql.connector import aio
+from app.core.bridge import await_only
+from app.core.config import settings
+from app.core.db import PoolTimeoutError
+
+
+async def get_async_db_connection():
+    """ Opens an asynchronous connection to the production database """
+    return await aio.connect(
+        host=settings.HOST,
+        user=settings.USERDB,
+        password=settings.PASSWORD,
+        database=settings.DATABASE,
+        port=3306,
+    )
+
+
+class AsyncConnectionPool:
+    """
+    Pool of asynchronous MySQL connections, shared by the coroutines of an event loop.
+
+    Behaves like `ConnectionPool`: up to ``size`` idle connections are kept, ``max_overflow``
+    extra ones are allowed under load, connections older than ``recycle`` seconds are replaced
+    and ``pre_ping`` checks them before handing them out. Waiting for a connection suspends
+    the coroutine instead of blocking a thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        creator=get_async_db_connection,
+        size: int = 20,
+        max_overflow: int = 80,
+        timeout: float = 30.0,
+        recycle: int = -1,
+        pre_ping: bool = True,
+        reset_on_return: bool = True,
+    ):
+        self._creator = creator
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.reset_on_return = reset_on_return
+
+        self._idle = deque()
+        self._created_at = {}
+        self._available = asyncio.Condition()
+        self._checked_out = 0
+        self._waiters = 0
+        self._closed = False
+
+        # Monitoring counters
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def _connect(self):
+        """ Opens a new connection and remembers when it was created """
+        connection = await self._creator()
+        self._created_at[id(connection)] = time.monotonic()
+        return connection
+
+    async def _discard(self, connection) -> None:
+        """ Closes a connection, ignoring errors from already broken ones """
+        self._created_at.pop(id(connection), None)
+        try:
+            await connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _is_expired(self, connection) -> bool:
+        if self.recycle < 0:
+            return False
+        created_at = self._created_at.get(id(connection), 0.0)
+        return time.monotonic() - created_at > self.recycle
+
+    async def _is_alive(self, connection) -> bool:
+        if not self.pre_ping:
+            return True
+        try:
+            await connection.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def _has_room(self) -> bool:
+        return bool(self._idle) or self._checked_out < self.size + self.max_overflow
+
+    async def acquire(self):
+        """
+        Checks out a connection from the pool.
+
+        Waits up to ``timeout`` seconds when every connection (including the overflow) is in use.
+
+        Returns:
+            aio.MySQLConnection: A live connection that must be given back with `release`.
+
+        Raises:
+            PoolTimeoutError: If no connection became available in time.
+        """
+        start = time.monotonic()
+        async with self._available:
+            if self._closed:
+                raise mysql.connector.errors.PoolError("Connection pool is closed")
+
+            self._waiters += 1
+            try:
+                await asyncio.wait_for(self._available.wait_for(self._has_room), self.timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise PoolTimeoutError(
+                    msg=f"Timed out after {self.timeout}s waiting for a DB connection"
+                ) from None
+            finally:
+                self._waiters -= 1
+
+            connection = self._idle.popleft() if self._idle else None
+            self._checked_out += 1
+
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            if connection is not None and (
+                self._is_expired(connection) or not await self._is_alive(connection)
+            ):
+                await self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = await self._connect()
+        except BaseException:
+            async with self._available:
+                self._checked_out -= 1
+                self._available.notify()
+            raise
+
+        return connection
+
+    async def release(self, connection) -> None:
+        """
+        Gives a connection back to the pool.
+
+        Pending transactions are rolled back when ``reset_on_return`` is set.
+        Overflow, expired and broken connections are closed instead of kept.
+
+        Args:
+            connection (aio.MySQLConnection): A connection previously obtained with `acquire`.
+        """
+        keep = True
+        if self.reset_on_return:
+            try:
+                if await connection.is_connected():
+                    await connection.rollback()
+                else:
+                    keep = False
+            except mysql.connector.Error:
+                keep = False
+
+        async with self._available:
+            self._checked_out -= 1
+            keep = keep and not self._closed and len(self._idle) < self.size \
+                and not self._is_expired(connection)
+            if keep:
+                self._idle.append(connection)
+            self._available.notify()
+
+        if not keep:
+            await self._discard(connection)
+
+    @asynccontextmanager
+    async def connection(self):
+        """ Context manager yielding a pooled connection """
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    async def close(self) -> None:
+        """ Closes every idle connection and refuses further checkouts """
+        async with self._available:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+
+        for connection in idle:
+            await self._discard(connection)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the pool usage for monitoring.
+
+        Returns:
+            dict: Pool configuration, current usage and wait time counters.
+        """
+        return {
+            "size": self.size,
+            "max_overflow": self.max_overflow,
+            "in_use": self._checked_out,
+            "idle": len(self._idle),
+            "overflow": max(0, self._checked_out + len(self._idle) - self.size),
+            "waiters": self._waiters,
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+            "total_wait_time": self._total_wait,
+            "avg_wait_time": self._total_wait / self._checkouts if self._checkouts else 0.0,
+            "max_wait_time": self._max_wait,
+        }
+
+
+class BridgedCursor:
+    """
+    Cursor with the blocking interface of mysql-connector over an asynchronous one.
+
+    Each call suspends the greenlet started by `bridge.run_sync` until the query completes, so
+    the synchronous CRUD methods run unchanged on the event loop without holding a thread.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=()):
+        return await_only(self._cursor.execute(operation, params))
+
+    def executemany(self, operation, seq_params):
+        return await_only(self._cursor.executemany(operation, seq_params))
+
+    def fetchone(self):
+        return await_only(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        return await_only(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return await_only(self._cursor.fetchall())
+
+    def close(self):
+        return await_only(self._cursor.close())
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+
+class BridgedConnection:
+    """ Connection with the blocking interface of mysql-connector over an asynchronous one """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs) -> BridgedCursor:
+        return BridgedCursor(await_only(self._connection.cursor(*args, **kwargs)))
+
+    def commit(self) -> None:
+        await_only(self._connection.commit())
+
+    def rollback(self) -> None:
+        await_only(self._connection.rollback())
+
+    def is_connected(self) -> bool:
+        return await_only(self._connection.is_connected())
+
+
+_async_pool: AsyncConnectionPool | None = None
+
+
+def open_async_pool() -> AsyncConnectionPool:
+    """ Creates the application wide asynchronous pool from the settings """
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = AsyncConnectionPool(
+            size=settings.DB_ASYNC_POOL_SIZE,
+            max_overflow=settings.DB_ASYNC_POOL_MAX_OVERFLOW,
+            timeout=settings.DB_POOL_TIMEOUT,
+            recycle=settings.DB_POOL_RECYCLE,
+            pre_ping=settings.DB_POOL_PRE_PING,
+            reset_on_return=settings.DB_POOL_RESET_ON_RETURN,
+        )
+    return _async_pool
+
+
+def get_async_pool() -> AsyncConnectionPool:
+    """ Returns the asynchronous pool, opening it on first use outside the lifespan """
+    return _async_pool if _async_pool is not None else open_async_pool()
+
+
+async def close_async_pool() -> None:
+    """ Closes the application wide asynchronous pool """
+    global _async_pool
+    if _async_pool is not None:
+        pool, _async_pool = _async_pool, None
+        await pool.close()
@@ -0,0 +1,130 @@
+""" Streaming export of the catalog as CSV or JSON Lines """
+import csv
+import io
+import json
+import logging
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Literal
+
+import mysql.connector
+
+from app import crud
+from app.core.config import settings
+from app.core.db import get_pool
+
+logger = logging.getLogger(__name__)
+
+ExportFormat = Literal["csv", "jsonl"]
+
+# Field names of the exported books, in the column order of `crud.book.iter_books`. They are
+# the names `BookCreate` expects, so an export can be imported again.
+BOOK_FIELDS = (
+    "id_book", "title", "authors", "synopsis", "buy_link", "genres", "rating",
+    "editorial", "comments", "publication_date", "image",
+)
+# Bytes of encoded rows gathered before they are sent
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def _value(value):
+    """ Converts the dates and decimals of a row to JSON/CSV friendly values """
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if value is not None and not isinstance(value, (str, int, float)):
+        return float(value)
+    return value
+
+
+def encode_books(rows: Iterable[tuple], *, export_format: ExportFormat) -> Iterator[str]:
+    """
+    Encodes Books rows one line at a time, starting with a header row for CSV.
+
+    Args:
+        rows (Iterable[tuple]): The rows, as returned by `crud.book.iter_books`.
+        export_format (ExportFormat): "csv" or "jsonl".
+
+    Returns:
+        Iterator[str]: The lines of the file.
+    """
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(BOOK_FIELDS)
+        yield buffer.getvalue()
+        for row in rows:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow([_value(value) for value in row])
+            yield buffer.getvalue()
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(BOOK_FIELDS, map(_value, row))), ensure_ascii=False) + "\n"
+
+
+def chunk_lines(lines: Iterable[str], *, compress: bool = False) -> Iterator[bytes]:
+    """
+    Gathers encoded lines into chunks of about `CHUNK_SIZE` bytes, gzip-compressed on the fly.
+
+    Args:
+        lines (Iterable[str]): The lines of the file.
+        compress (bool, optional): Whether to output a gzip stream (default is False).
+
+    Returns:
+        Iterator[bytes]: The chunks of the file.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    chunk: list[bytes] = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        chunk.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            data = b"".join(chunk)
+            chunk.clear()
+            size = 0
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b"".join(chunk)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def stream_books(*, export_format: ExportFormat, compress: bool = False) -> Iterator[bytes]:
+    """
+    Streams the whole catalog from an unbuffered cursor, in constant memory.
+
+    The connection is checked out from the pool when the first chunk is requested and given
+    back once the stream ends, so it is not tied to the request dependencies, which are closed
+    before a streaming response is sent.
+
+    Args:
+        export_format (ExportFormat): "csv" or "jsonl".
+        compress (bool, optional): Whether to output a gzip stream (default is False).
+
+    Returns:
+        Iterator[bytes]: The chunks of the file.
+    """
+    with get_pool().connection() as connection:
+        cursor = connection.cursor(buffered=False)
+        try:
+            rows = crud.book.iter_books(cursor=cursor, batch_size=settings.BOOK_EXPORT_FETCH_SIZE)
+            yield from chunk_lines(encode_books(rows, export_format=export_format), compress=compress)
+        except mysql.connector.Error:
+            # The status was already sent, the client sees a truncated file
+            logger.exception("Could not export the books")
+            raise
+        finally:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                # Rows left unread when the client went away, the pool discards the connection
+                pass
@@ -0,0 +1,158 @@
+""" Bulk import of books from CSV or JSON Lines files """
+import csv
+import json
+import logging
+import time
+from collections.abc import Iterable, Iterator
+from typing import Literal
+
+from pydantic import ValidationError
+
+from app import crud
+from app.core.config import settings
+from app.core.db import transaction
+from app.models import BookCreate, BookImportError, BookImportOut
+
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal["csv", "jsonl"]
+
+FORMAT_BY_SUFFIX: dict[str, ImportFormat] = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def guess_format(filename: str | None) -> ImportFormat:
+    """
+    Deduces the format of an import file from its extension.
+
+    Raises:
+        ValueError: If the extension is not one of `FORMAT_BY_SUFFIX`.
+    """
+    for suffix, import_format in FORMAT_BY_SUFFIX.items():
+        if (filename or "").lower().endswith(suffix):
+            return import_format
+    raise ValueError(f"Unknown format of {filename}. Valid extensions are {list(FORMAT_BY_SUFFIX)}")
+
+
+def read_rows(lines: Iterable[str], *, import_format: ImportFormat) -> Iterator[tuple[int, dict | str]]:
+    """
+    Reads the rows of an import file one at a time.
+
+    Args:
+        lines (Iterable[str]): The lines of the file, e.g. an open text file.
+        import_format (ImportFormat): "csv" for a file with a header row naming the `BookCreate`
+            fields, "jsonl" for one JSON object per line.
+
+    Returns:
+        Iterator[tuple[int, dict | str]]: The line number and the row, a dict for CSV files and
+        the undecoded line for JSON Lines files.
+    """
+    if import_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Empty cells are missing values
+            yield reader.line_num, {field: value or None for field, value in row.items() if field}
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def parse_book(row: dict | str) -> BookCreate:
+    """
+    Validates a row of an import file.
+
+    Raises:
+        ValueError: If the row is not valid JSON or not a valid book.
+    """
+    if isinstance(row, str):
+        row = json.loads(row)
+    return BookCreate.model_validate(row)
+
+
+def describe_error(error: ValueError) -> str:
+    """ Summarizes a rejected row in one line """
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in detail['loc']) or 'row'}: {detail['msg']}" for detail in error.errors()
+        )
+    return str(error)
+
+
+def import_books(
+        *, connection, rows: Iterable[tuple[int, dict | str]],
+        batch_size: int = settings.BOOK_IMPORT_BATCH_SIZE,
+        max_errors: int = settings.BOOK_IMPORT_MAX_ERRORS) -> BookImportOut:
+    """
+    Creates the books of an import file, committing them in batches.
+
+    Rows are validated as they are read, so the file is never fully loaded. Each batch looks up
+    its titles with one query, inserts the new books with batched statements and is committed
+    on its own: if the database fails, the previous batches stay imported.
+
+    Args:
+        connection: The database connection, its transaction is committed after every batch.
+        rows (Iterable[tuple[int, dict | str]]): The numbered rows, as returned by `read_rows`.
+        batch_size (int, optional): The number of books inserted and committed together.
+        max_errors (int, optional): The number of rejected rows whose error is reported.
+
+    Returns:
+        BookImportOut: The number of imported, duplicated and rejected rows, the errors of the
+        first rejected ones and the throughput.
+    """
+    started = time.perf_counter()
+    seen_titles: set[str] = set()
+    batch: list[BookCreate] = []
+    errors: list[BookImportError] = []
+    read = imported = duplicates = rejected = 0
+
+    cursor = connection.cursor()
+    try:
+        def flush() -> None:
+            nonlocal imported, duplicates
+            existing = crud.book.get_existing_titles(cursor=cursor, titles=[book.title for book in batch])
+            new_books = [book for book in batch if book.title.casefold() not in existing]
+            try:
+                # The indexes and caches are only updated once the batch is committed
+                with transaction(connection):
+                    crud.book.create_books(cursor=cursor, books=new_books)
+            except Exception:
+                connection.rollback()
+                raise
+            imported += len(new_books)
+            duplicates += len(batch) - len(new_books)
+            batch.clear()
+            logger.info("Imported %d books, %.0f rows/s", imported, read / (time.perf_counter() - started))
+
+        for line, row in rows:
+            read += 1
+            try:
+                book_in = parse_book(row)
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < max_errors:
+                    errors.append(BookImportError(line=line, error=describe_error(e)))
+                continue
+
+            title = book_in.title.casefold()
+            if title in seen_titles:
+                duplicates += 1
+                continue
+            seen_titles.add(title)
+
+            batch.append(book_in)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        cursor.close()
+
+    seconds = time.perf_counter() - started
+    return BookImportOut(
+        imported=imported,
+        duplicates=duplicates,
+        rejected=rejected,
+        errors=errors,
+        seconds=seconds,
+        rows_per_second=read / seconds if seconds else 0.0,
+    )
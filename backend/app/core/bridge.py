@@ -0,0 +1,99 @@
+""" Blocking style code running on the event loop """
+import asyncio
+import sys
+from collections.abc import Awaitable, Callable
+from contextvars import copy_context
+from typing import Any
+
+import greenlet
+from starlette.concurrency import run_in_threadpool
+
+
+class _BridgeGreenlet(greenlet.greenlet):
+    """ Greenlet started by `run_sync`, which switches back to ``driver`` to await """
+
+    def __init__(self, function: Callable, driver: greenlet.greenlet):
+        super().__init__(function, driver)
+        self.driver = driver
+
+
+def on_event_loop() -> bool:
+    """ Whether the caller runs on the event loop thread, where it must not block """
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def in_bridge() -> bool:
+    """ Whether the caller runs in `run_sync`, where it can wait through `run_blocking` """
+    return isinstance(greenlet.getcurrent(), _BridgeGreenlet)
+
+
+def await_only(awaitable: Awaitable) -> Any:
+    """
+    Waits for an awaitable from the blocking style code run by `run_sync`.
+
+    The greenlet of the code is suspended, the event loop keeps serving other requests
+    meanwhile, and resumed with the result, or the exception, of the awaitable.
+
+    Args:
+        awaitable (Awaitable): The coroutine or future to wait for.
+
+    Returns:
+        The result of the awaitable.
+
+    Raises:
+        RuntimeError: If called outside of `run_sync`.
+    """
+    current = greenlet.getcurrent()
+    if not isinstance(current, _BridgeGreenlet):
+        raise RuntimeError("await_only() can only be called from a function run with run_sync()")
+    return current.driver.switch(awaitable)
+
+
+async def run_sync(function: Callable, *args, **kwargs) -> Any:
+    """
+    Runs blocking style code on the event loop.
+
+    The function runs in a greenlet which is suspended by `await_only` instead of blocking, so
+    it must not wait on anything else: blocking calls go through `run_blocking` and locks must
+    not be held across `await_only`, as another greenlet of the same thread would wait forever.
+    The function sees a copy of the context of the caller.
+
+    Args:
+        function (Callable): The function to run, with the given arguments.
+
+    Returns:
+        The result of the function.
+    """
+    bridged = _BridgeGreenlet(function, greenlet.getcurrent())
+    bridged.gr_context = copy_context()
+    result = bridged.switch(*args, **kwargs)
+    while not bridged.dead:
+        try:
+            value = await result
+        except BaseException:
+            result = bridged.throw(*sys.exc_info())
+        else:
+            result = bridged.switch(value)
+    return result
+
+
+def run_blocking(function: Callable, *args, **kwargs) -> Any:
+    """
+    Calls a function that may block or use the CPU for long, off the event loop if needed.
+
+    In `run_sync` the function runs on the threadpool while the greenlet is suspended,
+    elsewhere it is called directly.
+
+    Args:
+        function (Callable): The function to call, with the given arguments.
+
+    Returns:
+        The result of the function.
+    """
+    if in_bridge():
+        return await_only(run_in_threadpool(function, *args, **kwargs))
+    return function(*args, **kwargs)
@@ -0,0 +1,79 @@
+""" In-process caches """
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class TTLCache:
+    """
+    Thread safe LRU cache whose entries expire ``ttl`` seconds after being stored.
+
+    Once ``maxsize`` entries are stored the least recently used one is evicted.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, *, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ Returns the value stored for the key, or default if missing or expired """
+        with self._lock:
+            entry = self._entries.get(key, self._MISSING)
+            if entry is self._MISSING:
+                self._misses += 1
+                return default
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """ Stores a value, optionally with a ttl shorter or longer than the default one """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """ Removes the entry of a key, if any """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_if(self, predicate: Callable[[Hashable, Any], bool]) -> None:
+        """ Removes the entries for which predicate(key, value) is true """
+        with self._lock:
+            for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """ Removes every entry """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the cache for monitoring.
+
+        Returns:
+            dict: The number of entries, hits and misses.
+        """
+        with self._lock:
+            return {"size": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
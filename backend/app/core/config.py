@@ -163,6 +163,19 @@ class Settings(BaseSettings):
         return self
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
+    # Directory of the compiled email templates cache, a temporary one by default
+    EMAIL_TEMPLATES_CACHE_DIR: str | None = None
+    # Emails are queued and sent in the background. The queue is kept in memory unless
+    # EMAIL_OUTBOX_PATH names a SQLite file, which the workers may share: each email is
+    # claimed by one of them for EMAIL_CLAIM_TIMEOUT seconds, longer than a send takes
+    EMAIL_OUTBOX_PATH: str | None = None
+    EMAIL_CLAIM_TIMEOUT: float = 300.0
+    EMAIL_MAX_ATTEMPTS: int = 5
+    # Seconds before the first retry of a failed email, doubled on every attempt
+    EMAIL_RETRY_DELAY: float = 5.0
+    EMAIL_MAX_RETRY_DELAY: float = 600.0
+    # Seconds the SMTP connection is kept open without emails to send
+    SMTP_IDLE_TIMEOUT: float = 30.0
 
     @computed_field  # type: ignore[misc]
     @property
@@ -186,6 +199,84 @@ class Settings(BaseSettings):
     PASSWORD: str = "password"
     DATABASE: str = "database"
 
+    # MySQL connection pool
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a free connection before giving up
+    DB_POOL_TIMEOUT: float = 30.0
+    # Seconds after which a connection is recycled, -1 to disable
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RESET_ON_RETURN: bool = True
+    # Serve the book, rating and shelf routes as coroutines on an asynchronous pool, so waiting
+    # on the database does not hold one of the threads of the sync routes
+    DB_ASYNC: bool = False
+    DB_ASYNC_POOL_SIZE: int = 20
+    DB_ASYNC_POOL_MAX_OVERFLOW: int = 80
+    # Seconds a cached table row count is trusted before counting again
+    COUNT_CACHE_TTL: int = 300
+    # Seconds between the background reloads of the in-process book search index
+    SEARCH_INDEX_TTL: int = 600
+    # Share of the book rating in the search ranking, between 0 and 1
+    SEARCH_RATING_WEIGHT: float = 0.2
+    # Seconds between the background reloads of the in-memory autocomplete indexes
+    TYPEAHEAD_INDEX_TTL: int = 600
+    # Seconds the profile statistics of a user are cached, writes invalidate them earlier
+    USER_STATS_CACHE_TTL: int = 300
+    USER_STATS_CACHE_SIZE: int = 10000
+    # Seconds the id and password hash looked up by email at login are cached, unknown
+    # emails included, so repeated attempts do not query the database
+    LOGIN_CACHE_TTL: int = 30
+    LOGIN_CACHE_SIZE: int = 10000
+    # Number of verified access tokens whose payload and user are kept until they expire
+    TOKEN_CACHE_SIZE: int = 10000
+    # Threads querying the sections of the user profiles concurrently, each one holds a pooled
+    # connection while it runs
+    PROFILE_WORKERS: int = 8
+    # Cache of the catalog responses, "memory" for an in-process LRU holding up to
+    # RESPONSE_CACHE_MAX_BYTES, "redis" to share it between workers or "none" to disable it
+    RESPONSE_CACHE_BACKEND: Literal["memory", "redis", "none"] = "memory"
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    # Seconds a cached response is served, writes invalidate it earlier
+    RESPONSE_CACHE_TTL: int = 300
+    # Seconds after which the ETag and Last-Modified of the catalog responses change even without
+    # writes, so the writes made by other workers are seen by the clients revalidating them
+    ETAG_PERIOD: int = 300
+    # Identical concurrent catalog listings share one query, the callers waiting for it run
+    # their own after SINGLE_FLIGHT_TIMEOUT seconds
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_TIMEOUT: float = 5.0
+    # Books inserted and committed together by the bulk import, the largest batch a client
+    # may ask for, and number of rejected rows whose error is reported
+    BOOK_IMPORT_BATCH_SIZE: int = 1000
+    BOOK_IMPORT_MAX_BATCH_SIZE: int = 10000
+    BOOK_IMPORT_MAX_ERRORS: int = 100
+    # Rows fetched at a time from the unbuffered cursor of the catalog export
+    BOOK_EXPORT_FETCH_SIZE: int = 1000
+
+    # Write-behind rating aggregation, rating deltas are coalesced per book and
+    # applied in the background instead of on the request path
+    RATING_WRITE_BEHIND: bool = False
+    RATING_FLUSH_INTERVAL_MS: int = 200
+    # Maximum number of books with pending deltas
+    RATING_QUEUE_MAX_SIZE: int = 10000
+    # Milliseconds a request waits for room in a full queue before applying its delta itself,
+    # the routes served with DB_ASYNC wait on the threadpool
+    RATING_QUEUE_PUT_TIMEOUT_MS: int = 50
+
+    # Password hashing runs on a dedicated "thread" or "process" pool, requests beyond
+    # the workers plus the queue size are answered with a 503
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    # bcrypt work factor, calibrated at startup to the highest one whose hashes take at most
+    # PASSWORD_HASH_TARGET_MS unless fixed with PASSWORD_HASH_ROUNDS
+    PASSWORD_HASH_ROUNDS: int | None = None
+    PASSWORD_HASH_TARGET_MS: int = 250
+    PASSWORD_HASH_MIN_ROUNDS: int = 10
+    PASSWORD_HASH_MAX_ROUNDS: int = 14
+
     def _check_default_secret(self, var_name: str, value: str | None) -> None:
         """
         Check if a secret variable is still set to the default value 'changethis'.
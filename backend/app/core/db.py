@@ -1,10 +1,20 @@
 """ Database configuration """
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 import mysql.connector
 
 from app.models import UserCreate, BookCreate
+from app.core.bridge import run_blocking
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 def get_db_connection():
     """ Creates a connection to the production database """
     return mysql.connector.connect(
@@ -15,8 +25,316 @@ def get_db_connection():
         port=3306,
     )
 
+
+class PoolTimeoutError(mysql.connector.Error):
+    """ Raised when no pooled connection becomes available in time """
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of MySQL connections.
+
+    Keeps up to ``size`` idle connections around and allows ``max_overflow``
+    extra connections under load, which are closed as soon as they are
+    returned. Connections older than ``recycle`` seconds are replaced, and
+    ``pre_ping`` checks a connection is still alive before handing it out.
+    """
+
+    def __init__(
+        self,
+        *,
+        creator=get_db_connection,
+        size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        recycle: int = -1,
+        pre_ping: bool = True,
+        reset_on_return: bool = True,
+    ):
+        self._creator = creator
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.reset_on_return = reset_on_return
+
+        self._idle = deque()
+        self._created_at = {}
+        self._lock = threading.Condition()
+        self._checked_out = 0
+        self._waiters = 0
+        self._closed = False
+
+        # Monitoring counters
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self):
+        """ Opens a new connection and remembers when it was created """
+        connection = self._creator()
+        self._created_at[id(connection)] = time.monotonic()
+        return connection
+
+    def _discard(self, connection) -> None:
+        """ Closes a connection, ignoring errors from already broken ones """
+        self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _is_expired(self, connection) -> bool:
+        if self.recycle < 0:
+            return False
+        created_at = self._created_at.get(id(connection), 0.0)
+        return time.monotonic() - created_at > self.recycle
+
+    def _is_alive(self, connection) -> bool:
+        if not self.pre_ping:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def acquire(self):
+        """
+        Checks out a connection from the pool.
+
+        Blocks up to ``timeout`` seconds when every connection (including the
+        overflow) is in use.
+
+        Returns:
+            MySQLConnection: A live connection that must be given back with `release`.
+
+        Raises:
+            PoolTimeoutError: If no connection became available in time.
+        """
+        start = time.monotonic()
+        with self._lock:
+            if self._closed:
+                raise mysql.connector.errors.PoolError("Connection pool is closed")
+
+            self._waiters += 1
+            try:
+                while not self._idle and self._checked_out >= self.size + self.max_overflow:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0 or not self._lock.wait(remaining):
+                        if self._idle or self._checked_out < self.size + self.max_overflow:
+                            break
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            msg=f"Timed out after {self.timeout}s waiting for a DB connection"
+                        )
+            finally:
+                self._waiters -= 1
+
+            connection = self._idle.popleft() if self._idle else None
+            self._checked_out += 1
+
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        # Network round trips are done outside the lock
+        try:
+            if connection is not None and (
+                self._is_expired(connection) or not self._is_alive(connection)
+            ):
+                self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = self._connect()
+        except BaseException:
+            with self._lock:
+                self._checked_out -= 1
+                self._lock.notify()
+            raise
+
+        return connection
+
+    def release(self, connection) -> None:
+        """
+        Gives a connection back to the pool.
+
+        Pending transactions are rolled back when ``reset_on_return`` is set.
+        Overflow, expired and broken connections are closed instead of kept.
+
+        Args:
+            connection (MySQLConnection): A connection previously obtained with `acquire`.
+        """
+        keep = True
+        if self.reset_on_return:
+            try:
+                if connection.is_connected():
+                    connection.rollback()
+                else:
+                    keep = False
+            except mysql.connector.Error:
+                keep = False
+
+        with self._lock:
+            self._checked_out -= 1
+            keep = keep and not self._closed and len(self._idle) < self.size \
+                and not self._is_expired(connection)
+            if keep:
+                self._idle.append(connection)
+            self._lock.notify()
+
+        if not keep:
+            self._discard(connection)
+
+    def connection(self):
+        """ Context manager yielding a pooled connection """
+        return _PooledConnection(self)
+
+    def close(self) -> None:
+        """ Closes every idle connection and refuses further checkouts """
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+
+        for connection in idle:
+            self._discard(connection)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the pool usage for monitoring.
+
+        Returns:
+            dict: Pool configuration, current usage and wait time counters.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "in_use": self._checked_out,
+                "idle": len(self._idle),
+                "overflow": max(0, self._checked_out + len(self._idle) - self.size),
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "total_wait_time": self._total_wait,
+                "avg_wait_time": self._total_wait / self._checkouts if self._checkouts else 0.0,
+                "max_wait_time": self._max_wait,
+            }
+
+
+class _PooledConnection:
+    """ Context manager returning the connection to its pool on exit """
+
+    def __init__(self, pool: ConnectionPool):
+        self._pool = pool
+        self._connection = None
+
+    def __enter__(self):
+        self._connection = self._pool.acquire()
+        return self._connection
+
+    def __exit__(self, *exc_info):
+        self._pool.release(self._connection)
+        self._connection = None
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def open_pool() -> ConnectionPool:
+    """ Creates the application wide connection pool from the settings """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                timeout=settings.DB_POOL_TIMEOUT,
+                recycle=settings.DB_POOL_RECYCLE,
+                pre_ping=settings.DB_POOL_PRE_PING,
+                reset_on_return=settings.DB_POOL_RESET_ON_RETURN,
+            )
+        return _pool
+
+
+def get_pool() -> ConnectionPool:
+    """ Returns the application pool, opening it on first use outside the lifespan """
+    return _pool if _pool is not None else open_pool()
+
+
+def close_pool() -> None:
+    """ Closes the application wide connection pool """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+# Callbacks waiting for the commit of the transaction open in the current context
+_after_commit: ContextVar[list | None] = ContextVar("after_commit", default=None)
+
+
+def after_commit(callback: Callable, *args, **kwargs) -> None:
+    """
+    Runs a callback once the writes made so far are committed.
+
+    Used by the CRUD methods to update the in-memory indexes and caches only with data that
+    other requests can read. Inside `transaction` the callback waits for the commit and is
+    dropped if the transaction fails, outside of it (scripts committing by themselves) it runs
+    right away.
+
+    Args:
+        callback (Callable): The function to call, with the given arguments.
+    """
+    callbacks = _after_commit.get()
+    if callbacks is None:
+        callback(*args, **kwargs)
+    else:
+        callbacks.append((callback, args, kwargs))
+
+
+@contextmanager
+def transaction(connection):
+    """
+    Commits the writes made in the block and then runs their `after_commit` callbacks.
+
+    If the block raises nothing is committed and the callbacks are dropped, the pending
+    changes are rolled back when the connection returns to the pool. A failing callback is
+    logged without affecting the others, the transaction being already committed. In
+    `bridge.run_sync` the callbacks run on the threadpool.
+
+    Args:
+        connection (MySQLConnection): The connection the block writes with.
+    """
+    callbacks: list = []
+    token = _after_commit.set(callbacks)
+    try:
+        yield connection
+    finally:
+        _after_commit.reset(token)
+    connection.commit()
+    if callbacks:
+        # Callbacks may block, e.g. on a Redis response cache
+        run_blocking(_run_callbacks, callbacks)
+
+
+def _run_callbacks(callbacks: list) -> None:
+    for callback, args, kwargs in callbacks:
+        try:
+            callback(*args, **kwargs)
+        except Exception:
+            logger.exception("After commit callback %s failed", getattr(callback, "__qualname__", callback))
+
 def init_db(cursor):
     """ Initializes the database with a default superuser and a sample book """
+    # Imported here, the CRUD modules depend on this one
+    from app.crud.book import set_book_genres
 
     # Create a test user
     test_user = UserCreate(
@@ -90,6 +408,8 @@ def init_db(cursor):
     else:
         book_id = book[0]
 
+    set_book_genres(cursor=cursor, book_id=book_id, genres=test_book.genres)
+
     # Insert a sample rating into the database
     query_create_rating ="""
         INSERT INTO CommentRatingPerBook (IdUser, IdBook, Comment, Rating)
@@ -136,5 +456,7 @@ def init_db(cursor):
     else:
         second_book_id = book[0]
 
+    set_book_genres(cursor=cursor, book_id=second_book_id, genres=test_book.genres)
+
     return user_id, book_id, second_book_id, comment_id
 
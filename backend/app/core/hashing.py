@@ -0,0 +1,290 @@
+""" Bounded worker pool running the password hashing off the request threads """
+import math
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt work factor used until the pool is calibrated
+DEFAULT_ROUNDS = 12
+# Number of hashes timed by the calibration, the fastest one is kept
+CALIBRATION_SAMPLES = 3
+
+
+class HashingBusyError(Exception):
+    """ Raised when the hashing queue is full, answered with a 503 """
+
+
+def hash_rounds(hashed_password: str) -> int | None:
+    """
+    Reads the work factor a bcrypt hash was made with.
+
+    Args:
+        hashed_password (str): The stored hash.
+
+    Returns:
+        int | None: The bcrypt rounds, or None if the hash is not a bcrypt one.
+    """
+    try:
+        return pwd_context.handler("bcrypt").from_string(hashed_password).rounds
+    except ValueError:
+        return None
+
+
+def _hash_password(password: str, rounds: int) -> tuple[str, float, float]:
+    """ Hashes a password, returning the hash, the wall clock start time and the duration """
+    started_at = time.time()
+    start = time.perf_counter()
+    hashed = pwd_context.handler("bcrypt").using(rounds=rounds).hash(password)
+    return hashed, started_at, time.perf_counter() - start
+
+
+def _check_password(password: str, hashed: str, rounds: int) -> tuple[tuple[bool, str | None], float, float]:
+    """
+    Checks a password, and when it matches a hash made with fewer rounds, hashes it again.
+
+    Hashes made with more rounds are kept: the workers calibrate on their own and may settle
+    on different rounds, which must not make alternate logins rewrite the hash.
+
+    Returns the result and the new hash, the wall clock start time and the duration.
+    """
+    started_at = time.time()
+    start = time.perf_counter()
+    new_hash = None
+    matches = pwd_context.verify(password, hashed)
+    stored_rounds = hash_rounds(hashed)
+    if matches and (stored_rounds is None or stored_rounds < rounds):
+        new_hash = pwd_context.handler("bcrypt").using(rounds=rounds).hash(password)
+    return (matches, new_hash), started_at, time.perf_counter() - start
+
+
+def _time_hash(rounds: int) -> float:
+    """ Returns the seconds taken by a hash with the given rounds """
+    start = time.perf_counter()
+    pwd_context.handler("bcrypt").using(rounds=rounds).hash("calibration")
+    return time.perf_counter() - start
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated pool of ``workers`` threads or processes.
+
+    At most ``workers + queue_size`` operations are accepted at once, further ones fail right
+    away with `HashingBusyError` instead of piling up and holding the request threads, so a
+    login spike can not starve the other endpoints.
+
+    Unless fixed with ``rounds``, the work factor is chosen by `calibrate` as the highest one,
+    between ``min_rounds`` and ``max_rounds``, whose hashes take at most ``target_time``
+    seconds on the workers. Passwords hashed with a lower work factor are hashed again on
+    the next successful login, never with a lower one.
+    """
+
+    def __init__(
+        self,
+        *,
+        executor: str = "thread",
+        workers: int = 2,
+        queue_size: int = 32,
+        rounds: int | None = None,
+        min_rounds: int = 10,
+        max_rounds: int = 14,
+        target_time: float = 0.25,
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hashing executor: {executor}")
+        self.executor = executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self.fixed_rounds = rounds
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.target_time = target_time
+        self.rounds = rounds or min(max(DEFAULT_ROUNDS, min_rounds), max_rounds)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+
+        # Monitoring counters
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._total_hash_time = 0.0
+        self._max_hash_time = 0.0
+        self._hashes_by_rounds: Counter[int] = Counter()
+        self._rehashes = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor == "process":
+                    # Forking a process with running threads is unsafe, start fresh interpreters
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hasher"
+                    )
+            return self._executor
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusyError("Too many password operations in progress, try again later.")
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            submitted_at = time.time()
+            result, started_at, duration = self._get_executor().submit(function, *args).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._in_flight -= 1
+
+        wait_time = max(started_at - submitted_at, 0.0)
+        with self._lock:
+            self._completed += 1
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+            self._total_hash_time += duration
+            self._max_hash_time = max(self._max_hash_time, duration)
+        return result
+
+    def calibrate(self) -> int:
+        """
+        Picks the work factor from the time a hash takes on the workers.
+
+        A hash with ``min_rounds`` is timed and, as each extra round doubles the cost, the
+        number of extra rounds fitting in ``target_time`` is added to it.
+
+        Returns:
+            int: The work factor used from now on.
+        """
+        if self.fixed_rounds is not None:
+            return self.rounds
+
+        executor = self._get_executor()
+        elapsed = min(
+            executor.submit(_time_hash, self.min_rounds).result() for _ in range(CALIBRATION_SAMPLES)
+        )
+        extra_rounds = math.floor(math.log2(self.target_time / elapsed)) if elapsed > 0 else 0
+        rounds = min(max(self.min_rounds + extra_rounds, self.min_rounds), self.max_rounds)
+        with self._lock:
+            self.rounds = rounds
+        return rounds
+
+    def hash(self, password: str) -> str:
+        """
+        Hashes a password for storage.
+
+        Args:
+            password (str): The plain text password.
+
+        Returns:
+            str: The bcrypt hash.
+
+        Raises:
+            HashingBusyError: If the queue is full.
+        """
+        rounds = self.rounds
+        hashed = self._run(_hash_password, password, rounds)
+        with self._lock:
+            self._hashes_by_rounds[rounds] += 1
+        return hashed
+
+    def verify(self, password: str, hashed_password: str | bytes) -> bool:
+        """
+        Checks a plain password against a stored bcrypt hash.
+
+        Args:
+            password (str): The plain text password.
+            hashed_password (str | bytes): The stored hash.
+
+        Returns:
+            bool: True if the password matches.
+
+        Raises:
+            HashingBusyError: If the queue is full.
+        """
+        return self.verify_and_update(password, hashed_password)[0]
+
+    def verify_and_update(self, password: str, hashed_password: str | bytes) -> tuple[bool, str | None]:
+        """
+        Checks a plain password and, if it matches a hash made with a lower work factor, hashes
+        it again with the current one.
+
+        Args:
+            password (str): The plain text password.
+            hashed_password (str | bytes): The stored hash.
+
+        Returns:
+            tuple[bool, str | None]: Whether the password matches, and the hash to store instead
+            of the current one, if any.
+
+        Raises:
+            HashingBusyError: If the queue is full.
+        """
+        if isinstance(hashed_password, bytes):
+            hashed_password = hashed_password.decode("utf-8")
+        rounds = self.rounds
+        matches, new_hash = self._run(_check_password, password, hashed_password, rounds)
+        if new_hash is not None:
+            with self._lock:
+                self._hashes_by_rounds[rounds] += 1
+                self._rehashes += 1
+        return matches, new_hash
+
+    def shutdown(self) -> None:
+        """ Stops the workers once the running operations are done """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the pool for monitoring.
+
+        Returns:
+            dict: The work factor, operations in progress, rejections, queue wait and hashing
+            times, and the number of hashes made with each work factor.
+        """
+        with self._lock:
+            completed = self._completed
+            return {
+                "executor": self.executor,
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "completed": completed,
+                "rejected": self._rejected,
+                "avg_wait_time": self._total_wait_time / completed if completed else 0.0,
+                "max_wait_time": self._max_wait_time,
+                "avg_hash_time": self._total_hash_time / completed if completed else 0.0,
+                "max_hash_time": self._max_hash_time,
+                "hashes_by_rounds": dict(self._hashes_by_rounds),
+                "rehashes": self._rehashes,
+            }
+
+
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+    min_rounds=settings.PASSWORD_HASH_MIN_ROUNDS,
+    max_rounds=settings.PASSWORD_HASH_MAX_ROUNDS,
+    target_time=settings.PASSWORD_HASH_TARGET_MS / 1000,
+)
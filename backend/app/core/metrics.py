@@ -0,0 +1,52 @@
+""" In-process request metrics """
+import threading
+from collections import Counter
+
+
+class PhaseTimer:
+    """
+    Accumulates how many times an operation ended with each outcome and how long each of its
+    phases took, for the monitoring endpoints.
+    """
+
+    def __init__(self):
+        self._outcomes: Counter[str] = Counter()
+        self._count: Counter[str] = Counter()
+        self._total: Counter[str] = Counter()
+        self._max: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, phases: dict[str, float]) -> None:
+        """
+        Records one run of the operation.
+
+        Args:
+            outcome (str): How the operation ended, e.g. "success".
+            phases (dict[str, float]): The seconds spent in each phase that was reached.
+        """
+        with self._lock:
+            self._outcomes[outcome] += 1
+            for phase, seconds in phases.items():
+                self._count[phase] += 1
+                self._total[phase] += seconds
+                self._max[phase] = max(self._max.get(phase, 0.0), seconds)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the metrics.
+
+        Returns:
+            dict: The number of runs per outcome and the count, average and maximum seconds of each phase.
+        """
+        with self._lock:
+            return {
+                "outcomes": dict(self._outcomes),
+                "phases": {
+                    phase: {
+                        "count": count,
+                        "avg_time": self._total[phase] / count,
+                        "max_time": self._max[phase],
+                    }
+                    for phase, count in self._count.items()
+                },
+            }
@@ -0,0 +1,123 @@
+""" Migrations of the MySQL schema """
+import logging
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+def column_exists(cursor, table: str, column: str) -> bool:
+    """ Whether a column exists in a table of the current database """
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (table, column),
+    )
+    return cursor.fetchone() is not None
+
+
+def add_rating_aggregates(cursor) -> None:
+    """ Adds Books.RatingSum and Books.RatingCount and backfills them from the comments """
+    # Imported here, the CRUD modules depend on the core ones
+    from app.crud.rating import recalculate_rating_aggregates
+
+    for column in ("RatingSum", "RatingCount"):
+        if not column_exists(cursor, "Books", column):
+            cursor.execute(f"ALTER TABLE Books ADD COLUMN {column} INT NOT NULL DEFAULT 0")
+    recalculate_rating_aggregates(cursor=cursor)
+
+
+def add_book_genres(cursor) -> None:
+    """ Creates the Genres and BookGenres tables and backfills them from Books.Genres """
+    from app.crud.book import split_genres
+
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS Genres (
+            IdGenre INT NOT NULL AUTO_INCREMENT,
+            Name VARCHAR(100) NOT NULL,
+            PRIMARY KEY (IdGenre),
+            UNIQUE KEY ix_Genres_Name (Name)
+        )
+        """
+    )
+    # The primary key serves the genre -> books lookups, the index the book -> genres ones
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS BookGenres (
+            IdGenre INT NOT NULL,
+            IdBook INT NOT NULL,
+            PRIMARY KEY (IdGenre, IdBook),
+            KEY ix_BookGenres_IdBook (IdBook),
+            CONSTRAINT fk_BookGenres_Genres FOREIGN KEY (IdGenre) REFERENCES Genres (IdGenre) ON DELETE CASCADE,
+            CONSTRAINT fk_BookGenres_Books FOREIGN KEY (IdBook) REFERENCES Books (IdBook) ON DELETE CASCADE
+        )
+        """
+    )
+
+    cursor.execute("SELECT IdBook, Genres FROM Books")
+    book_genres = [(book_id, split_genres(genres)) for book_id, genres in cursor.fetchall()]
+    # Genre names are unique regardless of case, like the index collation
+    names = {}
+    for _, genres in book_genres:
+        for name in genres:
+            names.setdefault(name.casefold(), name)
+    if not names:
+        return
+
+    cursor.executemany("INSERT IGNORE INTO Genres (Name) VALUES (%s)", [(name,) for name in sorted(names.values())])
+    cursor.execute("SELECT Name, IdGenre FROM Genres")
+    genre_ids = {name.casefold(): genre_id for name, genre_id in cursor.fetchall()}
+    cursor.executemany(
+        "INSERT IGNORE INTO BookGenres (IdGenre, IdBook) VALUES (%s, %s)",
+        [(genre_ids[name.casefold()], book_id) for book_id, genres in book_genres for name in genres],
+    )
+
+
+# Applied in order and recorded in 'SchemaMigrations', new migrations are appended
+MIGRATIONS: list[tuple[str, Callable]] = [
+    ("0001_add_book_rating_aggregates", add_rating_aggregates),
+    ("0002_add_book_genres", add_book_genres),
+]
+
+
+def migrate(connection) -> list[str]:
+    """
+    Applies the migrations of the MySQL schema that are not recorded yet.
+
+    The MySQL tables are not managed by Alembic, whose database is the one of
+    `SQLALCHEMY_DATABASE_URI`. MySQL commits DDL statements implicitly, so every migration
+    checks what already exists and can be run again if it was interrupted.
+
+    Args:
+        connection (MySQLConnection): A connection to the MySQL database.
+
+    Returns:
+        list[str]: The names of the migrations applied.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS SchemaMigrations (
+                Name VARCHAR(100) NOT NULL PRIMARY KEY,
+                AppliedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute("SELECT Name FROM SchemaMigrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        migrated = []
+        for name, migration in MIGRATIONS:
+            if name in applied:
+                continue
+            logger.info("Applying migration %s", name)
+            migration(cursor)
+            cursor.execute("INSERT INTO SchemaMigrations (Name) VALUES (%s)", (name,))
+            connection.commit()
+            migrated.append(name)
+        return migrated
+    finally:
+        cursor.close()
@@ -0,0 +1,299 @@
+""" Outbox sending the emails in the background """
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import emails  # type: ignore
+from emails.backend.smtp import SMTPBackend  # type: ignore
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Messages sent per query of the outbox
+BATCH_SIZE = 50
+
+
+def smtp_backend() -> SMTPBackend:
+    """ Returns an SMTP client for the configured server, connected on first use """
+    smtp_options: dict[str, Any] = {"host": settings.SMTP_HOST, "port": settings.SMTP_PORT}
+    if settings.SMTP_TLS:
+        smtp_options["tls"] = True
+    elif settings.SMTP_SSL:
+        smtp_options["ssl"] = True
+    if settings.SMTP_USER:
+        smtp_options["user"] = settings.SMTP_USER
+    if settings.SMTP_PASSWORD:
+        smtp_options["password"] = settings.SMTP_PASSWORD
+    return SMTPBackend(fail_silently=False, **smtp_options)
+
+
+def deliver_email(backend: SMTPBackend, *, email_to: str, subject: str, html_content: str) -> None:
+    """
+    Sends an email through an open SMTP client.
+
+    Raises:
+        RuntimeError: If the server did not accept the message.
+    """
+    message = emails.Message(
+        subject=subject,
+        html=html_content,
+        mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL),
+    )
+    response = message.send(to=email_to, smtp=backend)
+    logger.info("Send email result: %s", response)
+    if not response or not response.success:
+        raise RuntimeError(f"SMTP server answered {getattr(response, 'status_code', None)}")
+
+
+class EmailOutbox:
+    """
+    Queue of emails delivered by a background thread.
+
+    Messages are stored in SQLite, in memory unless a file ``path`` is given, in which case
+    they survive restarts and may be shared by the workers of the application. A message is
+    claimed before being sent, by moving its next attempt ``claim_timeout`` seconds ahead, so
+    only one process sends it; if that process dies the message is retried once the claim
+    expires. The SMTP connection is kept open while there are messages to send and closed
+    after ``idle_timeout`` seconds without any. A failed message is retried after
+    ``retry_delay`` seconds, doubled on every attempt up to ``max_retry_delay``, and moved to
+    the dead letters once it failed ``max_attempts`` times.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str = ":memory:",
+        connect: Callable[[], Any] = smtp_backend,
+        deliver: Callable[..., None] = deliver_email,
+        max_attempts: int = 5,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 600.0,
+        idle_timeout: float = 30.0,
+        claim_timeout: float = 300.0,
+    ):
+        self.path = path
+        self.connect = connect
+        self.deliver = deliver
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.idle_timeout = idle_timeout
+        self.claim_timeout = claim_timeout
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email_to TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                html_content TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                dead INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (dead, next_attempt_at)")
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._backend: Any = None
+        self._last_sent_at = 0.0
+
+        # Monitoring counters
+        self._sent = 0
+        self._failed_attempts = 0
+        self._connections = 0
+
+    def enqueue(self, *, email_to: str, subject: str, html_content: str) -> int:
+        """
+        Adds an email to the outbox, to be sent by the background thread.
+
+        Args:
+            email_to (str): The recipient's email address.
+            subject (str): The subject of the email.
+            html_content (str): The HTML content of the email.
+
+        Returns:
+            int: The ID of the queued message.
+        """
+        with self._db_lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (email_to, subject, html_content, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (email_to, subject, html_content, time.time()),
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def start(self) -> None:
+        """ Starts the background sender """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ Stops the background sender once the message being sent is done """
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            thread.join()
+        self._disconnect()
+        pending = self.stats()["pending"]
+        if pending and self.path == ":memory:":
+            logger.warning("%d emails were not sent before shutdown", pending)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                next_due = self.deliver_due()
+            except Exception:
+                logger.exception("Could not deliver the queued emails")
+                next_due = self.retry_delay
+
+            # Keep the connection for the next messages only while they keep coming
+            if self._backend is not None and time.monotonic() - self._last_sent_at >= self.idle_timeout:
+                self._disconnect()
+            timeout = self.idle_timeout if next_due is None else min(next_due, self.idle_timeout)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _disconnect(self) -> None:
+        backend, self._backend = self._backend, None
+        if backend is not None:
+            try:
+                backend.close()
+            except Exception:
+                logger.exception("Could not close the SMTP connection")
+
+    def deliver_due(self) -> float | None:
+        """
+        Sends every message whose next attempt is due, reusing one SMTP connection.
+
+        Returns:
+            float | None: Seconds until the next pending message is due, or None if none is left.
+        """
+        while not self._stop.is_set():
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT id, email_to, subject, html_content, attempts FROM outbox "
+                    "WHERE dead = 0 AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                    (time.time(), BATCH_SIZE),
+                ).fetchall()
+            if not rows:
+                break
+            for message_id, email_to, subject, html_content, attempts in rows:
+                if self._stop.is_set():
+                    break
+                if self._claim(message_id):
+                    self._send(message_id, email_to, subject, html_content, attempts)
+
+        with self._db_lock:
+            (next_attempt_at,) = self._db.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE dead = 0"
+            ).fetchone()
+        return None if next_attempt_at is None else max(next_attempt_at - time.time(), 0.0)
+
+    def _claim(self, message_id: int) -> bool:
+        """ Reserves a due message for this process, False if another one claimed or sent it first """
+        now = time.time()
+        with self._db_lock:
+            cursor = self._db.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ? AND dead = 0 AND next_attempt_at <= ?",
+                (now + self.claim_timeout, message_id, now),
+            )
+        return cursor.rowcount == 1
+
+    def _send(self, message_id: int, email_to: str, subject: str, html_content: str, attempts: int) -> None:
+        try:
+            if self._backend is None:
+                self._backend = self.connect()
+                self._connections += 1
+            self.deliver(self._backend, email_to=email_to, subject=subject, html_content=html_content)
+        except Exception as exc:
+            # The connection may be broken, open a new one for the next message
+            self._disconnect()
+            attempts += 1
+            self._failed_attempts += 1
+            dead = attempts >= self.max_attempts
+            delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+            with self._db_lock:
+                self._db.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, dead = ? WHERE id = ?",
+                    (attempts, time.time() + delay, str(exc), int(dead), message_id),
+                )
+            if dead:
+                logger.error("Email %d to %s moved to the dead letters: %s", message_id, email_to, exc)
+            return
+
+        self._last_sent_at = time.monotonic()
+        self._sent += 1
+        with self._db_lock:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (message_id,))
+
+    def dead_letters(self) -> list[dict]:
+        """
+        Lists the messages that could not be sent.
+
+        Returns:
+            list[dict]: The ID, recipient, subject, attempts and last error of each message.
+        """
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, email_to, subject, attempts, last_error FROM outbox WHERE dead = 1 ORDER BY id"
+            ).fetchall()
+        return [
+            {"id": row[0], "email_to": row[1], "subject": row[2], "attempts": row[3], "last_error": row[4]}
+            for row in rows
+        ]
+
+    def retry_dead_letters(self) -> int:
+        """
+        Queues the dead letters again with a fresh number of attempts.
+
+        Returns:
+            int: The number of messages queued again.
+        """
+        with self._db_lock:
+            cursor = self._db.execute(
+                "UPDATE outbox SET dead = 0, attempts = 0, next_attempt_at = ? WHERE dead = 1", (time.time(),)
+            )
+        self._wakeup.set()
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the outbox for monitoring.
+
+        Returns:
+            dict: Pending and dead messages, sent messages, failed attempts and SMTP connections opened.
+        """
+        with self._db_lock:
+            pending, dead = self._db.execute(
+                "SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 1), 0) FROM outbox"
+            ).fetchone()
+        return {
+            "pending": pending,
+            "dead": dead,
+            "sent": self._sent,
+            "failed_attempts": self._failed_attempts,
+            "connections": self._connections,
+        }
+
+
+email_outbox = EmailOutbox(
+    path=settings.EMAIL_OUTBOX_PATH or ":memory:",
+    max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+    retry_delay=settings.EMAIL_RETRY_DELAY,
+    max_retry_delay=settings.EMAIL_MAX_RETRY_DELAY,
+    idle_timeout=settings.SMTP_IDLE_TIMEOUT,
+    claim_timeout=settings.EMAIL_CLAIM_TIMEOUT,
+)
@@ -0,0 +1,72 @@
+""" User profile assembled from concurrent queries """
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, get_args
+
+from app import crud
+from app.core.config import settings
+from app.core.db import get_pool
+from app.models import ProfileSection
+
+PROFILE_SECTIONS: tuple[str, ...] = get_args(ProfileSection)
+
+# Threads running the sections of the profiles, each one on its own pooled connection
+profile_executor = ThreadPoolExecutor(max_workers=settings.PROFILE_WORKERS, thread_name_prefix="profile")
+
+
+def run_query(query: Callable[..., Any]) -> Any:
+    """
+    Runs a CRUD read on a connection of its own.
+
+    Args:
+        query (Callable): The CRUD function, missing only its `cursor` argument.
+
+    Returns:
+        The result of the query.
+    """
+    with get_pool().connection() as connection:
+        cursor = connection.cursor()
+        try:
+            return query(cursor=cursor)
+        finally:
+            cursor.close()
+
+
+def get_user_profile(
+        *, user_id: int, sections: Iterable[str] = PROFILE_SECTIONS, limit: int = 20,
+        fields: Iterable[str] | None = None) -> dict | None:
+    """
+    Reads the user and the requested sections of its profile at the same time.
+
+    The sections are queried on the profile pool while the calling thread checks the user
+    exists, so the profile takes as long as its slowest query instead of the sum of them.
+
+    Args:
+        user_id (int): The ID of the user.
+        sections (Iterable[str]): The sections to include, among `PROFILE_SECTIONS`.
+        limit (int): The maximum number of books of every list.
+        fields (Iterable[str] | None): The book fields returned, as in the book listings.
+
+    Returns:
+        dict | None: The user and the requested sections, or None if the user does not exist.
+    """
+    queries = {
+        "mybooks": partial(crud.mybooks.get_mybooks_books, id_user=user_id, limit=limit, fields=fields),
+        "readbooks": partial(
+            crud.readbooks.get_readbooks_books, id_user=user_id, limit=limit,
+            fields=fields or crud.book.BOOK_CARD_FIELDS),
+        "ratings": partial(crud.rating.get_books_with_ratings_by_user, user_id=user_id, limit=limit, fields=fields),
+        "stats": partial(crud.stats.get_user_stats, user_id=user_id),
+    }
+    futures = {section: profile_executor.submit(run_query, queries[section]) for section in dict.fromkeys(sections)}
+    try:
+        row = run_query(partial(crud.user.get_user_by_id, user_id=user_id))
+        profile = {section: future.result() for section, future in futures.items()}
+    finally:
+        for future in futures.values():
+            future.cancel()
+
+    if row is None:
+        return None
+    return {"user": crud.user.user_from_row(row), **profile}
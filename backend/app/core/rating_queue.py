@@ -0,0 +1,213 @@
+""" Write-behind queue coalescing rating updates per book """
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+from app.core.db import transaction
+from app.core.bridge import in_bridge, on_event_loop, run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class RatingAggregator:
+    """
+    Collects rating deltas and applies them to the books in the background.
+
+    Deltas for the same book are summed while they wait, so a burst of comments on one book
+    turns into a single UPDATE of its row every ``flush_interval`` seconds.
+
+    A delta is queued in two steps. Before committing, `accepts` checks the queue has room for
+    the book: when ``max_pending`` books are waiting it waits up to ``put_timeout`` seconds for
+    a flush (on the threadpool in `run_sync`, not at all elsewhere on the event loop) and then
+    gives up, letting the caller apply the delta
+    in its own transaction. Once the transaction committed `submit` queues the delta without
+    waiting, so a rolled back comment never reaches the book. Writers accepted concurrently can
+    exceed ``max_pending`` by at most their number.
+    """
+
+    def __init__(
+        self,
+        *,
+        apply_delta: Callable,
+        connection_factory: Callable,
+        enabled: bool = False,
+        flush_interval: float = 0.2,
+        max_pending: int = 10000,
+        put_timeout: float = 0.05,
+    ):
+        self.apply_delta = apply_delta
+        self.connection_factory = connection_factory
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+
+        # book_id -> [rating_sum, rating_count, first enqueue time]
+        self._pending: dict[int, list] = {}
+        self._lock = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        # Monitoring counters
+        self._submitted = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._flushes = 0
+        self._flushed_books = 0
+        self._failed_flushes = 0
+        self._last_flush_duration = 0.0
+        self._last_flush_lag = 0.0
+
+    def start(self) -> None:
+        """ Starts the background flusher if the write-behind mode is enabled """
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rating-aggregator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ Stops the background flusher, flushing every pending delta first """
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not flush the pending rating updates on shutdown")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not flush the pending rating updates, retrying")
+
+    def accepts(self, book_id: int) -> bool:
+        """
+        Checks whether a delta for a book can be queued, before the transaction making it commits.
+
+        Args:
+            book_id (int): The ID of the rated book.
+
+        Returns:
+            bool: True if the delta can be queued, False if the mode is disabled or the queue is full.
+        """
+        if not self.enabled or self._thread is None:
+            return False
+        if self._has_room(book_id, 0):
+            return True
+
+        if in_bridge():
+            # Waits on the threadpool while the event loop keeps serving other requests
+            accepted = run_blocking(self._has_room, book_id, self.put_timeout)
+        else:
+            # Waiting on the event loop itself would stall every other request
+            accepted = not on_event_loop() and self._has_room(book_id, self.put_timeout)
+        if not accepted:
+            with self._lock:
+                self._rejected += 1
+        return accepted
+
+    def _has_room(self, book_id: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while book_id not in self._pending and len(self._pending) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    def submit(self, *, book_id: int, rating_sum: int, rating_count: int) -> None:
+        """
+        Queues a committed rating delta for a book, after `accepts` allowed it.
+
+        Args:
+            book_id (int): The ID of the rated book.
+            rating_sum (int): The sum of the ratings added (negative when removed).
+            rating_count (int): The number of ratings added (negative when removed).
+        """
+        with self._lock:
+            self._submitted += 1
+            entry = self._pending.get(book_id)
+            if entry is None:
+                self._pending[book_id] = [rating_sum, rating_count, time.monotonic()]
+            else:
+                self._coalesced += 1
+                entry[0] += rating_sum
+                entry[1] += rating_count
+
+    def flush(self) -> None:
+        """
+        Applies every pending delta in a single transaction.
+
+        Books are updated in ID order so concurrent flushes can not deadlock. If the transaction
+        fails the deltas are put back to be retried by the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._lock.notify_all()
+            if not batch:
+                return
+
+            start = time.monotonic()
+            try:
+                with self.connection_factory() as connection:
+                    cursor = connection.cursor()
+                    try:
+                        with transaction(connection):
+                            for book_id in sorted(batch):
+                                rating_sum, rating_count, _ = batch[book_id]
+                                if rating_sum or rating_count:
+                                    self.apply_delta(
+                                        cursor=cursor, book_id=book_id,
+                                        rating_sum=rating_sum, rating_count=rating_count
+                                    )
+                    finally:
+                        cursor.close()
+            except Exception:
+                with self._lock:
+                    self._failed_flushes += 1
+                    for book_id, (rating_sum, rating_count, enqueued_at) in batch.items():
+                        entry = self._pending.setdefault(book_id, [0, 0, enqueued_at])
+                        entry[0] += rating_sum
+                        entry[1] += rating_count
+                        entry[2] = min(entry[2], enqueued_at)
+                raise
+
+            end = time.monotonic()
+            with self._lock:
+                self._flushes += 1
+                self._flushed_books += len(batch)
+                self._last_flush_duration = end - start
+                self._last_flush_lag = end - min(entry[2] for entry in batch.values())
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the queue for monitoring.
+
+        Returns:
+            dict: Pending work, lag of the oldest pending delta and flush counters.
+        """
+        now = time.monotonic()
+        with self._lock:
+            oldest = min((entry[2] for entry in self._pending.values()), default=None)
+            return {
+                "enabled": self.enabled,
+                "pending_books": len(self._pending),
+                "max_pending": self.max_pending,
+                "lag": now - oldest if oldest is not None else 0.0,
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "rejected": self._rejected,
+                "flushes": self._flushes,
+                "flushed_books": self._flushed_books,
+                "failed_flushes": self._failed_flushes,
+                "last_flush_duration": self._last_flush_duration,
+                "last_flush_lag": self._last_flush_lag,
+            }
@@ -0,0 +1,80 @@
+""" Background reloads of the in-memory indexes """
+import logging
+import threading
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRefresh:
+    """
+    Thread reloading an in-memory index from the database every ``interval`` seconds.
+
+    ``build`` is called with a cursor on a connection of its own, so requests never wait for
+    a full reload. `start` makes the first build itself, the index is ready before the
+    application serves requests, and `request` asks for a reload as soon as possible.
+    """
+
+    def __init__(self, build: Callable, *, interval: float, name: str):
+        self.build = build
+        self.interval = interval
+        self.name = name
+        self._connection_factory: Callable | None = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def refresh(self) -> None:
+        """ Rebuilds the index now, on the calling thread """
+        with self._connection_factory() as connection:
+            cursor = connection.cursor()
+            try:
+                self.build(cursor=cursor)
+            finally:
+                cursor.close()
+
+    def start(self, connection_factory: Callable) -> None:
+        """
+        Builds the index and starts reloading it in the background.
+
+        Args:
+            connection_factory (Callable): Returns a context manager yielding a database connection.
+        """
+        if self._thread is not None:
+            return
+        self._connection_factory = connection_factory
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Could not build the %s, retrying in the background", self.name)
+            self._wake.set()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ Stops the background reloads """
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping = True
+            self._wake.set()
+            thread.join()
+
+    def request(self) -> None:
+        """ Asks the background thread to reload the index without waiting for the interval """
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            if self._stopping:
+                return
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Could not reload the %s", self.name)
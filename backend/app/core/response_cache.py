@@ -0,0 +1,243 @@
+""" Cache of rendered responses, invalidated by tag """
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from app.core.config import settings
+from app.core.versions import TagVersions
+
+
+class MemoryBackend:
+    """
+    Thread safe in-process LRU store of response bodies.
+
+    The least recently used entries are evicted once the bodies add up to more than
+    ``max_bytes``. Each entry is indexed under its tags so that it can be dropped by tag.
+    """
+
+    # Calls do not wait on the network, the cached routes make them from the event loop
+    blocking = False
+
+    def __init__(self, *, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[bytes, float, tuple[str, ...]]] = OrderedDict()
+        self._keys_by_tag: dict[str, set[str]] = {}
+        self._size = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key: str) -> None:
+        body, _, tags = self._entries.pop(key)
+        self._size -= len(body)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[1]:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, body: bytes, *, tags: Iterable[str], ttl: float) -> None:
+        if len(body) > self.max_bytes:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, time.monotonic() + ttl, tags)
+            self._size += len(body)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._keys_by_tag.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "size_bytes": self._size, "evictions": self._evictions}
+
+
+class RedisBackend:
+    """
+    Store of response bodies shared by every worker through Redis.
+
+    Works with any client exposing the redis-py interface. Entries expire with their ttl and
+    every tag is a set of the keys stored under it; Redis evicts entries by itself according
+    to its ``maxmemory-policy``.
+    """
+
+    blocking = True
+
+    def __init__(self, client, *, prefix: str = "response-cache:"):
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        return self._client.get(self._prefix + key)
+
+    def set(self, key: str, body: bytes, *, tags: Iterable[str], ttl: float) -> None:
+        seconds = max(1, round(ttl))
+        pipeline = self._client.pipeline()
+        pipeline.set(self._prefix + key, body, ex=seconds)
+        for tag in tags:
+            tag_key = f"{self._prefix}tag:{tag}"
+            pipeline.sadd(tag_key, key)
+            pipeline.expire(tag_key, seconds)
+        pipeline.execute()
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        tag_keys = [f"{self._prefix}tag:{tag}" for tag in tags]
+        keys = set()
+        for tag_key in tag_keys:
+            keys |= {key.decode() if isinstance(key, bytes) else key for key in self._client.smembers(tag_key)}
+        self._client.delete(*tag_keys, *(self._prefix + key for key in keys))
+        return len(keys)
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=self._prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def stats(self) -> dict:
+        return {"entries": None, "size_bytes": None, "evictions": None}
+
+
+class ResponseCache:
+    """
+    Read-through cache of response bodies keyed by route and parameters.
+
+    The CRUD methods writing books and ratings invalidate the tags of the responses they
+    change, which also bumps their ``versions`` used as HTTP validators, even when the cache
+    is disabled. Tags are invalidated once the write is committed, so that the next read sees
+    it, and a response is only cached if none of its tags was invalidated since the snapshot
+    of their versions taken before rendering it: a response read before a commit is never
+    cached after its invalidation. Versions are per process, writes of other workers are only
+    seen once ``ttl`` expires.
+    """
+
+    def __init__(self, backend, *, ttl: float, enabled: bool = True, versions: TagVersions | None = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.versions = versions
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        """ Returns the body cached for the key, or None """
+        if not self.enabled:
+            return None
+        body = self.backend.get(key)
+        with self._lock:
+            if body is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return body
+
+    def snapshot(self, tags: Iterable[str]) -> tuple[int, ...] | None:
+        """ Returns the versions of the tags to give to `set`, taken before rendering the response """
+        return self.versions.snapshot(tags) if self.versions is not None else None
+
+    def set(self, key: str, body: bytes, *, tags: Iterable[str], snapshot: tuple[int, ...] | None = None) -> bool:
+        """
+        Caches a body under the given tags, unless they were invalidated since the snapshot.
+
+        Args:
+            key (str): The key of the response.
+            body (bytes): The rendered response.
+            tags (Iterable[str]): The tags of the response.
+            snapshot (tuple[int, ...] | None, optional): The versions of the tags taken by
+                `snapshot` before rendering the response.
+
+        Returns:
+            bool: Whether the body was cached.
+        """
+        if not self.enabled:
+            return False
+        tags = list(tags)
+        if snapshot is not None and self.snapshot(tags) != snapshot:
+            return False
+        self.backend.set(key, body, tags=tags, ttl=self.ttl)
+        if snapshot is not None and self.snapshot(tags) != snapshot:
+            # Invalidated while storing, the invalidation may have missed the body
+            self.backend.invalidate(tags)
+            return False
+        return True
+
+    def invalidate(self, *tags: str) -> None:
+        """ Drops every response cached under any of the tags and bumps their versions """
+        if self.versions is not None:
+            self.versions.bump(tags)
+        if self.enabled:
+            removed = self.backend.invalidate(tags)
+            with self._lock:
+                self._invalidations += removed
+
+    def clear(self) -> None:
+        """ Drops every cached response """
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the cache for monitoring.
+
+        Returns:
+            dict: The backend, hits, misses and entries invalidated, with the size of the store.
+        """
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                "backend": type(self.backend).__name__,
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / requests if requests else 0.0,
+                "invalidations": self._invalidations,
+                **self.backend.stats(),
+            }
+
+
+def create_backend():
+    """ Creates the backend chosen in the settings, Redis requires the optional redis package """
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(settings.RESPONSE_CACHE_REDIS_URL))
+    return MemoryBackend(max_bytes=settings.RESPONSE_CACHE_MAX_BYTES)
+
+
+response_cache = ResponseCache(
+    create_backend(),
+    ttl=settings.RESPONSE_CACHE_TTL,
+    enabled=settings.RESPONSE_CACHE_BACKEND != "none",
+    versions=TagVersions(period=settings.ETAG_PERIOD),
+)
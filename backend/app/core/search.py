@@ -0,0 +1,281 @@
+""" In-process full text search over the book catalog """
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Callable
+
+from app.core.config import settings
+from app.core.refresh import BackgroundRefresh
+
+# Weight of a match in each indexed field
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "authors": 2.0,
+    "editorial": 1.0,
+    "synopsis": 0.5,
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text: str | None) -> str:
+    """
+    Folds case and strips accents so "Cançó" and "canco" are indexed alike.
+
+    Args:
+        text (str | None): The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str | None) -> list[str]:
+    """ Splits a text into normalized words """
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class _SearchState:
+    """ Postings of one version of the index, only modified under the lock of its index """
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self.vocabulary: list[str] = []
+        self.vocabulary_dirty = False
+        self.tokens: dict[int, set[str]] = {}
+        self.ratings: dict[int, float] = {}
+
+    def add(self, book_id: int, fields: dict[str, str | None], rating: float | None) -> None:
+        weights: dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field)):
+                weights[token] += weight
+
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.vocabulary_dirty = True
+            self.postings[token][book_id] = weight
+        self.tokens[book_id] = set(weights)
+        self.ratings[book_id] = float(rating or 0)
+
+    def remove(self, book_id: int) -> None:
+        for token in self.tokens.pop(book_id, ()):
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(book_id, None)
+            if not postings:
+                del self.postings[token]
+                self.vocabulary_dirty = True
+        self.ratings.pop(book_id, None)
+
+    def set_rating(self, book_id: int, rating: float | None) -> None:
+        if book_id in self.ratings:
+            self.ratings[book_id] = float(rating or 0)
+
+
+class BookSearchIndex:
+    """
+    Inverted index over the title, authors, editorial and synopsis of every book.
+
+    Once started the index is rebuilt in the background every ``ttl`` seconds, so that
+    processes which did not see a write eventually catch up, and the new version replaces the
+    previous one at once. Requests only build it when it was never built, e.g. in scripts. The
+    book CRUD methods update it after their transaction commits; updates made while a rebuild
+    reads the catalog are applied to the new version too.
+    """
+
+    def __init__(self, ttl: float, rating_weight: float):
+        self.ttl = ttl
+        self.rating_weight = rating_weight
+        self._state = _SearchState()
+        self._built = False
+        self._stale = False
+        # Updates made since the running build started reading the catalog
+        self._journal: list[Callable[[_SearchState], None]] | None = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.refresher = BackgroundRefresh(self.build, interval=ttl, name="search index")
+
+    def build(self, *, cursor) -> None:
+        """
+        Loads every book from the database into a new version of the index.
+
+        The new version is filled without holding the lock of the index, searches keep using
+        the current one until it is swapped. Concurrent builds wait for each other.
+
+        Args:
+            cursor: The database cursor used to read the catalog.
+        """
+        with self._build_lock:
+            self._build(cursor)
+
+    def _build(self, cursor) -> None:
+        with self._lock:
+            # Invalidations from now on are not covered by this build
+            self._journal, self._stale = [], False
+        try:
+            cursor.execute("SELECT IdBook, Title, Authors, Editorial, Synopsis, Rating FROM Books")
+            rows = cursor.fetchall()
+
+            state = _SearchState()
+            for row in rows:
+                state.add(row[0], {
+                    "title": row[1],
+                    "authors": row[2],
+                    "editorial": row[3],
+                    "synopsis": row[4],
+                }, row[5])
+            state.vocabulary = sorted(state.postings)
+
+            with self._lock:
+                for update in self._journal:
+                    update(state)
+                self._state, self._built = state, True
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def ensure_built(self, *, cursor) -> None:
+        """
+        Builds the index if it was never built, or invalidated, while no background refresh runs.
+
+        Callers arriving while the index is built do not wait for it and search the current version.
+        """
+        with self._lock:
+            ready = self._built and not self._stale
+        if ready:
+            return
+        if self.refresher.running:
+            # The startup build failed, the background thread retries it off the request path
+            self.refresher.request()
+            return
+        if not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                ready = self._built and not self._stale
+            if not ready:
+                self._build(cursor)
+        finally:
+            self._build_lock.release()
+
+    def start(self, connection_factory: Callable) -> None:
+        """ Builds the index and rebuilds it in the background every ``ttl`` seconds """
+        self.refresher.start(connection_factory)
+
+    def stop(self) -> None:
+        """ Stops the background rebuilds """
+        self.refresher.stop()
+
+    def invalidate(self) -> None:
+        """ Rebuilds the index after writes it was not told about, e.g. a bulk import """
+        if self.refresher.running:
+            self.refresher.request()
+        else:
+            with self._lock:
+                self._stale = True
+
+    def _update(self, update: Callable[[_SearchState], None]) -> None:
+        """ Applies an update to the current version and to the one being built, if any """
+        with self._lock:
+            update(self._state)
+            if self._journal is not None:
+                self._journal.append(update)
+
+    def add_book(self, book_id: int, *, title=None, authors=None, editorial=None,
+                 synopsis=None, rating=None) -> None:
+        """ Indexes a new book, or replaces the entry of an existing one """
+        fields = {"title": title, "authors": authors, "editorial": editorial, "synopsis": synopsis}
+
+        def add(state: _SearchState) -> None:
+            state.remove(book_id)
+            state.add(book_id, fields, rating)
+
+        self._update(add)
+
+    def remove_book(self, book_id: int) -> None:
+        """ Removes a deleted book from the index """
+        self._update(lambda state: state.remove(book_id))
+
+    def set_rating(self, book_id: int, rating: float | None) -> None:
+        """ Updates the rating used to rank a book """
+        self._update(lambda state: state.set_rating(book_id, rating))
+
+    @staticmethod
+    def _expand(state: _SearchState, token: str) -> list[str]:
+        """ Indexed words starting with the given prefix """
+        if state.vocabulary_dirty:
+            state.vocabulary = sorted(state.postings)
+            state.vocabulary_dirty = False
+        start = bisect_left(state.vocabulary, token)
+        matches = []
+        for word in state.vocabulary[start:]:
+            if not word.startswith(token):
+                break
+            matches.append(word)
+        return matches
+
+    def search(self, keyword: str, *, skip: int = 0, limit: int = 5) -> tuple[list[int], int]:
+        """
+        Finds the books containing every word of the keyword, the last one as a prefix.
+
+        Results are ranked by a tf-idf relevance, normalized to the best match and blended with
+        the book rating according to ``rating_weight``.
+
+        Args:
+            keyword (str): The text typed by the user.
+            skip (int, optional): The number of results to skip (default is 0).
+            limit (int, optional): The maximum number of results to return (default is 5).
+
+        Returns:
+            tuple[list[int], int]: The IDs of the page of books, best first, and the total number of matches.
+        """
+        tokens = tokenize(keyword)
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            state = self._state
+            total_books = max(len(state.tokens), 1)
+            scores: dict[int, float] | None = None
+            for position, token in enumerate(tokens):
+                # The last word may still be being typed
+                words = self._expand(state, token) if position == len(tokens) - 1 else [token]
+                token_scores: dict[int, float] = defaultdict(float)
+                for word in words:
+                    postings = state.postings.get(word, {})
+                    idf = math.log(1 + total_books / (1 + len(postings)))
+                    for book_id, weight in postings.items():
+                        token_scores[book_id] = max(token_scores[book_id], weight * idf)
+
+                if scores is None:
+                    scores = dict(token_scores)
+                else:
+                    scores = {book_id: score + token_scores[book_id]
+                              for book_id, score in scores.items() if book_id in token_scores}
+                if not scores:
+                    return [], 0
+
+            best = max(scores.values())
+            ranked = sorted(
+                scores,
+                key=lambda book_id: (
+                    (1 - self.rating_weight) * scores[book_id] / best
+                    + self.rating_weight * state.ratings.get(book_id, 0) / 5,
+                    -book_id,
+                ),
+                reverse=True,
+            )
+
+        return ranked[skip:skip + limit], len(ranked)
+
+
+search_index = BookSearchIndex(ttl=settings.SEARCH_INDEX_TTL, rating_weight=settings.SEARCH_RATING_WEIGHT)
@@ -3,11 +3,8 @@ from datetime import datetime, timedelta
 from typing import Any
 
 from jose import jwt
-from passlib.context import CryptContext
-
 from app.core.config import settings
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.hashing import password_hasher, pwd_context
 
 
 ALGORITHM = "HS256"
@@ -41,7 +38,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True if the passwords match, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
@@ -54,4 +51,4 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
@@ -0,0 +1,161 @@
+""" Coalescing of identical concurrent calls """
+import functools
+import inspect
+import threading
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any
+
+from app.core.bridge import in_bridge, on_event_loop, run_blocking
+from app.core.config import settings
+
+
+class _Call:
+    """ Call in flight, whose outcome is shared with the callers waiting on it """
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread safe group sharing one execution between identical concurrent calls.
+
+    The first caller of a key runs the function while the callers arriving before it
+    returns wait for its result, or its exception, instead of running it again. A caller
+    waits at most ``timeout`` seconds and then runs the function itself. The routes served
+    with `DB_ASYNC` wait on the threadpool, other calls made from the event loop thread are
+    never made to wait.
+    """
+
+    def __init__(self, *, timeout: float, enabled: bool = True):
+        self.timeout = timeout
+        self.enabled = enabled
+        self._in_flight: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+        # Monitoring counters
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._timeouts = 0
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Runs the function, or waits for the result of the identical call in flight.
+
+        Args:
+            key (Hashable): Identifies the calls returning the same result.
+            function (Callable): The call to run, without arguments.
+
+        Returns:
+            The result of the function, possibly the one of another caller.
+        """
+        # Waiting on the event loop would block the call waited for, the routes run by
+        # `run_sync` wait on the threadpool instead
+        can_wait = in_bridge() or not on_event_loop()
+        with self._lock:
+            self._calls += 1
+            call = self._in_flight.get(key) if self.enabled else None
+            leader = self.enabled and call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+            if call is None or leader or not can_wait:
+                self._executions += 1
+
+        if not self.enabled or (not leader and not can_wait):
+            return function()
+
+        if leader:
+            try:
+                call.result = function()
+                return call.result
+            except BaseException as error:
+                call.error = error
+                raise
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+
+        if not run_blocking(call.done.wait, self.timeout):
+            with self._lock:
+                self._executions += 1
+                self._timeouts += 1
+            return function()
+
+        with self._lock:
+            self._coalesced += 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the group for monitoring.
+
+        Returns:
+            dict: The calls made, the executions they needed, the calls served with the result
+            of another one and the calls that stopped waiting.
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._in_flight),
+                "calls": self._calls,
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "timeouts": self._timeouts,
+            }
+
+
+def _freeze(value: Any) -> Hashable:
+    """ Hashable equivalent of an argument, lists and sets become tuples """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
+
+def coalesced(group: SingleFlight, *, versions=None, tags: Iterable[str] = ()) -> Callable:
+    """
+    Coalesces the identical concurrent calls of a CRUD read function.
+
+    Calls are identical when every argument but the ``cursor`` is equal, the callers waiting
+    get the result read with the cursor of the first one. Only reads that do not depend on the
+    transaction of the caller may be coalesced. With ``versions``, the current versions of the
+    ``tags`` are part of the key: a call only joins a flight started after the last
+    invalidation of the data it reads, never one that may miss a committed write.
+
+    Args:
+        group (SingleFlight): The group the calls are coalesced in.
+        versions (TagVersions | None, optional): The versions bumped by the writes.
+        tags (Iterable[str], optional): The tags of the data read by the function.
+
+    Returns:
+        Callable: The decorator.
+    """
+    tags = tuple(tags)
+
+    def decorator(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (function.__qualname__, *(
+                (name, _freeze(value)) for name, value in bound.arguments.items() if name != "cursor"
+            ))
+            if versions is not None:
+                key += (versions.snapshot(tags),)
+            return group.do(key, functools.partial(function, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+crud_reads = SingleFlight(timeout=settings.SINGLE_FLIGHT_TIMEOUT, enabled=settings.SINGLE_FLIGHT_ENABLED)
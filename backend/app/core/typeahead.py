@@ -0,0 +1,252 @@
+""" In-memory prefix indexes serving the autocomplete endpoints """
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections.abc import Callable
+
+from app.core.config import settings
+from app.core.refresh import BackgroundRefresh
+from app.core.search import tokenize
+
+# Longest indexed key, prefixes typed beyond it can not match
+MAX_KEY_LENGTH = 64
+# Completions of prefixes up to this length are cached until the next write
+CACHED_PREFIX_LENGTH = 2
+
+
+def normalize_phrase(text: str | None) -> str:
+    """ Folds case and accents and collapses punctuation and spaces into single spaces """
+    return " ".join(tokenize(text))
+
+
+def word_suffixes(text: str | None) -> set[str]:
+    """
+    Returns the normalized text from each of its word starts, so that typing any word of a
+    title, or several consecutive ones, finds it.
+
+    Args:
+        text (str | None): The text to index.
+
+    Returns:
+        set[str]: The keys under which the text has to be indexed.
+    """
+    phrase = normalize_phrase(text)
+    suffixes = set()
+    start = 0
+    while phrase:
+        suffixes.add(phrase[start:start + MAX_KEY_LENGTH])
+        start = phrase.find(" ", start) + 1
+        if not start:
+            break
+    return suffixes
+
+
+class _PrefixState:
+    """ Entries of one version of a prefix index, only modified under the lock of its index """
+
+    def __init__(self, entries: list[tuple[str, int]] | None = None, keys: dict[int, set[str]] | None = None,
+                 scores: dict[int, float] | None = None):
+        self.entries = entries or []
+        self.keys = keys or {}
+        self.scores = scores or {}
+        self.cache: dict[tuple[str, int], list[int]] = {}
+
+    def remove(self, item_id: int) -> None:
+        for key in self.keys.pop(item_id, ()):
+            position = bisect_left(self.entries, (key, item_id))
+            if position < len(self.entries) and self.entries[position] == (key, item_id):
+                del self.entries[position]
+        self.scores.pop(item_id, None)
+        self.cache = {}
+
+    def add(self, item_id: int, keys: set[str], score: float | None) -> None:
+        if score is None:
+            score = self.scores.get(item_id, 0.0)
+        self.remove(item_id)
+        for key in keys:
+            insort(self.entries, (key, item_id))
+        self.keys[item_id] = keys
+        self.scores[item_id] = float(score)
+
+    def set_score(self, item_id: int, score: float | None) -> None:
+        if item_id in self.scores:
+            self.scores[item_id] = float(score or 0)
+            self.cache = {}
+
+
+class PrefixIndex:
+    """
+    Sorted array of (key, id) pairs searched with bisect.
+
+    Items are loaded with ``query``, which must select the item id, its ranking score and
+    the texts to index, in that order. Like the search index it is reloaded in the background
+    every ``ttl`` seconds once started, swapping the new version in at once, and kept up to
+    date by the CRUD writes after their transaction commits.
+    """
+
+    def __init__(self, *, query: str, ttl: float, name: str = "autocomplete index"):
+        self.query = query
+        self.ttl = ttl
+        self._state = _PrefixState()
+        self._built = False
+        self._stale = False
+        # Updates made since the running build started reading the items
+        self._journal: list[Callable[[_PrefixState], None]] | None = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.refresher = BackgroundRefresh(self.build, interval=ttl, name=name)
+
+    def build(self, *, cursor) -> None:
+        """
+        Loads every item from the database into a new version of the index.
+
+        Completions keep using the current version until the new one is swapped in.
+
+        Args:
+            cursor: The database cursor used to run ``query``.
+        """
+        with self._build_lock:
+            self._build(cursor)
+
+    def _build(self, cursor) -> None:
+        with self._lock:
+            # Invalidations from now on are not covered by this build
+            self._journal, self._stale = [], False
+        try:
+            cursor.execute(self.query)
+            rows = cursor.fetchall()
+
+            keys: dict[int, set[str]] = {}
+            scores: dict[int, float] = {}
+            for row in rows:
+                keys[row[0]] = set().union(*(word_suffixes(text) for text in row[2:]))
+                scores[row[0]] = float(row[1] or 0)
+            entries = sorted((key, item_id) for item_id, item_keys in keys.items() for key in item_keys)
+            state = _PrefixState(entries, keys, scores)
+
+            with self._lock:
+                for update in self._journal:
+                    update(state)
+                self._state, self._built = state, True
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def ensure_built(self, *, cursor) -> None:
+        """
+        Builds the index if it was never built, or invalidated, while no background refresh runs.
+
+        Callers arriving while the index is built do not wait for it and use the current version.
+        """
+        with self._lock:
+            ready = self._built and not self._stale
+        if ready:
+            return
+        if self.refresher.running:
+            # The startup build failed, the background thread retries it off the request path
+            self.refresher.request()
+            return
+        if not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                ready = self._built and not self._stale
+            if not ready:
+                self._build(cursor)
+        finally:
+            self._build_lock.release()
+
+    def start(self, connection_factory: Callable) -> None:
+        """ Builds the index and rebuilds it in the background every ``ttl`` seconds """
+        self.refresher.start(connection_factory)
+
+    def stop(self) -> None:
+        """ Stops the background rebuilds """
+        self.refresher.stop()
+
+    def invalidate(self) -> None:
+        """ Rebuilds the index after writes it was not told about, e.g. a bulk import """
+        if self.refresher.running:
+            self.refresher.request()
+        else:
+            with self._lock:
+                self._stale = True
+
+    def _update(self, update: Callable[[_PrefixState], None]) -> None:
+        """ Applies an update to the current version and to the one being built, if any """
+        with self._lock:
+            update(self._state)
+            if self._journal is not None:
+                self._journal.append(update)
+
+    def add(self, item_id: int, texts: list[str | None], score: float | None = None) -> None:
+        """
+        Indexes a new item, or replaces the texts of an existing one.
+
+        Args:
+            item_id (int): The ID of the item.
+            texts (list[str | None]): The texts the item can be found by.
+            score (float | None): The ranking score, higher first. Keeps the current one if None.
+        """
+        with self._lock:
+            # Committed items are read by any build starting from now on
+            if not self._built and self._journal is None:
+                return
+        keys = set().union(*(word_suffixes(text) for text in texts))
+        self._update(lambda state: state.add(item_id, keys, score))
+
+    def remove(self, item_id: int) -> None:
+        """ Removes a deleted item from the index """
+        self._update(lambda state: state.remove(item_id))
+
+    def set_score(self, item_id: int, score: float | None) -> None:
+        """ Updates the ranking score of an item """
+        self._update(lambda state: state.set_score(item_id, score))
+
+    def complete(self, prefix: str, *, limit: int = 5) -> list[int]:
+        """
+        Finds the items with a text containing a word that starts like the prefix.
+
+        Args:
+            prefix (str): The text typed so far.
+            limit (int, optional): The maximum number of items to return (default is 5).
+
+        Returns:
+            list[int]: The IDs of the best scored matches, alphabetically between equal scores.
+        """
+        prefix = normalize_phrase(prefix)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+
+        with self._lock:
+            state = self._state
+            cached = state.cache.get((prefix, limit))
+            if cached is not None:
+                return list(cached)
+
+            order: dict[int, int] = {}
+            position = bisect_left(state.entries, (prefix,))
+            while position < len(state.entries) and state.entries[position][0].startswith(prefix):
+                order.setdefault(state.entries[position][1], len(order))
+                position += 1
+
+            completions = heapq.nsmallest(
+                limit, order, key=lambda item_id: (-state.scores.get(item_id, 0.0), order[item_id])
+            )
+            if len(prefix) <= CACHED_PREFIX_LENGTH:
+                state.cache[(prefix, limit)] = completions
+
+        return completions
+
+
+book_typeahead = PrefixIndex(
+    query="SELECT IdBook, Rating, Title, Authors FROM Books",
+    ttl=settings.TYPEAHEAD_INDEX_TTL,
+    name="book autocomplete index",
+)
+
+user_typeahead = PrefixIndex(
+    query="SELECT id_user, 0, CONCAT_WS(' ', name, surname), username FROM users",
+    ttl=settings.TYPEAHEAD_INDEX_TTL,
+    name="user autocomplete index",
+)
@@ -0,0 +1,64 @@
+""" Versions of the cached data, used as HTTP validators """
+import hashlib
+import secrets
+import threading
+import time
+from collections.abc import Iterable
+
+
+class TagVersions:
+    """
+    Thread safe counters of the writes made to the data under every cache tag.
+
+    The ETag of a response is derived from the versions of its tags and the Last-Modified
+    from the time they were last bumped. Counters only see the writes of this process, so
+    the validators also change every ``period`` seconds: a write made by another worker is
+    noticed by the clients after at most that long.
+    """
+
+    def __init__(self, *, period: float):
+        self.period = period
+        self._instance = secrets.token_hex(4)
+        self._started_at = time.time()
+        self._versions: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, tags: Iterable[str]) -> None:
+        """ Records a write to the data under the tags """
+        now = time.time()
+        with self._lock:
+            for tag in tags:
+                version, _ = self._versions.get(tag, (0, now))
+                self._versions[tag] = (version + 1, now)
+
+    def snapshot(self, tags: Iterable[str]) -> tuple[int, ...]:
+        """
+        Returns the current versions of the tags, which differ once any of them is bumped.
+
+        Args:
+            tags (Iterable[str]): The tags of a response.
+
+        Returns:
+            tuple[int, ...]: The version of every tag, in order.
+        """
+        with self._lock:
+            return tuple(self._versions.get(tag, (0,))[0] for tag in tags)
+
+    def validators(self, tags: Iterable[str]) -> tuple[str, float]:
+        """
+        Returns the validators of a response built from the data under the tags.
+
+        Args:
+            tags (Iterable[str]): The tags of the response.
+
+        Returns:
+            tuple[str, float]: The weak ETag and the last modification time, as a timestamp.
+        """
+        now = time.time()
+        period_start = now - now % self.period if self.period > 0 else self._started_at
+        with self._lock:
+            versions = [(tag, *self._versions.get(tag, (0, self._started_at))) for tag in tags]
+
+        digest = hashlib.sha1(repr((self._instance, period_start, [v[:2] for v in versions])).encode())
+        last_modified = max([period_start, self._started_at, *(v[2] for v in versions)])
+        return f'W/"{digest.hexdigest()[:20]}"', last_modified
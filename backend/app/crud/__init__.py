@@ -1,5 +1,6 @@
 """ CRUD package """
 # Import all modules
+from . import stats
 from . import user
 from . import book
 from . import rating
@@ -1,7 +1,17 @@
 """ Book related CRUD methods """
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
 from typing import Any
 from datetime import datetime
-from app.models import BookCreate, BookOut, BooksOut, BookUpdate, Book
+from app.models import BookCreate, BookOut, BooksOut, BookUpdate, Book, GenreBooksOut, GenreFacet
+from app.crud.pagination import SortKey, encode_cursor, decode_cursor
+from app.crud.counts import count_cache
+from app.crud.projection import Projection
+from app.core.db import after_commit
+from app.core.response_cache import response_cache
+from app.core.search import search_index
+from app.core.singleflight import coalesced, crud_reads
+from app.core.typeahead import book_typeahead
 
 def create_book(*, cursor, book_in: BookCreate) -> BookOut:
     """
@@ -37,6 +47,19 @@ def create_book(*, cursor, book_in: BookCreate) -> BookOut:
 
     # Get the book ID
     new_book_id = cursor.lastrowid
+    set_book_genres(cursor=cursor, book_id=new_book_id, genres=book_in.genres)
+    after_commit(count_cache.adjust, "Books", 1)
+    after_commit(
+        search_index.add_book,
+        new_book_id,
+        title=book_in.title,
+        authors=book_in.authors,
+        editorial=book_in.editorial,
+        synopsis=book_in.synopsis,
+        rating=book_in.rating
+    )
+    after_commit(book_typeahead.add, new_book_id, [book_in.title, book_in.authors], book_in.rating)
+    after_commit(response_cache.invalidate, "books")
 
     # Prepare the publication date, converting if necessary
     if isinstance(book_in.publication_date, datetime):
@@ -64,6 +87,49 @@ def create_book(*, cursor, book_in: BookCreate) -> BookOut:
 
     return book_out
 
+# Column of 'Books' holding each BookOut field, in table order
+BOOK_COLUMNS = {
+    "id_book": "IdBook",
+    "title": "Title",
+    "authors": "Authors",
+    "synopsis": "Synopsis",
+    "buy_link": "BuyLink",
+    "genres": "Genres",
+    "rating": "Rating",
+    "editorial": "Editorial",
+    "comments": "Comments",
+    "publication_date": "PublicationDate",
+    "image": "Image",
+}
+BOOK_CONVERTERS = {
+    "rating": lambda rating: rating if rating is None else float(rating),
+    "publication_date": lambda date: date.isoformat() if date else None,  # Convertir a string
+}
+# Fields shown on the book cards of the listings
+BOOK_CARD_FIELDS = ("id_book", "title", "authors", "image", "rating")
+
+@lru_cache(maxsize=64)
+def _book_projection(fields: frozenset[str] | None) -> Projection:
+    return Projection(model=BookOut, columns=BOOK_COLUMNS, key="id_book", fields=fields,
+                      converters=BOOK_CONVERTERS)
+
+def book_projection(fields: Iterable[str] | None = None) -> Projection:
+    """
+    Returns the projection of 'Books' selecting only some fields, prepared once per set of fields.
+
+    Args:
+        fields (Iterable[str] | None): The BookOut fields needed, all of them if None. The ID is always included.
+
+    Returns:
+        Projection: The columns to select and the mapper of the rows to BookOut.
+
+    Raises:
+        ValueError: If a field is not a BookOut field.
+    """
+    return _book_projection(None if fields is None else frozenset(fields))
+
+BOOK_PROJECTION = book_projection()
+
 def get_book_by_id(*, cursor, book_id: int) -> Any:
     """
     Retrieves a book from the database by its ID and returns its details.
@@ -76,11 +142,7 @@ def get_book_by_id(*, cursor, book_id: int) -> Any:
         BookOut: An object containing the details of the book if found, or None if the book is not found.
     """
     # Consulta para obtener un libro por su ID
-    query_book = """
-                SELECT IdBook as id_book, Title as title, Authors as authors, Synopsis as synopsis, BuyLink as buy_link, 
-                Genres as genres, Rating as rating, Editorial as editorial, Comments as comments, PublicationDate as publication_date, Image as image from Books
-                WHERE IdBook = %s
-            """
+    query_book = f"SELECT {BOOK_PROJECTION.select()} FROM Books WHERE IdBook = %s"
     cursor.execute(query_book, (book_id,))
     row = cursor.fetchone()
 
@@ -88,21 +150,68 @@ def get_book_by_id(*, cursor, book_id: int) -> Any:
         return None
 
     # Transformar la fila obtenida en un objeto BookOut
-    book_out = BookOut(
-        id_book=row[0],
-        title=row[1],
-        authors=row[2],
-        synopsis=row[3],
-        buy_link=row[4],
-        genres=row[5],
-        rating=row[6],
-        editorial=row[7],
-        comments=row[8],
-        publication_date=row[9].isoformat() if row[9] else None,  # Convertir a string
-        image=row[10]
-    )
+    return book_from_row(row)
 
-    return book_out
+def book_from_row(row) -> BookOut:
+    """
+    Builds a BookOut from a Books row selected in the column order of the table.
+
+    Rows read from the database are trusted, so the model is constructed without validation,
+    which is most of the cost of listing books.
+
+    Args:
+        row (tuple): IdBook, Title, Authors, Synopsis, BuyLink, Genres, Rating, Editorial, Comments, PublicationDate and Image.
+
+    Returns:
+        BookOut: The book represented by the row.
+    """
+    return BOOK_PROJECTION.from_row(row)
+
+def iter_books(*, cursor, batch_size: int = 1000) -> Iterator[tuple]:
+    """
+    Reads the whole catalog in ID order, fetching the rows in batches.
+
+    With an unbuffered cursor the rows are streamed from the server as they are consumed,
+    so memory does not grow with the catalog. The result must be read to the end before the
+    connection is used again.
+
+    Args:
+        cursor: An unbuffered database cursor.
+        batch_size (int, optional): The number of rows fetched at a time (default is 1000).
+
+    Returns:
+        Iterator[tuple]: The Books rows, in the column order expected by `book_from_row`.
+    """
+    cursor.execute(f"SELECT {BOOK_PROJECTION.select()} FROM Books ORDER BY IdBook")
+    while rows := cursor.fetchmany(batch_size):
+        yield from rows
+
+def get_books_by_ids(*, cursor, book_ids: list[int], fields: Iterable[str] | None = None) -> list[BookOut]:
+    """
+    Retrieves several books with a single query, keeping the order of the given IDs.
+
+    Args:
+        cursor: The database cursor object used to execute the query.
+        book_ids (list[int]): The IDs of the books to retrieve.
+        fields (Iterable[str] | None, optional): The fields to retrieve, all of them if None.
+
+    Returns:
+        list[BookOut]: The books found, in the same order as `book_ids`. Missing IDs are skipped.
+    """
+    if not book_ids:
+        return []
+
+    projection = book_projection(fields)
+    unique_ids = list(dict.fromkeys(book_ids))
+    query_books = f"""
+                SELECT {projection.select()}
+                FROM Books
+                WHERE IdBook IN ({', '.join(['%s'] * len(unique_ids))})
+            """
+    cursor.execute(query_books, tuple(unique_ids))
+    books = {row[0]: projection.from_row(row) for row in cursor.fetchall()}
+
+    return [books[book_id] for book_id in book_ids if book_id in books]
 
 def get_book_by_title(*, cursor, book_title: str) -> Any:
     """
@@ -126,158 +235,305 @@ def get_book_by_title(*, cursor, book_title: str) -> Any:
 
     return existing_book
 
-def get_books_by_genres(*, cursor, genres: list[str]) -> BookOut:
+def split_genres(genres: str | None) -> list[str]:
     """
-    Retrieves a list of books from the database that match the specified genres.
+    Splits the comma separated genres of a book, dropping blanks and repetitions.
 
     Args:
-        session (SessionDep): The database session object used to execute the queries.
-        genres (list[str]): A list of genre names to filter the books by.
+        genres (str | None): The value of the `Books.Genres` column.
 
     Returns:
-        BooksOut: A data structure containing a list of `BookOut` objects and the total count of matching books.
+        list[str]: The genre names, in their original order.
+    """
+    return list(dict.fromkeys(name.strip() for name in (genres or "").split(",") if name.strip()))
 
-    Raises:
-        Exception: Potentially raises an exception if there is an error with the database query or connection.
+def set_book_genres(*, cursor, book_id: int, genres: str | None) -> None:
+    """
+    Replaces the rows of a book in 'BookGenres', creating the genres that do not exist yet.
 
-    Notes:
-        - The function dynamically generates a SQL query to filter books based on the provided genres.
-        - The results are returned in the form of `BooksOut`, which includes the books and a total count.
+    Args:
+        cursor: The database cursor used for executing queries.
+        book_id (int): The ID of the book.
+        genres (str | None): The comma separated genres of the book.
+
+    Returns:
+        None
     """
+    cursor.execute("DELETE FROM BookGenres WHERE IdBook = %s", (book_id,))
 
-    # Crear la consulta dinámica para los géneros
-    query_books = f"""
-                SELECT IdBook as id_book, Title as title, Authors as authors, Synopsis as synopsis, BuyLink as buy_link, 
-                Genres as genres, Rating as rating, Editorial as editorial, Comments as comments, PublicationDate as publication_date, Image as image
-                FROM Books
-                WHERE Genres IN ({', '.join(['%s'] * len(genres))})
-            """
+    names = split_genres(genres)
+    if not names:
+        return
 
-    # Ejecutar la consulta con los géneros proporcionados
-    cursor.execute(query_books, tuple(genres))
-    filas = cursor.fetchall()
+    placeholders = ", ".join(["%s"] * len(names))
+    cursor.execute(f"INSERT IGNORE INTO Genres (Name) VALUES {', '.join(['(%s)'] * len(names))}", tuple(names))
+    query_book_genres = f"""
+        INSERT IGNORE INTO BookGenres (IdGenre, IdBook)
+        SELECT IdGenre, %s FROM Genres WHERE Name IN ({placeholders})
+    """
+    cursor.execute(query_book_genres, (book_id, *names))
 
-    # Contar el total de libros
-    query_count = "SELECT COUNT(1) FROM Books WHERE Genres IN ({})".format(', '.join(['%s'] * len(genres)))
-    cursor.execute(query_count, tuple(genres))
-    count = cursor.fetchone()[0]
+def get_existing_titles(*, cursor, titles: list[str]) -> set[str]:
+    """
+    Looks up which of several titles are already in the catalog with a single query.
 
-    # Transformar las filas obtenidas en una lista de objetos BookOut
-    books_data = [
-        BookOut(
-            id_book=row[0],
-            title=row[1],
-            authors=row[2],
-            synopsis=row[3],
-            buy_link=row[4],
-            genres=row[5],
-            rating=row[6],
-            editorial=row[7],
-            comments=row[8],
-            publication_date=row[9].isoformat() if row[9] else None,  # Convertir a string
-            image=row[10]
-        ) for row in filas
-    ]
-
-    return BooksOut(data=books_data, count=count)
-
-def get_books_by_key(*, cursor, keyword: str) -> BookOut:
-    """
-    Retrieves a list of books from the database that match a given keyword in their title or authors.
+    Args:
+        cursor: The database cursor used for executing queries.
+        titles (list[str]): The titles to look up.
+
+    Returns:
+        set[str]: The titles that already exist, casefolded like the database compares them.
+    """
+    if not titles:
+        return set()
+
+    query_titles = f"SELECT Title FROM Books WHERE Title IN ({', '.join(['%s'] * len(titles))})"
+    cursor.execute(query_titles, tuple(titles))
+    return {row[0].casefold() for row in cursor.fetchall()}
+
+def create_books(*, cursor, books: list[BookCreate]) -> list[int]:
+    """
+    Inserts several books and their genres with batched statements.
+
+    The search and autocomplete indexes are dropped rather than updated book by book, they are
+    rebuilt on their next use.
+
+    Args:
+        cursor: The database cursor used for executing queries.
+        books (list[BookCreate]): The books to create, their titles must be new and unique.
+
+    Returns:
+        list[int]: The IDs of the created books, in the order of `books`.
+    """
+    if not books:
+        return []
+
+    query_create_books = """
+        INSERT INTO Books (Title, Authors, Synopsis, BuyLink, Genres, Rating, Editorial, Comments, PublicationDate, Image)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    cursor.executemany(query_create_books, [(
+        book_in.title,
+        book_in.authors,
+        book_in.synopsis,
+        book_in.buy_link,
+        book_in.genres,
+        book_in.rating,
+        book_in.editorial,
+        book_in.comments,
+        book_in.publication_date,
+        book_in.image
+    ) for book_in in books])
+
+    # The IDs of a multi-row insert are not guaranteed to be consecutive, read them back by title
+    titles = [book_in.title for book_in in books]
+    cursor.execute(
+        f"SELECT IdBook, Title FROM Books WHERE Title IN ({', '.join(['%s'] * len(titles))})", tuple(titles))
+    book_ids = {title.casefold(): book_id for book_id, title in cursor.fetchall()}
+    new_ids = [book_ids[title.casefold()] for title in titles]
+
+    book_genres = [(book_id, split_genres(book_in.genres)) for book_id, book_in in zip(new_ids, books)]
+    names = list(dict.fromkeys(name for _, book_names in book_genres for name in book_names))
+    if names:
+        cursor.executemany("INSERT IGNORE INTO Genres (Name) VALUES (%s)", [(name,) for name in names])
+        cursor.execute(
+            f"SELECT IdGenre, Name FROM Genres WHERE Name IN ({', '.join(['%s'] * len(names))})", tuple(names))
+        genre_ids = {name.casefold(): genre_id for genre_id, name in cursor.fetchall()}
+        cursor.executemany(
+            "INSERT IGNORE INTO BookGenres (IdGenre, IdBook) VALUES (%s, %s)",
+            [(genre_ids[name.casefold()], book_id) for book_id, book_names in book_genres for name in book_names]
+        )
+
+    after_commit(count_cache.adjust, "Books", len(books))
+    after_commit(search_index.invalidate)
+    after_commit(book_typeahead.invalidate)
+    after_commit(response_cache.invalidate, "books")
+
+    return new_ids
+
+@coalesced(crud_reads, versions=response_cache.versions, tags=("books",))
+def get_books_by_genres(
+        *, cursor, genres: list[str], skip: int = 0, limit: int = 100,
+        fields: Iterable[str] | None = None) -> GenreBooksOut:
+    """
+    Retrieves the books that belong to any of the specified genres, with pagination support.
+
+    Books are looked up through the indexed 'BookGenres' table, so books with several genres
+    match any of them. Along with the page, a single grouped query returns the number of
+    distinct matching books and, for the genre filters, how many of them have each genre.
+    Only the books matching the filter are aggregated, not the whole 'BookGenres' table.
+
+    Args:
+        cursor: The database cursor used for executing queries.
+        genres (list[str]): A list of genre names to filter the books by.
+        skip (int, optional): The number of books to skip for pagination (default is 0).
+        limit (int, optional): The maximum number of books to retrieve (default is 100).
+        fields (Iterable[str] | None, optional): The fields to retrieve, all of them if None.
+
+    Returns:
+        GenreBooksOut: The page of books ordered by ID, the total count of matching books and
+        the number of matching books of each of their genres.
+    """
+    if not genres:
+        return GenreBooksOut(data=[], count=0)
+
+    projection = book_projection(fields)
+    placeholders = ", ".join(["%s"] * len(genres))
+    matching_books = f"""
+        SELECT bg.IdBook
+        FROM BookGenres bg
+        INNER JOIN Genres g ON g.IdGenre = bg.IdGenre
+        WHERE g.Name IN ({placeholders})
+    """
+
+    query_books = f"""
+        SELECT {projection.select()}
+        FROM Books
+        WHERE IdBook IN ({matching_books})
+        ORDER BY IdBook
+        LIMIT %s OFFSET %s
+    """
+    cursor.execute(query_books, (*genres, limit, skip))
+    rows = cursor.fetchall()
+
+    # One row per genre of the matching books plus a last one, with a NULL name, holding their number
+    query_facets = f"""
+        SELECT g.Name, COUNT(1)
+        FROM (SELECT DISTINCT IdBook FROM ({matching_books}) matches) books
+        INNER JOIN BookGenres bg ON bg.IdBook = books.IdBook
+        INNER JOIN Genres g ON g.IdGenre = bg.IdGenre
+        GROUP BY g.IdGenre, g.Name
+        UNION ALL
+        SELECT NULL, COUNT(DISTINCT IdBook)
+        FROM ({matching_books}) matches
+    """
+    cursor.execute(query_facets, (*genres, *genres))
+    count = 0
+    facets = []
+    for name, genre_count in cursor.fetchall():
+        if name is None:
+            count = genre_count
+        else:
+            facets.append(GenreFacet(genre=name, count=genre_count))
+
+    return GenreBooksOut(data=[projection.from_row(row) for row in rows], count=count, facets=facets)
+
+def get_books_by_key(
+        *, cursor, keyword: str, skip: int = 0, limit: int = 5, include_count: bool = True,
+        fields: Iterable[str] | None = None) -> BookOut:
+    """
+    Searches the books whose title, authors, editorial or synopsis contain the words of a keyword.
+
+    Matches are ranked by relevance blended with the book rating using the in-process search index.
 
     Args:
         cursor: The database cursor object used to execute the queries.
-        keyword (str): The keyword to search for in the book titles and authors.
+        keyword (str): The text to search for, its last word may be incomplete.
+        skip (int, optional): The number of matches to skip for pagination (default is 0).
+        limit (int, optional): The maximum number of books to retrieve (default is 5).
+        include_count (bool, optional): Whether to return the total count of matches (default is True).
+        fields (Iterable[str] | None, optional): The fields to retrieve, all of them if None.
 
     Returns:
-        BooksOut: A data structure containing a list of `BookOut` objects and the total count of all books.
+        BooksOut: A data structure containing a list of `BookOut` objects and the total count of matching books.
     """
-    # Crear la consulta de búsqueda
-    query = """
-                   SELECT IdBook, Title, Authors, Synopsis, BuyLink, Genres, Rating, Editorial, Comments, PublicationDate, Image
-                   FROM Books
-                   WHERE Title LIKE %s OR Authors LIKE %s
-                   ORDER BY Rating DESC
-                   LIMIT 5
-               """
+    search_index.ensure_built(cursor=cursor)
+    book_ids, count = search_index.search(keyword, skip=skip, limit=limit)
 
-    # Preparar el parámetro de búsqueda con el carácter comodín
-    search_param = f"%{keyword}%"
+    books_data = get_books_by_ids(cursor=cursor, book_ids=book_ids, fields=fields)
 
-    # Ejecutar la consulta
-    cursor.execute(query, (search_param, search_param))
+    return BooksOut(data=books_data, count=count if include_count else None)
 
-    # Obtener los resultados
-    resultados = cursor.fetchall()
+def get_book_completions(
+        *, cursor, prefix: str, limit: int = 5, fields: Iterable[str] | None = BOOK_CARD_FIELDS) -> BooksOut:
+    """
+    Retrieves the best rated books with a word of their title or authors starting like the prefix.
 
-    # Contar el total de libros
-    query_count = "SELECT COUNT(1) FROM Books"
-    cursor.execute(query_count)
-    count = cursor.fetchone()[0]
-
-    books_data = [
-        BookOut(
-            id_book=row[0],
-            title=row[1],
-            authors=row[2],
-            synopsis=row[3],
-            buy_link=row[4],
-            genres=row[5],
-            rating=row[6],
-            editorial=row[7],
-            comments=row[8],
-            publication_date=row[9].isoformat() if row[9] else None,  # Convertir a string
-            image=row[10]
-        ) for row in resultados
-    ]
-
-    return BooksOut(data=books_data, count=count)
-
-def get_all_books(*, cursor, skip: int = 0, limit: int = 100) -> Any:
+    Args:
+        cursor: The database cursor object used to execute the queries.
+        prefix (str): The text typed so far, case and accents are ignored.
+        limit (int, optional): The maximum number of books to retrieve (default is 5).
+        fields (Iterable[str] | None, optional): The fields to retrieve, all of them if None (default is `BOOK_CARD_FIELDS`).
+
+    Returns:
+        BooksOut: A data structure containing a list of `BookOut` objects and the number of books returned.
+    """
+    book_typeahead.ensure_built(cursor=cursor)
+    books_data = get_books_by_ids(cursor=cursor, book_ids=book_typeahead.complete(prefix, limit=limit), fields=fields)
+
+    return BooksOut(data=books_data, count=len(books_data))
+
+BOOK_SORT_KEYS = {
+    "id": SortKey(column="IdBook", id_column="IdBook"),
+    "rating": SortKey(column="Rating", id_column="IdBook", descending=True, nullable=True),
+    "publication_date": SortKey(column="PublicationDate", id_column="IdBook", descending=True, nullable=True),
+}
+# BookOut field of each sort key
+BOOK_SORT_FIELDS = {"id": "id_book", "rating": "rating", "publication_date": "publication_date"}
+
+@coalesced(crud_reads, versions=response_cache.versions, tags=("books",))
+def get_all_books(
+        *, cursor, skip: int = 0, limit: int = 100, sort: str = "id", after: str | None = None,
+        include_count: bool = True, fields: Iterable[str] | None = None) -> Any:
     """
     Retrieves all books from the database with pagination support.
 
+    Pages can be requested either with `skip`/`limit` or, to avoid scanning the skipped rows, with
+    the `next_cursor` returned by the previous page passed as `after`.
+
     Args:
         session (SessionDep): The database session used for database interactions.
-        skip (int, optional): The number of books to skip for pagination (default is 0).
+        skip (int, optional): The number of books to skip for pagination (default is 0). Ignored when `after` is given.
         limit (int, optional): The maximum number of books to retrieve (default is 100).
+        sort (str, optional): The order of the books, one of `BOOK_SORT_KEYS` (default is "id").
+        after (str, optional): Cursor returned by the previous page.
+        include_count (bool, optional): Whether to return the total count of books (default is True).
+        fields (Iterable[str] | None, optional): The fields to retrieve, along with the sort key, all of them if None.
 
     Returns:
-        Any: An object containing the list of books and the total count of books in the database.
+        Any: An object containing the list of books, the total count of books in the database and the cursor of the next page.
+
+    Raises:
+        ValueError: If `sort` is unknown or `after` is not a valid cursor for it.
     """
+    if sort not in BOOK_SORT_KEYS:
+        raise ValueError(f"Invalid sort order {sort}. Valid options are {list(BOOK_SORT_KEYS)}")
+    sort_key = BOOK_SORT_KEYS[sort]
+    # The sort key is always selected, for the cursor of the next page
+    sort_field = BOOK_SORT_FIELDS[sort]
+    projection = book_projection(None if fields is None else {*fields, sort_field})
 
     # Consulta para obtener los libros con paginación
-    query_books = """
-                SELECT IdBook as id_book, Title as title, Authors as authors, Synopsis as synopsis, BuyLink as buy_link, 
-                Genres as genres, Rating as rating, Editorial as editorial, Comments as comments, PublicationDate as publication_date, Image as image from Books
+    if after:
+        key, last_id = decode_cursor(after, sort=sort)
+        condition, params = sort_key.after(key, last_id)
+        query_books = f"""
+                SELECT {projection.select()} FROM Books
+                WHERE {condition}
+                {sort_key.order_by()}
+                LIMIT %s;
+            """
+        cursor.execute(query_books, params + (limit,))
+    else:
+        query_books = f"""
+                SELECT {projection.select()} FROM Books
+                {sort_key.order_by()}
                 LIMIT %s OFFSET %s;
             """
-    cursor.execute(query_books, (limit, skip))
-    # cursor.execute(query_books)
+        cursor.execute(query_books, (limit, skip))
     filas = cursor.fetchall()
 
     # Contar el total de libros
-    query_count = "SELECT COUNT(1) FROM Books"
-    cursor.execute(query_count)
-    count = cursor.fetchone()[0]
+    count = count_cache.get(cursor=cursor, table="Books") if include_count else None
     # Transformar las filas obtenidas en una lista de objetos BookOut
-    books_data = [
-        BookOut(
-            id_book=row[0],
-            title=row[1],
-            authors=row[2],
-            synopsis=row[3],
-            buy_link=row[4],
-            genres=row[5],
-            rating=row[6],
-            editorial=row[7],
-            comments=row[8],
-            publication_date=row[9].isoformat() if row[9] else None,  # Convertir a string
-            image=row[10]
-        ) for row in filas
-    ]
-
-    return BooksOut(data=books_data, count=count)
+    books_data = [projection.from_row(row) for row in filas]
+
+    next_cursor = None
+    if limit and len(filas) == limit:
+        last = filas[-1]
+        next_cursor = encode_cursor(sort=sort, key=last[projection.fields.index(sort_field)], last_id=last[0])
+
+    return BooksOut(data=books_data, count=count, next_cursor=next_cursor)
 
 def update_book(*, cursor, book_id: int, book_in: BookUpdate) -> BookOut:
     """
@@ -293,8 +549,10 @@ def update_book(*, cursor, book_id: int, book_in: BookUpdate) -> BookOut:
     """
 
     # Actualizar el libro
+    # Rating stays derived from the aggregates, the given one only applies to a book without ratings
     query_update_book = """
-                UPDATE Books SET Title = %s, Authors = %s, Synopsis = %s, BuyLink = %s, Genres = %s, Rating = %s,
+                UPDATE Books SET Title = %s, Authors = %s, Synopsis = %s, BuyLink = %s, Genres = %s,
+                Rating = IF(RatingCount > 0, RatingSum / RatingCount, %s),
                 Editorial = %s, Comments = %s, PublicationDate = %s, Image = %s
                 WHERE IdBook = %s
             """
@@ -311,6 +569,21 @@ def update_book(*, cursor, book_id: int, book_in: BookUpdate) -> BookOut:
         book_in.image,
         book_id
     ))
+    cursor.execute("SELECT Rating FROM Books WHERE IdBook = %s", (book_id,))
+    row = cursor.fetchone()
+    rating = row[0] if row else book_in.rating
+    set_book_genres(cursor=cursor, book_id=book_id, genres=book_in.genres)
+    after_commit(
+        search_index.add_book,
+        book_id,
+        title=book_in.title,
+        authors=book_in.authors,
+        editorial=book_in.editorial,
+        synopsis=book_in.synopsis,
+        rating=rating
+    )
+    after_commit(book_typeahead.add, book_id, [book_in.title, book_in.authors], rating)
+    after_commit(response_cache.invalidate, "books", f"book:{book_id}")
 
     # Transformar la fila obtenida en un objeto BookOut
     book_out = BookOut(
@@ -320,7 +593,7 @@ def update_book(*, cursor, book_id: int, book_in: BookUpdate) -> BookOut:
         synopsis=book_in.synopsis,
         buy_link=book_in.buy_link,
         genres=book_in.genres,
-        rating=book_in.rating,
+        rating=rating,
         editorial=book_in.editorial,
         comments=book_in.comments,
         publication_date=book_in.publication_date,
@@ -345,20 +618,10 @@ def delete_book(*, cursor, book_id: int) -> None:
     """
 
     # Eliminar el libro
+    # Its 'BookGenres' rows are removed by the foreign key cascade
     query_delete_book = "DELETE FROM Books WHERE IdBook = %s"
     cursor.execute(query_delete_book, (book_id,))
-
-def update_avg(*, cursor, id_book,  avg_rating) -> None:
-    """
-    Updates the average rating of a book in the database.
-
-    Args:
-        cursor (cursor): The database cursor for executing the SQL query.
-        id_book (int): The ID of the book whose rating needs to be updated.
-        avg_rating (float): The new average rating to be set for the book.
-
-    Returns:
-        None
-    """
-    query_update_book = "UPDATE Books SET Rating = %s WHERE IdBook = %s"
-    cursor.execute(query_update_book, (avg_rating, id_book))
+    after_commit(count_cache.adjust, "Books", -1)
+    after_commit(search_index.remove_book, book_id)
+    after_commit(book_typeahead.remove, book_id)
+    after_commit(response_cache.invalidate, "books", f"book:{book_id}", f"ratings:{book_id}")
@@ -0,0 +1,71 @@
+""" Cached table row counts """
+import threading
+import time
+
+from app.core.config import settings
+
+
+class CountCache:
+    """
+    Keeps the number of rows of the listed tables in memory.
+
+    Counts are adjusted by the CRUD methods that insert or delete rows, and read again from
+    the database once they are older than ``ttl`` seconds, which also corrects any drift from
+    rolled back transactions or rows written outside the application.
+    """
+
+    TABLES = ("Books", "users")
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._counts: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, *, cursor, table: str) -> int:
+        """
+        Returns the number of rows of a table, counting them only if the cached value expired.
+
+        Args:
+            cursor: The database cursor used if the table has to be counted.
+            table (str): One of `TABLES`.
+
+        Returns:
+            int: The number of rows of the table.
+        """
+        if table not in self.TABLES:
+            raise ValueError(f"Counts of table {table} are not cached")
+
+        with self._lock:
+            cached = self._counts.get(table)
+        if cached and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+
+        cursor.execute(f"SELECT COUNT(1) FROM {table}")
+        count = cursor.fetchone()[0]
+        with self._lock:
+            self._counts[table] = (count, time.monotonic())
+        return count
+
+    def adjust(self, table: str, delta: int) -> None:
+        """
+        Applies the rows inserted (positive delta) or deleted (negative delta) to a cached count.
+
+        Args:
+            table (str): The table that was written.
+            delta (int): The change in its number of rows.
+        """
+        with self._lock:
+            cached = self._counts.get(table)
+            if cached:
+                self._counts[table] = (max(0, cached[0] + delta), cached[1])
+
+    def invalidate(self, table: str | None = None) -> None:
+        """ Forgets the count of a table, or of every table if none is given """
+        with self._lock:
+            if table is None:
+                self._counts.clear()
+            else:
+                self._counts.pop(table, None)
+
+
+count_cache = CountCache(ttl=settings.COUNT_CACHE_TTL)
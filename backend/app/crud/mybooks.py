@@ -1,5 +1,8 @@
 """ MyBooks related CRUD methods """
-from app.models import MyBookCreate, MyBookOut, MyBooksOut
+from app.models import MyBookCreate, MyBookOut, MyBooksOut, BooksOut
+from app.crud.book import book_projection
+from app.crud.stats import invalidate_user_stats
+from collections.abc import Iterable
 from typing import Any
 
 def create_mybook(*, cursor, mybook_in: MyBookCreate) -> MyBookOut:
@@ -21,6 +24,8 @@ def create_mybook(*, cursor, mybook_in: MyBookCreate) -> MyBookOut:
 
     cursor.execute(query_create_mybook, (mybook_in.id_user, mybook_in.id_book))
 
+    invalidate_user_stats(mybook_in.id_user)
+
     # Get the new entry ID
     new_mybook_id = cursor.lastrowid
 
@@ -50,6 +55,7 @@ def delete_user_book(*, cursor, id_user: int, id_book: int) -> bool:
         WHERE id_user = %s AND idBook = %s
     """
     cursor.execute(query_delete_user_book, (id_user, id_book))
+    invalidate_user_stats(id_user)
 
     # Verifica si se eliminó alguna fila (es decir, si se encontró y eliminó la coincidencia)
     return cursor.rowcount > 0
@@ -91,3 +97,42 @@ def get_mybooks(*, cursor, id_user: int) -> Any:
         return MyBooksOut(data=mybooks_out, count=count)
     else:
         return None
+
+def get_mybooks_books(
+        *, cursor, id_user: int, skip: int = 0, limit: int = 100,
+        fields: Iterable[str] | None = None) -> BooksOut:
+    """
+    Retrieves the books saved by a user joining 'mybooks' with 'Books', with pagination support.
+
+    Args:
+        cursor: The database cursor to interact with the database.
+        id_user (int): The ID of the user.
+        skip (int, optional): The number of books to skip for pagination (default is 0).
+        limit (int, optional): The maximum number of books to retrieve (default is 100).
+        fields (Iterable[str] | None, optional): The fields to retrieve, all of them if None.
+
+    Returns:
+        BooksOut: The page of books, in the order they were saved, and the total number of saved books.
+    """
+    projection = book_projection(fields)
+    query_books = f"""
+        SELECT {projection.select("b")}
+        FROM mybooks m
+        INNER JOIN Books b ON b.IdBook = m.idBook
+        WHERE m.id_user = %s
+        ORDER BY m.id_entry
+        LIMIT %s OFFSET %s
+    """
+    cursor.execute(query_books, (id_user, limit, skip))
+    rows = cursor.fetchall()
+
+    query_count = """
+        SELECT COUNT(1)
+        FROM mybooks m
+        INNER JOIN Books b ON b.IdBook = m.idBook
+        WHERE m.id_user = %s
+    """
+    cursor.execute(query_count, (id_user,))
+    count = cursor.fetchone()[0]
+
+    return BooksOut(data=[projection.from_row(row) for row in rows], count=count)
@@ -0,0 +1,107 @@
+""" Keyset (cursor) pagination helpers """
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Any
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """
+    Column used to order a listing, always tie-broken by a unique id column.
+
+    NULL keys of a ``nullable`` column sort below every value, as MySQL orders them: first in
+    ascending listings and last in descending ones.
+    """
+    column: str
+    id_column: str
+    descending: bool = False
+    nullable: bool = False
+
+    def order_by(self) -> str:
+        """ ORDER BY clause giving a stable order for the listing """
+        direction = "DESC" if self.descending else "ASC"
+        if self.column == self.id_column:
+            return f"ORDER BY {self.id_column} {direction}"
+        return f"ORDER BY {self.column} {direction}, {self.id_column} {direction}"
+
+    def after(self, key: Any, last_id: int) -> tuple[str, tuple]:
+        """
+        Condition selecting the rows that come after (key, last_id) in the listing order.
+
+        Args:
+            key (Any): The sort key of the last row already returned.
+            last_id (int): The id of the last row already returned.
+
+        Returns:
+            tuple[str, tuple]: The SQL condition and its parameters.
+        """
+        op = "<" if self.descending else ">"
+        if self.column == self.id_column:
+            return f"{self.id_column} {op} %s", (last_id,)
+        if self.nullable and key is None:
+            condition = f"({self.column} IS NULL AND {self.id_column} {op} %s)"
+            # Ascending listings continue with the non NULL keys
+            if not self.descending:
+                condition = f"({condition[1:-1]} OR {self.column} IS NOT NULL)"
+            return condition, (last_id,)
+        condition = f"({self.column} {op} %s OR ({self.column} = %s AND {self.id_column} {op} %s))"
+        # Descending listings end with the NULL keys
+        if self.nullable and self.descending:
+            condition = f"({condition[1:-1]} OR {self.column} IS NULL)"
+        return condition, (key, key, last_id)
+
+
+def _json_key(value: Any) -> Any:
+    """ Converts a sort key read from MySQL into a JSON friendly value """
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(*, sort: str, key: Any, last_id: int) -> str:
+    """
+    Builds the opaque token pointing right after the given row.
+
+    Args:
+        sort (str): The name of the sort order the token belongs to.
+        key (Any): The sort key of the last row returned.
+        last_id (int): The id of the last row returned.
+
+    Returns:
+        str: An URL safe token to be sent back as `after`.
+    """
+    payload = json.dumps({"s": sort, "k": _json_key(key), "i": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, *, sort: str) -> tuple[Any, int]:
+    """
+    Reads back a token built by `encode_cursor`.
+
+    Args:
+        token (str): The token received as `after`.
+        sort (str): The sort order of the current request.
+
+    Returns:
+        tuple[Any, int]: The sort key and the id of the last row already returned.
+
+    Raises:
+        ValueError: If the token is malformed or was issued for another sort order.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key, last_id, token_sort = payload["k"], int(payload["i"]), payload["s"]
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid pagination cursor.")
+
+    if token_sort != sort:
+        raise ValueError("The pagination cursor was issued for another sort order.")
+
+    return key, last_id
@@ -0,0 +1,70 @@
+""" Column projections mapping selected columns to model fields """
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class Projection:
+    """
+    Subset of the columns of a table and the mapper from its rows to a model.
+
+    The columns are selected in table order, always starting with the ``key`` field, and the
+    mapper is prepared once so that rows are converted without looking fields up. Models
+    built from a partial projection only hold the selected fields: the others are missing
+    rather than None, so they are left out of the responses.
+    """
+
+    def __init__(
+        self,
+        *,
+        model: type[BaseModel],
+        columns: dict[str, str],
+        key: str,
+        fields: Iterable[str] | None = None,
+        converters: dict[str, Callable[[Any], Any]] | None = None,
+    ):
+        requested = set(columns if fields is None else fields)
+        unknown = requested - set(columns)
+        if unknown:
+            raise ValueError(f"Invalid fields {sorted(unknown)}. Valid options are {list(columns)}")
+
+        self.model = model
+        self.fields = (key, *(field for field in columns if field in requested and field != key))
+        self._columns = [columns[field] for field in self.fields]
+        converters = converters or {}
+        self._mapping = [(field, converters.get(field)) for field in self.fields]
+        self._omitted = [field for field in model.model_fields if field not in self.fields]
+
+    def select(self, alias: str | None = None) -> str:
+        """
+        Column list of the projection for a SELECT clause.
+
+        Args:
+            alias (str | None): The alias of the table in the query, if any.
+
+        Returns:
+            str: The qualified columns separated by commas.
+        """
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(prefix + column for column in self._columns)
+
+    def from_row(self, row) -> Any:
+        """
+        Builds a model, without validating it, from a trusted row.
+
+        Args:
+            row (tuple): The selected columns first, in the order of `fields`. Any
+                following columns are ignored.
+
+        Returns:
+            The model holding the selected fields.
+        """
+        values = {
+            field: value if convert is None else convert(value)
+            for (field, convert), value in zip(self._mapping, row)
+        }
+        model = self.model.model_construct(**values)
+        for field in self._omitted:
+            model.__dict__.pop(field, None)
+        return model
@@ -1,6 +1,17 @@
 """ User related CRUD methods """
+from collections.abc import Iterable
 from typing import Any
 
+from app.crud.book import book_projection
+from app.crud.pagination import SortKey, encode_cursor, decode_cursor
+from app.core.response_cache import response_cache
+from app.core.search import search_index
+from app.core.typeahead import book_typeahead
+from app.core.config import settings
+from app.core.db import after_commit, get_pool
+from app.core.rating_queue import RatingAggregator
+from app.crud.stats import invalidate_user_stats
+
 def create_rating(*, cursor, id: int, user_id: int, comment: str, rating: int) -> None:
     """
     Inserts a new comment and rating for a specific book into the database and updates the book's average rating.
@@ -21,13 +32,75 @@ def create_rating(*, cursor, id: int, user_id: int, comment: str, rating: int) -
                     VALUES (%s, %s, %s, %s)
                 """
     cursor.execute(query_insert, (user_id, id, comment, rating))
+    invalidate_user_stats(user_id)
+    after_commit(response_cache.invalidate, f"ratings:{id}")
+
+    record_rating_delta(cursor=cursor, book_id=id, rating_sum=rating, rating_count=1)
+
+def record_rating_delta(*, cursor, book_id: int, rating_sum: int, rating_count: int) -> None:
+    """
+    Applies a rating delta to a book, or queues it when the write-behind mode is enabled.
+
+    Queued deltas are coalesced per book and applied by `rating_aggregator` in the background, so
+    concurrent comments on the same book do not wait on its row lock. The delta is only queued
+    once the transaction of the caller commits. If the queue is full the delta is applied right
+    away, in that transaction.
+
+    Args:
+        cursor (cursor): The database cursor for executing the SQL queries.
+        book_id (int): The ID of the rated book.
+        rating_sum (int): The sum of the ratings added or removed.
+        rating_count (int): The number of ratings added or removed.
+
+    Returns:
+        None
+    """
+    if rating_aggregator.accepts(book_id):
+        after_commit(rating_aggregator.submit, book_id=book_id, rating_sum=rating_sum, rating_count=rating_count)
+        return
+    apply_rating_delta(cursor=cursor, book_id=book_id, rating_sum=rating_sum, rating_count=rating_count)
+
+def apply_rating_delta(*, cursor, book_id: int, rating_sum: int, rating_count: int) -> None:
+    """
+    Adds ratings to (or, with negative values, removes them from) the aggregates of a book.
+
+    `Books.RatingSum` and `Books.RatingCount` are updated in place and `Books.Rating` derived
+    from them, so the cost does not depend on how many ratings the book has.
+
+    Args:
+        cursor (cursor): The database cursor for executing the SQL queries.
+        book_id (int): The ID of the rated book.
+        rating_sum (int): The sum of the ratings added or removed.
+        rating_count (int): The number of ratings added or removed.
+
+    Returns:
+        None
+    """
+    # MySQL assigns from left to right, so Rating sees the updated sum and count
+    query_update_book = """
+                    UPDATE Books
+                    SET RatingSum = RatingSum + %s,
+                        RatingCount = RatingCount + %s,
+                        Rating = IF(RatingCount > 0, RatingSum / RatingCount, 0)
+                    WHERE IdBook = %s
+                """
+    cursor.execute(query_update_book, (rating_sum, rating_count, book_id))
 
-    query_avg_rating = "SELECT AVG(Rating) FROM CommentRatingPerBook WHERE IdBook = %s"
-    cursor.execute(query_avg_rating, (id,))
-    avg_rating = cursor.fetchone()[0]
+    cursor.execute("SELECT Rating FROM Books WHERE IdBook = %s", (book_id,))
+    row = cursor.fetchone()
+    if row:
+        after_commit(search_index.set_rating, book_id, row[0])
+        after_commit(book_typeahead.set_score, book_id, row[0])
+        after_commit(response_cache.invalidate, "books", f"book:{book_id}")
 
-    query_update_book = "UPDATE Books SET Rating = %s WHERE IdBook = %s"
-    cursor.execute(query_update_book, (avg_rating, id))
+rating_aggregator = RatingAggregator(
+    apply_delta=apply_rating_delta,
+    connection_factory=lambda: get_pool().connection(),
+    enabled=settings.RATING_WRITE_BEHIND,
+    flush_interval=settings.RATING_FLUSH_INTERVAL_MS / 1000,
+    max_pending=settings.RATING_QUEUE_MAX_SIZE,
+    put_timeout=settings.RATING_QUEUE_PUT_TIMEOUT_MS / 1000,
+)
 
 def get_ratings(*, cursor, book_id: int) -> Any:
     """
@@ -69,72 +142,135 @@ def get_rating_by_id(*, cursor, comment_id: int) -> Any:
 
     return result
 
-def delete_rating(*, cursor, comment_id: int) -> None:
+def get_rated_book(*, cursor, comment_id: int) -> Any:
+    """
+    Retrieves the book, the rating and the author of a specific comment.
+
+    Args:
+        cursor (cursor): The database cursor for executing the SQL query.
+        comment_id (int): The ID of the comment.
+
+    Returns:
+        Any: A tuple with the ID of the rated book, the rating and the ID of the user who rated it,
+        or None if the comment does not exist.
+    """
+    query_rated_book = "SELECT IdBook, Rating, IdUser FROM CommentRatingPerBook WHERE IdCommentRating = %s"
+    cursor.execute(query_rated_book, (comment_id,))
+
+    return cursor.fetchone()
+
+def delete_rating(*, cursor, comment_id: int, book_id: int | None = None) -> int:
     """
     Deletes a specific comment and rating from the database.
 
     Args:
         cursor (cursor): The database cursor for executing the SQL query.
         comment_id (int): The ID of the comment to be deleted.
+        book_id (int, optional): The ID of the rated book, if known only its cached comments are invalidated.
 
     Returns:
-        None
+        int: The number of comments deleted, 0 if a concurrent request already deleted it.
     """
     query_delete = "DELETE FROM CommentRatingPerBook WHERE IdCommentRating = %s"
     cursor.execute(query_delete, (comment_id,))
+    deleted = cursor.rowcount
+    if deleted:
+        after_commit(response_cache.invalidate, "ratings" if book_id is None else f"ratings:{book_id}")
+    return deleted
 
-def calculate_rating(*, cursor, book_id: int):
+def recalculate_rating_aggregates(*, cursor, book_id: int | None = None) -> int:
     """
-    Calculates the average rating for a specific book.
+    Rebuilds the rating aggregates of one or every book from their comments.
+
+    Used to backfill the aggregates and to repair them if they drift from `CommentRatingPerBook`.
+    Books without ratings keep their current `Rating`.
 
     Args:
         cursor (cursor): The database cursor for executing the SQL query.
-        book_id (int): The ID of the book for which the average rating needs to be calculated.
+        book_id (int, optional): The ID of the book to repair, every book if None.
 
     Returns:
-        None
+        int: The number of books whose aggregates changed.
     """
-    query_avg_rating = "SELECT AVG(Rating) FROM CommentRatingPerBook WHERE IdBook = %s"
-    cursor.execute(query_avg_rating, (book_id,))
+    query_repair = """
+        UPDATE Books b
+        LEFT JOIN (
+            SELECT IdBook, SUM(Rating) AS RatingSum, COUNT(1) AS RatingCount
+            FROM CommentRatingPerBook
+            GROUP BY IdBook
+        ) r ON r.IdBook = b.IdBook
+        SET b.RatingSum = COALESCE(r.RatingSum, 0),
+            b.RatingCount = COALESCE(r.RatingCount, 0),
+            b.Rating = IF(r.RatingCount > 0, r.RatingSum / r.RatingCount, b.Rating)
+    """
+    if book_id is None:
+        cursor.execute(query_repair)
+        after_commit(response_cache.invalidate, "books", "book")
+    else:
+        cursor.execute(query_repair + " WHERE b.IdBook = %s", (book_id,))
+        after_commit(response_cache.invalidate, "books", f"book:{book_id}")
+
+    return cursor.rowcount
 
-def get_books_with_ratings_by_user(*, cursor, user_id: int, skip: int = 0, limit: int = 100) -> Any:
+RATING_SORT_KEYS = {
+    "id": SortKey(column="r.IdCommentRating", id_column="r.IdCommentRating"),
+    "rating": SortKey(column="r.Rating", id_column="r.IdCommentRating", descending=True),
+    "publication_date": SortKey(
+        column="b.PublicationDate", id_column="r.IdCommentRating", descending=True, nullable=True),
+}
+
+def get_books_with_ratings_by_user(
+        *, cursor, user_id: int, skip: int = 0, limit: int = 100, sort: str = "id", after: str | None = None,
+        fields: Iterable[str] | None = None) -> Any:
     """
     Retrieves all books rated by a specific user, including their ratings, with pagination support.
 
+    Pages can be requested either with `skip`/`limit` or with the `next_cursor` of the previous page passed as `after`.
+    A book rated several times by the user appears once per rating, so the ratings are tie-broken by their own ID.
+
     Args:
         cursor: The database cursor used for executing queries.
         user_id (int): The ID of the user whose ratings are to be retrieved.
-        skip (int, optional): The number of books to skip for pagination (default is 0).
+        skip (int, optional): The number of books to skip for pagination (default is 0). Ignored when `after` is given.
         limit (int, optional): The maximum number of books to retrieve (default is 100).
+        sort (str, optional): The order of the ratings, one of `RATING_SORT_KEYS` (default is "id").
+        after (str, optional): Cursor returned by the previous page.
+        fields (Iterable[str] | None, optional): The book fields to retrieve, all of them if None.
 
     Returns:
-        Any: An object containing the list of books with their ratings and the total count of rated books.
+        Any: An object containing the list of books with their ratings, the total count of rated books and the cursor of the next page.
+
+    Raises:
+        ValueError: If `sort` is unknown or `after` is not a valid cursor for it.
     """
+    if sort not in RATING_SORT_KEYS:
+        raise ValueError(f"Invalid sort order {sort}. Valid options are {list(RATING_SORT_KEYS)}")
+    sort_key = RATING_SORT_KEYS[sort]
+
+    condition, params = "", ()
+    if after:
+        key, last_id = decode_cursor(after, sort=sort)
+        condition, params = sort_key.after(key, last_id)
+        condition = f"AND {condition}"
+        pagination, pagination_params = "LIMIT %s", (limit,)
+    else:
+        pagination, pagination_params = "LIMIT %s OFFSET %s", (limit, skip)
 
     # Consulta para obtener los libros puntuados por el usuario
-    query_books = """
-        SELECT 
-            b.IdBook as id_book, 
-            b.Title as title, 
-            b.Authors as authors, 
-            b.Synopsis as synopsis, 
-            b.BuyLink as buy_link, 
-            b.Genres as genres, 
-            b.Rating as book_rating, 
-            b.Editorial as editorial, 
-            b.Comments as comments, 
-            b.PublicationDate as publication_date, 
-            b.Image as image,
-            r.Rating as user_rating
+    # The rating, its ID and the sort key follow the selected book columns
+    projection = book_projection(fields)
+    query_books = f"""
+        SELECT {projection.select("b")}, r.Rating, r.IdCommentRating, {sort_key.column}
         FROM 
             Books b
         INNER JOIN 
             CommentRatingPerBook r ON b.IdBook = r.IdBook
         WHERE 
-            r.IdUser = %s
-        LIMIT %s OFFSET %s;
+            r.IdUser = %s {condition}
+        {sort_key.order_by()}
+        {pagination};
     """
-    cursor.execute(query_books, (user_id, limit, skip))
+    cursor.execute(query_books, (user_id,) + params + pagination_params)
     rows = cursor.fetchall()
 
     # Contar el total de libros puntuados por el usuario
@@ -147,23 +283,17 @@ def get_books_with_ratings_by_user(*, cursor, user_id: int, skip: int = 0, limit
     count = cursor.fetchone()[0]
 
     # Transformar las filas obtenidas en una lista de objetos con libros y puntuaciones
+    rating_index = len(projection.fields)
     books_with_ratings = [
         {
-            "book": {
-                "id_book": row[0],
-                "title": row[1],
-                "authors": row[2],
-                "synopsis": row[3],
-                "buy_link": row[4],
-                "genres": row[5],
-                "rating": row[6],
-                "editorial": row[7],
-                "comments": row[8],
-                "publication_date": row[9].isoformat() if row[9] else None,  # Convertir a cadena
-                "image": row[10]
-            },
-            "user_rating": row[11]  # Rating given by the user
+            "book": projection.from_row(row),
+            "user_rating": row[rating_index]  # Rating given by the user
         } for row in rows
     ]
 
-    return {"data": books_with_ratings, "count": count}
+    next_cursor = None
+    if limit and len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort=sort, key=last[rating_index + 2], last_id=last[rating_index + 1])
+
+    return {"data": books_with_ratings, "count": count, "next_cursor": next_cursor}
@@ -1,4 +1,7 @@
-from app.models import ReadBookCreate, ReadBookOut
+from app.models import ReadBookCreate, ReadBookOut, BooksOut
+from app.crud.book import book_projection
+from app.crud.stats import invalidate_user_stats
+from collections.abc import Iterable
 from typing import Any
 
 def create_readbook(*, cursor, readbook_in: ReadBookCreate) -> ReadBookOut:
@@ -20,6 +23,8 @@ def create_readbook(*, cursor, readbook_in: ReadBookCreate) -> ReadBookOut:
 
     cursor.execute(query_create_readbook, (readbook_in.id_user, readbook_in.id_book))
 
+    invalidate_user_stats(readbook_in.id_user)
+
     # Get the new entry ID
     new_readbook_id = cursor.lastrowid
 
@@ -49,6 +54,7 @@ def delete_user_readbook(*, cursor, id_user: int, id_book: int) -> bool:
         WHERE id_user = %s AND idBook = %s
     """
     cursor.execute(query_delete_user_readbook, (id_user, id_book))
+    invalidate_user_stats(id_user)
 
     # Check if any rows were affected (i.e., the entry was found and deleted)
     return cursor.rowcount > 0
@@ -104,3 +110,42 @@ def check_readbook_exists(*, cursor, readbook_in: ReadBookCreate) -> bool:
     cursor.execute(query_check_readbook, (readbook_in.id_user, readbook_in.id_book))
     (count,) = cursor.fetchone()
     return count > 0
+
+def get_readbooks_books(
+        *, cursor, id_user: int, skip: int = 0, limit: int = 100,
+        fields: Iterable[str] | None = None) -> BooksOut:
+    """
+    Retrieves the books marked as read by a user joining 'readbooks' with 'Books', with pagination support.
+
+    Args:
+        cursor: The database cursor to interact with the database.
+        id_user (int): The ID of the user.
+        skip (int, optional): The number of books to skip for pagination (default is 0).
+        limit (int, optional): The maximum number of books to retrieve (default is 100).
+        fields (Iterable[str] | None, optional): The fields to retrieve, all of them if None.
+
+    Returns:
+        BooksOut: The page of books, in the order they were marked as read, and the total number of read books.
+    """
+    projection = book_projection(fields)
+    query_books = f"""
+        SELECT {projection.select("b")}
+        FROM readbooks r
+        INNER JOIN Books b ON b.IdBook = r.idBook
+        WHERE r.id_user = %s
+        ORDER BY r.id_entry
+        LIMIT %s OFFSET %s
+    """
+    cursor.execute(query_books, (id_user, limit, skip))
+    rows = cursor.fetchall()
+
+    query_count = """
+        SELECT COUNT(1)
+        FROM readbooks r
+        INNER JOIN Books b ON b.IdBook = r.idBook
+        WHERE r.id_user = %s
+    """
+    cursor.execute(query_count, (id_user,))
+    count = cursor.fetchone()[0]
+
+    return BooksOut(data=[projection.from_row(row) for row in rows], count=count)
@@ -0,0 +1,101 @@
+""" User statistics CRUD methods """
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import after_commit
+from app.models import GenreStats, UserStats
+
+user_stats_cache = TTLCache(maxsize=settings.USER_STATS_CACHE_SIZE, ttl=settings.USER_STATS_CACHE_TTL)
+
+
+def invalidate_user_stats(user_id: int) -> None:
+    """
+    Drops the cached statistics of a user once the change to one of their ratings or shelves commits.
+
+    Args:
+        user_id (int): The ID of the user.
+    """
+    after_commit(user_stats_cache.pop, user_id)
+
+
+def get_user_stats(*, cursor, user_id: int) -> UserStats:
+    """
+    Computes the rating and genre statistics shown in the profile of a user.
+
+    Ratings, read books and saved books are aggregated by genre with a single query, and the
+    result is cached until the user rates a book or changes a shelf. A book counts for each of
+    its genres in `BookGenres`, books without genres only count in the rating distribution.
+
+    Args:
+        cursor: The database cursor used for executing queries.
+        user_id (int): The ID of the user.
+
+    Returns:
+        UserStats: Number of ratings per star, and per genre the number of rated, read and saved
+        books and the average rating given.
+    """
+    cached = user_stats_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    query_stats = """
+        SELECT 'stars', NULL, r.Rating, COUNT(1)
+        FROM CommentRatingPerBook r
+        WHERE r.IdUser = %s
+        GROUP BY r.Rating
+        UNION ALL
+        SELECT 'rated', g.Name, r.Rating, COUNT(1)
+        FROM CommentRatingPerBook r
+        INNER JOIN BookGenres bg ON bg.IdBook = r.IdBook
+        INNER JOIN Genres g ON g.IdGenre = bg.IdGenre
+        WHERE r.IdUser = %s
+        GROUP BY g.Name, r.Rating
+        UNION ALL
+        SELECT 'read', g.Name, NULL, COUNT(1)
+        FROM readbooks rb
+        INNER JOIN BookGenres bg ON bg.IdBook = rb.idBook
+        INNER JOIN Genres g ON g.IdGenre = bg.IdGenre
+        WHERE rb.id_user = %s
+        GROUP BY g.Name
+        UNION ALL
+        SELECT 'saved', g.Name, NULL, COUNT(1)
+        FROM mybooks mb
+        INNER JOIN BookGenres bg ON bg.IdBook = mb.idBook
+        INNER JOIN Genres g ON g.IdGenre = bg.IdGenre
+        WHERE mb.id_user = %s
+        GROUP BY g.Name
+    """
+    cursor.execute(query_stats, (user_id, user_id, user_id, user_id))
+    rows = cursor.fetchall()
+
+    rating_distribution = {stars: 0 for stars in range(1, 6)}
+    rated: dict[str, list[int]] = {}
+    shelves: dict[str, dict[str, int]] = {"read": {}, "saved": {}}
+    for source, genre, stars, count in rows:
+        if source == "stars":
+            rating_distribution[int(stars)] = rating_distribution.get(int(stars), 0) + count
+        elif source == "rated":
+            totals = rated.setdefault(genre, [0, 0])
+            totals[0] += int(stars) * count
+            totals[1] += count
+        else:
+            shelves[source][genre] = count
+
+    stats = UserStats(
+        rating_count=sum(rating_distribution.values()),
+        rating_distribution=rating_distribution,
+        rated_genres=[
+            GenreStats(genre=genre, count=count, average_rating=round(total / count, 2))
+            for genre, (total, count) in sorted(rated.items(), key=lambda item: -item[1][1])
+        ],
+        read_genres=[
+            GenreStats(genre=genre, count=count)
+            for genre, count in sorted(shelves["read"].items(), key=lambda item: -item[1])
+        ],
+        saved_genres=[
+            GenreStats(genre=genre, count=count)
+            for genre, count in sorted(shelves["saved"].items(), key=lambda item: -item[1])
+        ],
+    )
+    user_stats_cache.set(user_id, stats)
+
+    return stats
@@ -1,9 +1,72 @@
 """ User related CRUD methods """
 from typing import Any
-import bcrypt
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import after_commit
+from app.core.hashing import password_hasher
+from app.crud.counts import count_cache
+from app.core.typeahead import user_typeahead
 
 from app.models import User, UserCreate, UserUpdate, UserOut, UsersOut
 
+login_cache = TTLCache(maxsize=settings.LOGIN_CACHE_SIZE, ttl=settings.LOGIN_CACHE_TTL)
+# Cached for emails without an account
+_UNKNOWN_EMAIL = ()
+
+
+# Verified access tokens, by digest, with their payload and user row until they expire
+token_user_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def forget_user_tokens(user_id: int) -> None:
+    """
+    Drops the cached tokens of a user, so that the next request reads the user again.
+
+    Args:
+        user_id (int): The ID of the user that was updated or deleted.
+    """
+    token_user_cache.discard_if(lambda _digest, entry: entry[1]["id_user"] == user_id)
+
+
+def get_login_credentials(*, cursor, email: str) -> tuple[int, str] | None:
+    """
+    Retrieves the ID and password hash of the user with an email, as needed to log in.
+
+    Lookups, including those of emails without an account, are cached for ``LOGIN_CACHE_TTL``
+    seconds so repeated attempts do not query the database.
+
+    Args:
+        cursor (cursor): The database cursor to execute the SQL query.
+        email (str): The email of the user.
+
+    Returns:
+        tuple[int, str] | None: The ID and password hash of the user, or None if no user has this email.
+    """
+    key = email.casefold()
+    credentials = login_cache.get(key)
+    if credentials is None:
+        cursor.execute("SELECT id_user, password FROM users WHERE email = %s", (email,))
+        row = cursor.fetchone()
+        credentials = (row[0], row[1]) if row else _UNKNOWN_EMAIL
+        login_cache.set(key, credentials)
+
+    return credentials or None
+
+
+def forget_login_credentials(*, email: str | None = None, user_id: int | None = None) -> None:
+    """
+    Drops the cached login lookup of an email, or of every email of a user.
+
+    Args:
+        email (str | None): The email, e.g. of a new account.
+        user_id (int | None): The ID of a user whose email or password changed.
+    """
+    if email is not None:
+        login_cache.pop(email.casefold())
+    if user_id is not None:
+        login_cache.discard_if(lambda _email, credentials: bool(credentials) and credentials[0] == user_id)
+
 
 def create_user(*, cursor, user_in: UserCreate) -> None:
     """
@@ -20,7 +83,7 @@ def create_user(*, cursor, user_in: UserCreate) -> None:
                 INSERT INTO users (name, surname, username, email, password)
                 VALUES (%s, %s, %s, %s, %s)
             """
-    hashed_password = bcrypt.hashpw(user_in.password.encode('utf-8'), bcrypt.gensalt())
+    hashed_password = password_hasher.hash(user_in.password)
     cursor.execute(query_create_user, (
         user_in.name,
         user_in.surname,
@@ -28,6 +91,9 @@ def create_user(*, cursor, user_in: UserCreate) -> None:
         user_in.email,
         hashed_password
     ))
+    after_commit(count_cache.adjust, "users", 1)
+    after_commit(forget_login_credentials, email=user_in.email)
+    after_commit(user_typeahead.add, cursor.lastrowid, [f"{user_in.name} {user_in.surname or ''}", user_in.username])
 
 def get_user_by_id(*, cursor, user_id: int) -> Any:
     """
@@ -73,7 +139,7 @@ def update_user(*, cursor, user_id: int, user_in: UserUpdate) -> Any:
         update_fields.append("email = %s")
         update_values.append(user_in.email)
     if user_in.password is not None:
-        hashed_password = bcrypt.hashpw(user_in.password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = password_hasher.hash(user_in.password)
         update_fields.append("password = %s")
         update_values.append(hashed_password)
 
@@ -88,10 +154,39 @@ def update_user(*, cursor, user_id: int, user_in: UserUpdate) -> Any:
             """
     update_values.append(user_id)
     cursor.execute(query_update_user, tuple(update_values))
+    after_commit(forget_user_tokens, user_id)
+
+    if user_in.email is not None or user_in.password is not None:
+        after_commit(forget_login_credentials, user_id=user_id)
+        if user_in.email is not None:
+            after_commit(forget_login_credentials, email=user_in.email)
+
+    if user_in.name is not None or user_in.surname is not None or user_in.username is not None:
+        cursor.execute("SELECT name, surname, username FROM users WHERE id_user = %s", (user_id,))
+        row = cursor.fetchone()
+        if row:
+            after_commit(user_typeahead.add, user_id, [f"{row[0]} {row[1] or ''}", row[2]])
 
     return "User updated successfully"
 
 
+def update_password_hash(*, cursor, user_id: int, hashed_password: str) -> None:
+    """
+    Replaces the stored password hash of a user, e.g. with one made with the current work factor.
+
+    Args:
+        cursor (cursor): The database cursor to execute the SQL query.
+        user_id (int): The ID of the user.
+        hashed_password (str): The new password hash.
+
+    Returns:
+        None
+    """
+    cursor.execute("UPDATE users SET password = %s WHERE id_user = %s", (hashed_password, user_id))
+    after_commit(forget_login_credentials, user_id=user_id)
+    after_commit(forget_user_tokens, user_id)
+
+
 def get_user_by_email(*, cursor, email: str) -> User | None:
     """
     Retrieves a user from the database by their email address.
@@ -109,7 +204,25 @@ def get_user_by_email(*, cursor, email: str) -> User | None:
 
     return existing_user
 
-def read_users(*, cursor, skip: int = 0, limit: int = 100) -> Any:
+def user_from_row(row) -> UserOut:
+    """
+    Builds a UserOut, without validating it, from a trusted users row.
+
+    Args:
+        row (tuple): id_user, name, surname, username and email.
+
+    Returns:
+        UserOut: The user represented by the row.
+    """
+    return UserOut.model_construct(
+        id_user=row[0],
+        name=row[1],
+        surname=row[2],
+        username=row[3],
+        email=row[4]
+    )
+
+def read_users(*, cursor, skip: int = 0, limit: int = 100, include_count: bool = True) -> Any:
     """
     Retrieves a list of users from the database with pagination.
 
@@ -117,6 +230,7 @@ def read_users(*, cursor, skip: int = 0, limit: int = 100) -> Any:
         cursor (cursor): The database cursor to execute the SQL queries.
         skip (int): The number of records to skip (default is 0).
         limit (int): The number of records to return (default is 100).
+        include_count (bool): Whether to return the total count of users (default is True).
 
     Returns:
         Any: A UsersOut object containing a list of user data and the total count of users.
@@ -127,64 +241,56 @@ def read_users(*, cursor, skip: int = 0, limit: int = 100) -> Any:
     filas = cursor.fetchall()
 
     # Count the total number of users
-    query_count = "SELECT COUNT(1) FROM users"
-    cursor.execute(query_count)
-    count = cursor.fetchone()[0]
+    count = count_cache.get(cursor=cursor, table="users") if include_count else None
 
     # Transform tuples to a list of UserOut
-    users_data = [
-        UserOut(
-            id_user=row[0],
-            name=row[1],
-            surname=row[2],
-            username=row[3],
-            email=row[4]
-        ) for row in filas
-    ]
+    users_data = [user_from_row(row) for row in filas]
 
     return UsersOut(data=users_data, count=count)
 
-def read_top5_matched_users(*, cursor,  keyword: str) -> Any:
+def get_users_by_ids(*, cursor, user_ids: list[int]) -> list[UserOut]:
     """
-    Retrieves the top 5 users from the database whose name, surname, or username matches the provided keyword.
+    Retrieves several users with a single query, keeping the order of the given IDs.
 
     Args:
-        cursor (cursor): The database cursor to execute the SQL queries.
-        keyword (str): The keyword to search for in the name, surname, or username fields.
+        cursor (cursor): The database cursor to execute the SQL query.
+        user_ids (list[int]): The IDs of the users to retrieve.
 
     Returns:
-        Any: A UsersOut object containing a list of matched users and the total count of books in the database.
+        list[UserOut]: The users found, in the same order as `user_ids`. Missing IDs are skipped.
     """
-    # Crear la consulta de búsqueda
-    query = """
+    if not user_ids:
+        return []
+
+    unique_ids = list(dict.fromkeys(user_ids))
+    query_users = f"""
                 SELECT id_user, name, surname, username, email
-                   FROM users
-                   WHERE name LIKE %s OR surname LIKE %s or username LIKE %s
-                   LIMIT 5;
+                FROM users
+                WHERE id_user IN ({', '.join(['%s'] * len(unique_ids))})
             """
+    cursor.execute(query_users, tuple(unique_ids))
+    users = {row[0]: user_from_row(row) for row in cursor.fetchall()}
+
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+def read_top5_matched_users(*, cursor,  keyword: str, include_count: bool = True) -> Any:
+    """
+    Retrieves the top 5 users from the database with a word of their name, surname, or username starting like the keyword.
+
+    Matches are looked up in the in-memory autocomplete index, ignoring case and accents.
+
+    Args:
+        cursor (cursor): The database cursor to execute the SQL queries.
+        keyword (str): The text typed so far.
+        include_count (bool): Whether to return the total count of users (default is True).
+
+    Returns:
+        Any: A UsersOut object containing a list of matched users and the total count of users in the database.
+    """
+    user_typeahead.ensure_built(cursor=cursor)
+    users_data = get_users_by_ids(cursor=cursor, user_ids=user_typeahead.complete(keyword, limit=5))
 
-    # Preparar el parámetro de búsqueda con el carácter comodín
-    search_param = f"%{keyword}%"
-
-    # Ejecutar la consulta
-    cursor.execute(query, (search_param, search_param, search_param))
-
-    # Obtener los resultados
-    resultados = cursor.fetchall()
-
-    # Contar el total de libros
-    query_count = "SELECT COUNT(1) FROM Books"
-    cursor.execute(query_count)
-    count = cursor.fetchone()[0]
-
-    users_data = [
-        UserOut(
-            id_user=row[0],
-            name=row[1],
-            surname=row[2],
-            username=row[3],
-            email=row[4]
-        ) for row in resultados
-    ]
+    # Contar el total de usuarios
+    count = count_cache.get(cursor=cursor, table="users") if include_count else None
 
     return UsersOut(data=users_data, count=count)
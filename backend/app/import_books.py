@@ -0,0 +1,46 @@
+""" Imports a catalog of books from a CSV or JSON Lines file """
+import argparse
+import logging
+
+from app.core.book_import import FORMAT_BY_SUFFIX, guess_format, import_books, read_rows
+from app.core.config import settings
+from app.core.db import get_db_connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    """
+    Creates the books of the file whose title is not in the catalog yet.
+
+    Usage: python -m app.import_books books.csv [--format csv|jsonl] [--batch-size 1000]
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(set(FORMAT_BY_SUFFIX.values())))
+    parser.add_argument("--batch-size", type=int, default=settings.BOOK_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    import_format = args.format or guess_format(args.path)
+
+    connection = get_db_connection()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as file:
+            result = import_books(
+                connection=connection,
+                rows=read_rows(file, import_format=import_format),
+                batch_size=args.batch_size,
+            )
+    finally:
+        connection.close()
+
+    logger.info(
+        "%d books imported, %d duplicates, %d rows rejected in %.1fs (%.0f rows/s)",
+        result.imported, result.duplicates, result.rejected, result.seconds, result.rows_per_second
+    )
+    for error in result.errors:
+        logger.warning("Line %d rejected: %s", error.line, error.error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+""" Measures the throughput and latency of a route under concurrent requests """
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run(*, url: str, concurrency: int, requests: int, timeout: float) -> dict:
+    """
+    Sends `requests` GET requests to `url`, keeping `concurrency` of them in flight.
+
+    Args:
+        url (str): The URL requested.
+        concurrency (int): The number of concurrent clients.
+        requests (int): The total number of requests.
+        timeout (float): Seconds after which a request is counted as failed.
+
+    Returns:
+        dict: The throughput, latency percentiles, errors and peak of requests in flight.
+    """
+    latencies = []
+    errors = 0
+    in_flight = 0
+    peak = 0
+    remaining = iter(range(requests))
+
+    async def client(http: httpx.AsyncClient) -> None:
+        nonlocal errors, in_flight, peak
+        for _ in remaining:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            start = time.perf_counter()
+            try:
+                response = await http.get(url)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            finally:
+                in_flight -= 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+        "peak_in_flight": peak,
+    }
+
+
+def main() -> None:
+    """
+    Load tests a running server, to compare the sync routes with the ones served when `DB_ASYNC` is set.
+
+    Usage: python -m app.load_test URL [--concurrency 200] [--requests 5000]
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("url", help="URL requested, e.g. http://localhost:8000/api/v1/books/?limit=20")
+    parser.add_argument("--concurrency", type=int, default=200, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=5000, help="Total number of requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a request fails")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(url=args.url, concurrency=args.concurrency, requests=args.requests,
+                             timeout=args.timeout))
+    print(f"{result['requests']} requests, {result['errors']} errors in {result['elapsed']:.2f}s")
+    print(f"throughput: {result['throughput']:.1f} requests/s, peak of {result['peak_in_flight']} in flight")
+    print(f"latency: p50 {result['p50'] * 1000:.1f} ms, p95 {result['p95'] * 1000:.1f} ms, "
+          f"p99 {result['p99'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 """ Main application module """
+from contextlib import asynccontextmanager
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
+from app.core.aiodb import open_async_pool, close_async_pool
 from app.core.config import settings
+from app.core.db import get_pool, open_pool, close_pool
+from app.core.hashing import HashingBusyError, password_hasher
+from app.core.outbox import email_outbox
+from app.core.search import search_index
+from app.core.typeahead import book_typeahead, user_typeahead
+from app.crud.rating import rating_aggregator
+from app.utils import compile_email_templates
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -20,6 +31,35 @@ def custom_generate_unique_id(route: APIRoute) -> str:
     """
     return f"{route.tags[0]}-{route.name}"
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Application lifespan, owns the resources shared between requests.
+
+    Args:
+        _app (FastAPI): The application being started.
+    """
+    open_pool()
+    if settings.DB_ASYNC:
+        open_async_pool()
+    password_hasher.calibrate()
+    compile_email_templates()
+    search_index.start(lambda: get_pool().connection())
+    book_typeahead.start(lambda: get_pool().connection())
+    user_typeahead.start(lambda: get_pool().connection())
+    rating_aggregator.start()
+    email_outbox.start()
+    yield
+    email_outbox.stop()
+    # Flush the queued rating updates while the pool is still open
+    rating_aggregator.stop()
+    search_index.stop()
+    book_typeahead.stop()
+    user_typeahead.stop()
+    close_pool()
+    await close_async_pool()
+    password_hasher.shutdown()
+
 if settings.SENTRY_DSN:
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
@@ -27,6 +67,7 @@ app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 if settings.BACKEND_CORS_ORIGINS:
@@ -40,4 +81,18 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(_request: Request, exc: HashingBusyError) -> JSONResponse:
+    """
+    Answers with a 503 when the password hashing pool is saturated, so clients back off.
+
+    Args:
+        _request (Request): The request that could not be served.
+        exc (HashingBusyError): The error raised by the hashing pool.
+
+    Returns:
+        JSONResponse: The 503 response, asking to retry after one second.
+    """
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -0,0 +1,26 @@
+""" Applies the pending migrations of the MySQL schema """
+import logging
+
+from app.core.db import get_db_connection
+from app.core.migrations import migrate
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    """
+    Brings the MySQL database of the settings up to date.
+
+    Usage: python -m app.migrate_db
+    """
+    connection = get_db_connection()
+    try:
+        migrated = migrate(connection)
+        logger.info("MySQL schema up to date, %s migrations applied", len(migrated))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,3 +5,5 @@ from .user import *
 from .book import *
 from .mybook import *
 from .readbook import *
+from .monitoring import *
+from .profile import *
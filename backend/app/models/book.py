@@ -1,6 +1,6 @@
 """ Book models """
 from sqlmodel import Field, SQLModel
-from typing import Optional
+from typing import Literal, Optional
 from .base import SQLModel
 
 # Shared properties
@@ -41,7 +41,42 @@ class BookUpdate(SQLModel):
 class BookOut(BookBase):
     id_book: int
 
+# Fields of BookOut that listings can be restricted to
+BookField = Literal[
+    "id_book", "title", "authors", "synopsis", "buy_link", "genres", "rating",
+    "editorial", "comments", "publication_date", "image",
+]
+
 class BooksOut(SQLModel):
     data: list[BookOut]
+    # None when the count was not requested
+    count: int | None
+    # Opaque token to request the following page with `after`
+    next_cursor: str | None = None
+
+
+# Number of the filtered books having a genre
+class GenreFacet(SQLModel):
+    genre: str
     count: int
 
+# Books filtered by genre, with the number of them having each of their genres
+class GenreBooksOut(BooksOut):
+    facets: list[GenreFacet] = []
+
+
+# Row of an import file that was not imported
+class BookImportError(SQLModel):
+    line: int
+    error: str
+
+# Outcome of a bulk import
+class BookImportOut(SQLModel):
+    imported: int
+    # Rows whose title already exists or appeared earlier in the file
+    duplicates: int
+    rejected: int
+    # Details of the first rejected rows
+    errors: list[BookImportError] = []
+    seconds: float
+    rows_per_second: float
@@ -0,0 +1,104 @@
+""" Monitoring models """
+from .base import SQLModel
+
+# Snapshot of the database connection pool
+class PoolStats(SQLModel):
+    size: int
+    max_overflow: int
+    in_use: int
+    idle: int
+    overflow: int
+    waiters: int
+    checkouts: int
+    timeouts: int
+    total_wait_time: float
+    avg_wait_time: float
+    max_wait_time: float
+
+# Snapshot of the password hashing pool
+class PasswordHashingStats(SQLModel):
+    executor: str
+    workers: int
+    # Current bcrypt work factor
+    rounds: int
+    queue_size: int
+    in_flight: int
+    completed: int
+    rejected: int
+    avg_wait_time: float
+    max_wait_time: float
+    avg_hash_time: float
+    max_hash_time: float
+    # Number of hashes made with each work factor
+    hashes_by_rounds: dict[int, int]
+    rehashes: int
+
+# Count and durations of one phase of an operation
+class PhaseStats(SQLModel):
+    count: int
+    avg_time: float
+    max_time: float
+
+# Usage of an in-process cache
+class CacheStats(SQLModel):
+    size: int
+    hits: int
+    misses: int
+
+# Outcomes and phase durations of the logins
+class LoginStats(SQLModel):
+    outcomes: dict[str, int]
+    phases: dict[str, PhaseStats]
+    cache: CacheStats
+
+# Snapshot of the email outbox
+class EmailOutboxStats(SQLModel):
+    pending: int
+    dead: int
+    sent: int
+    failed_attempts: int
+    connections: int
+
+# Email that could not be sent
+class DeadLetter(SQLModel):
+    id: int
+    email_to: str
+    subject: str
+    attempts: int
+    last_error: str | None
+
+# Snapshot of the write-behind rating queue
+class RatingQueueStats(SQLModel):
+    enabled: bool
+    pending_books: int
+    max_pending: int
+    lag: float
+    submitted: int
+    coalesced: int
+    rejected: int
+    flushes: int
+    flushed_books: int
+    failed_flushes: int
+    last_flush_duration: float
+    last_flush_lag: float
+
+# Usage of the response cache, the size of the store is only known for the in-process backend
+class ResponseCacheStats(SQLModel):
+    backend: str
+    enabled: bool
+    hits: int
+    misses: int
+    hit_ratio: float
+    invalidations: int
+    entries: int | None = None
+    size_bytes: int | None = None
+    evictions: int | None = None
+
+# Calls of the catalog listings coalesced with an identical one in flight
+class SingleFlightStats(SQLModel):
+    enabled: bool
+    in_flight: int
+    calls: int
+    executions: int
+    coalesced: int
+    timeouts: int
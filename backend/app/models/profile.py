@@ -0,0 +1,27 @@
+""" User profile models """
+from typing import Literal
+
+from .base import SQLModel
+from .book import BookOut, BooksOut
+from .user import UserOut, UserStats
+
+# Parts of the profile that can be requested besides the user
+ProfileSection = Literal["mybooks", "readbooks", "ratings", "stats"]
+
+# Book rated by a user, with the rating given
+class RatedBookOut(SQLModel):
+    book: BookOut
+    user_rating: int | None
+
+class RatedBooksOut(SQLModel):
+    data: list[RatedBookOut]
+    count: int
+    next_cursor: str | None = None
+
+# Profile page of a user, the sections not requested are left out
+class UserProfileOut(SQLModel):
+    user: UserOut
+    mybooks: BooksOut | None = None
+    readbooks: BooksOut | None = None
+    ratings: RatedBooksOut | None = None
+    stats: UserStats | None = None
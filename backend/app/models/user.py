@@ -48,7 +48,24 @@ class UserOut(UserBase):
 
 class UsersOut(SQLModel):
     data: list[UserOut]
+    # None when the count was not requested
+    count: int | None
+
+# Aggregates of a user's books in one genre
+class GenreStats(SQLModel):
+    genre: str
     count: int
+    # Average rating given by the user, only for rated books
+    average_rating: float | None = None
+
+# Rating and genre statistics shown in the profile of a user
+class UserStats(SQLModel):
+    rating_count: int
+    # Number of ratings given with each number of stars
+    rating_distribution: dict[int, int]
+    rated_genres: list[GenreStats]
+    read_genres: list[GenreStats]
+    saved_genres: list[GenreStats]
 
 # Generic message
 class Message(SQLModel):
@@ -0,0 +1,32 @@
+""" Rebuilds the rating aggregates of the books from their comments """
+import logging
+import sys
+
+from app import crud
+from app.core.db import get_db_connection, transaction
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    """
+    Recomputes Books.RatingSum, Books.RatingCount and Books.Rating.
+
+    Usage: python -m app.repair_ratings [book_id]
+    """
+    book_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        with transaction(connection):
+            changed = crud.rating.recalculate_rating_aggregates(cursor=cursor, book_id=book_id)
+        logger.info("Rating aggregates repaired, %s books changed", changed)
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.core.db import init_db, get_db_connection
+from app.core.migrations import migrate
 
 @pytest.fixture(scope="session", autouse=True)
 def db(request) -> Generator:
@@ -13,6 +14,8 @@ def db(request) -> Generator:
     Initializes the database with test data and cleans up afterward.
     """
     connection = get_db_connection()
+    # Bring the schema of the test database up to date
+    migrate(connection)
 
     cursor = connection.cursor()
 
@@ -0,0 +1,82 @@
+""" Tests the asynchronous pool and the async variants of the routes """
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import anyio
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.aio import async_router
+from app.api.deps import get_async_db
+from app.api.routes import books
+from app.core.aiodb import AsyncConnectionPool, BridgedConnection
+from app.core.db import PoolTimeoutError
+
+ROW = (1, "Dune", "Frank Herbert", None, None, "Sci-fi", 4.5, None, None, None, None)
+
+
+def test_async_pool_reuses_connections():
+    """ Test a released connection is handed out again and rolled back """
+    async def scenario():
+        creator = AsyncMock(side_effect=lambda: AsyncMock())
+        pool = AsyncConnectionPool(creator=creator, size=1, max_overflow=0)
+
+        async with pool.connection() as first:
+            pass
+        async with pool.connection() as second:
+            pass
+        return creator, first, second
+
+    creator, first, second = asyncio.run(scenario())
+
+    assert first is second
+    assert creator.await_count == 1
+    first.rollback.assert_awaited()
+
+def test_async_pool_times_out_when_exhausted():
+    """ Test waiting for a connection is bounded by the timeout """
+    async def scenario():
+        creator = AsyncMock(side_effect=lambda: AsyncMock())
+        pool = AsyncConnectionPool(creator=creator, size=1, max_overflow=0, timeout=0.01)
+        await pool.acquire()
+        with pytest.raises(PoolTimeoutError):
+            await pool.acquire()
+        return pool.stats()
+
+    assert asyncio.run(scenario())["timeouts"] == 1
+
+def test_async_routes_exceed_threadpool():
+    """ Test more requests than threads wait on the database at the same time """
+    concurrency = 10
+    waiting = 0
+    all_waiting = asyncio.Event()
+
+    async def execute(*_args):
+        nonlocal waiting
+        waiting += 1
+        if waiting == concurrency:
+            all_waiting.set()
+        await all_waiting.wait()
+
+    async def get_fake_async_db():
+        cursor = AsyncMock(execute=execute, fetchone=AsyncMock(return_value=ROW))
+        connection = MagicMock(cursor=AsyncMock(return_value=cursor), is_connected=AsyncMock(return_value=True))
+        yield BridgedConnection(connection)
+
+    app = FastAPI()
+    app.include_router(async_router(books.router), prefix="/books")
+    app.dependency_overrides[get_async_db] = get_fake_async_db
+
+    async def scenario():
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 2
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.wait_for(
+                asyncio.gather(*(client.get("/books/book/1") for _ in range(concurrency))), timeout=5
+            )
+
+    responses = asyncio.run(scenario())
+
+    assert [response.status_code for response in responses] == [200] * concurrency
+    assert responses[0].json()["title"] == "Dune"
@@ -1,13 +1,14 @@
 """ Tests CRUD operations on books """
 from datetime import datetime
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call
 
 from app.models import BookCreate
 
 from app.crud.book import (
     get_book_by_id, get_book_by_title,
     get_books_by_genres, get_all_books,
-    create_book, get_books_by_key, update_book, delete_book
+    create_book, get_books_by_key, update_book, delete_book,
+    get_books_by_ids, set_book_genres
 )
 
 def test_create_book(db):
@@ -30,7 +31,7 @@ def test_create_book(db):
     book = create_book(cursor=db, book_in=book_in)
 
     # Verify that the insert query was called correctly
-    db.execute.assert_called_once_with(
+    assert db.execute.call_args_list[0] == call(
         """
         INSERT INTO Books (Title, Authors, Synopsis, BuyLink, Genres, Rating, Editorial, Comments, PublicationDate, Image)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
@@ -57,6 +58,22 @@ def test_get_book_by_id(db, book_id):
     assert book is not None
     assert book.id_book == book_id
 
+def test_get_books_by_ids(db, book_id, second_book_id):
+    """ Test for retrieving several books keeping the requested order."""
+    books = get_books_by_ids(cursor=db, book_ids=[second_book_id, -1, book_id])
+
+    assert [book.id_book for book in books] == [second_book_id, book_id]
+
+def test_get_books_by_ids_single_query():
+    """ Test the books are fetched with one query whatever the number of IDs."""
+    db = MagicMock()
+    db.fetchall.return_value = []
+
+    get_books_by_ids(cursor=db, book_ids=[3, 1, 2, 1])
+
+    db.execute.assert_called_once()
+    assert db.execute.call_args[0][1] == (3, 1, 2)
+
 def test_get_book_by_title(db):
     """ Test for retrieving a book by title."""
     title = 'Test Book'
@@ -72,6 +89,30 @@ def test_get_books_by_genres(db):
     assert books is not None
     assert books.count > 0
 
+def test_get_books_by_genres_facets():
+    """ Test the page, the distinct match count and the genre facets are read from two queries."""
+    db = MagicMock()
+    db.fetchall.side_effect = [[], [("Fantasy", 4), ("Horror", 2), (None, 5)]]
+
+    books = get_books_by_genres(cursor=db, genres=["Fantasy", "Horror"], skip=10, limit=5)
+
+    assert db.execute.call_count == 2
+    assert db.execute.call_args_list[0][0][1] == ("Fantasy", "Horror", 5, 10)
+    # The facets only aggregate the genres of the matching books
+    assert db.execute.call_args_list[1][0][1] == ("Fantasy", "Horror", "Fantasy", "Horror")
+    assert books.count == 5
+    assert [(facet.genre, facet.count) for facet in books.facets] == [("Fantasy", 4), ("Horror", 2)]
+
+def test_set_book_genres():
+    """ Test the genres of a book are split and replaced in the join table."""
+    db = MagicMock()
+
+    set_book_genres(cursor=db, book_id=7, genres="Fantasy, Epic,,Fantasy")
+
+    assert db.execute.call_args_list[0] == call("DELETE FROM BookGenres WHERE IdBook = %s", (7,))
+    assert db.execute.call_args_list[1][0][1] == ("Fantasy", "Epic")
+    assert db.execute.call_args_list[2][0][1] == (7, "Fantasy", "Epic")
+
 def test_get_all_books(db):
     """ Test for retrieving all books."""
     books = get_all_books(cursor=db)
@@ -105,8 +146,9 @@ def test_update_book(db, book_id):
     update_book(cursor=db, book_id=book_id, book_in=book_in)
 
     # Verify that the insert query was called correctly
-    db.execute.assert_called_once_with( """
-                UPDATE Books SET Title = %s, Authors = %s, Synopsis = %s, BuyLink = %s, Genres = %s, Rating = %s,
+    assert db.execute.call_args_list[0] == call( """
+                UPDATE Books SET Title = %s, Authors = %s, Synopsis = %s, BuyLink = %s, Genres = %s,
+                Rating = IF(RatingCount > 0, RatingSum / RatingCount, %s),
                 Editorial = %s, Comments = %s, PublicationDate = %s, Image = %s
                 WHERE IdBook = %s
             """,
@@ -0,0 +1,75 @@
+""" Tests the streaming catalog export """
+import gzip
+import json
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from app.core import book_export
+from app.core.book_export import chunk_lines, encode_books, stream_books
+from app.crud.book import iter_books
+
+ROWS = [
+    (1, "Dune", "Frank Herbert", None, None, "Sci-fi", Decimal("4.50"), None, None, date(1965, 8, 1), None),
+    (2, "Emma, a novel", "Jane Austen", "Matchmaking", None, "Classic", 4.0, None, None, None, None),
+]
+
+
+def test_iter_books_fetches_in_batches():
+    """ Test the catalog is read with one query and fetched in batches """
+    db = MagicMock()
+    db.fetchmany.side_effect = [ROWS[:1], ROWS[1:], []]
+
+    assert list(iter_books(cursor=db, batch_size=1)) == ROWS
+
+    db.execute.assert_called_once()
+    assert db.fetchmany.call_count == 3
+
+def test_encode_books():
+    """ Test rows are encoded as JSON Lines and as CSV with a header """
+    lines = list(encode_books(ROWS, export_format="jsonl"))
+    book = json.loads(lines[0])
+    assert book["title"] == "Dune"
+    assert book["rating"] == 4.5
+    assert book["publication_date"] == "1965-08-01"
+
+    lines = list(encode_books(ROWS, export_format="csv"))
+    assert lines[0].startswith("id_book,title,authors")
+    assert lines[2].startswith('2,"Emma, a novel",Jane Austen,Matchmaking')
+
+def test_chunk_lines_gzip(monkeypatch):
+    """ Test lines are gathered in chunks that form a valid gzip stream """
+    monkeypatch.setattr(book_export, "CHUNK_SIZE", 10)
+    lines = [f"line {i}\n" for i in range(100)]
+
+    chunks = list(chunk_lines(lines, compress=True))
+
+    assert len(chunks) > 1
+    assert gzip.decompress(b"".join(chunks)).decode() == "".join(lines)
+
+def test_stream_books_releases_connection(monkeypatch):
+    """ Test the stream uses its own pooled connection and gives it back when the client stops reading """
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchmany.side_effect = [ROWS, []]
+    released = []
+
+    @contextmanager
+    def pooled_connection():
+        try:
+            yield connection
+        finally:
+            released.append(connection)
+
+    pool = MagicMock()
+    pool.connection = pooled_connection
+    monkeypatch.setattr(book_export, "get_pool", lambda: pool)
+
+    stream = stream_books(export_format="jsonl")
+    assert b"Dune" in next(stream)
+    stream.close()
+
+    connection.cursor.assert_called_once_with(buffered=False)
+    cursor.close.assert_called_once()
+    assert released == [connection]
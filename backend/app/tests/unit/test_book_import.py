@@ -0,0 +1,105 @@
+""" Tests the bulk book import """
+import io
+from unittest.mock import MagicMock
+
+from app.core.book_import import guess_format, import_books, read_rows
+from app.crud.book import create_books
+from app.crud.counts import count_cache
+from app.models import BookCreate
+
+CSV_FILE = """title,authors,genres,rating,publication_date,synopsis
+Dune,Frank Herbert,"Sci-fi, Classic",4.5,1965-08-01,
+Emma,Jane Austen,Classic,4.1,1815-12-23,A matchmaker
+Broken,Nobody,Classic,not a number,2000-01-01,
+dune,Frank Herbert,Sci-fi,4.5,1965-08-01,
+Ulysses,James Joyce,Classic,3.9,1922-02-02,
+"""
+
+
+def make_connection(existing_titles: list[str]) -> tuple[MagicMock, MagicMock]:
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [(title,) for title in existing_titles]
+    return connection, cursor
+
+
+def test_read_rows():
+    """ Test CSV and JSON Lines files are read with their line numbers """
+    assert guess_format("Books.CSV") == "csv"
+    assert guess_format("books.jsonl") == "jsonl"
+
+    rows = list(read_rows(io.StringIO(CSV_FILE), import_format="csv"))
+    assert rows[0] == (2, {
+        "title": "Dune", "authors": "Frank Herbert", "genres": "Sci-fi, Classic", "rating": "4.5",
+        "publication_date": "1965-08-01", "synopsis": None
+    })
+    assert [line for line, _ in rows] == [2, 3, 4, 5, 6]
+
+    jsonl = '{"title": "Dune"}\n\n{"title": "Emma"}\n'
+    assert list(read_rows(io.StringIO(jsonl), import_format="jsonl")) == [
+        (1, '{"title": "Dune"}\n'), (3, '{"title": "Emma"}\n')
+    ]
+
+def test_import_books_in_batches(monkeypatch):
+    """ Test valid rows are inserted and committed in batches, skipping duplicates and reporting rejections """
+    connection, cursor = make_connection(existing_titles=["EMMA"])
+    created = []
+    monkeypatch.setattr(
+        "app.crud.book.create_books", lambda *, cursor, books: created.append([book.title for book in books])
+    )
+
+    result = import_books(
+        connection=connection, rows=read_rows(io.StringIO(CSV_FILE), import_format="csv"), batch_size=2
+    )
+
+    # "Emma" is already in the catalog and "dune" repeats "Dune"
+    assert created == [["Dune"], ["Ulysses"]]
+    assert connection.commit.call_count == 2
+    assert cursor.execute.call_count == 2
+    assert (result.imported, result.duplicates, result.rejected) == (2, 2, 1)
+    assert result.errors[0].line == 4
+    assert result.errors[0].error.startswith("rating:")
+
+def test_import_rejects_invalid_json():
+    """ Test a line that is not JSON is rejected without stopping the import """
+    connection, _ = make_connection(existing_titles=[])
+
+    result = import_books(connection=connection, rows=[(1, "{not json")])
+
+    assert (result.imported, result.rejected) == (0, 1)
+    connection.commit.assert_not_called()
+
+def test_create_books():
+    """ Test books and their genres are inserted with batched statements """
+    count_cache.invalidate("Books")
+    db = MagicMock()
+    db.fetchall.side_effect = [
+        [(10, "Dune"), (11, "Emma")],
+        [(1, "Sci-fi"), (2, "Classic")],
+    ]
+    books = [
+        BookCreate(title="Dune", authors="Frank Herbert", genres="Sci-fi, Classic", rating=4.5, publication_date="1965"),
+        BookCreate(title="Emma", authors="Jane Austen", genres="classic", rating=4.1, publication_date="1815"),
+    ]
+
+    assert create_books(cursor=db, books=books) == [10, 11]
+
+    assert db.executemany.call_count == 3
+    assert len(db.executemany.call_args_list[0].args[1]) == 2
+    assert db.executemany.call_args_list[1].args[1] == [("Sci-fi",), ("Classic",), ("classic",)]
+    assert db.executemany.call_args_list[2].args[1] == [(1, 10), (2, 10), (2, 11)]
+
+def test_import_counts_books_once_committed():
+    """ Test the cached book count changes only when the batch is committed """
+    connection, cursor = make_connection(existing_titles=[])
+    cursor.fetchall.side_effect = [[], [(10, "Dune")], [(1, "Sci-fi")]]
+    count_cache._counts["Books"] = (5, float("inf"))
+    counts_at_commit = []
+    connection.commit.side_effect = lambda: counts_at_commit.append(count_cache._counts["Books"][0])
+
+    row = {"title": "Dune", "authors": "Frank Herbert", "genres": "Sci-fi", "rating": 4.5, "publication_date": "1965"}
+    import_books(connection=connection, rows=[(1, row)])
+
+    assert counts_at_commit == [5]
+    assert count_cache._counts["Books"][0] == 6
+    count_cache.invalidate("Books")
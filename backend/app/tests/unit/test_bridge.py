@@ -0,0 +1,76 @@
+""" Tests the blocking style code run on the event loop """
+import asyncio
+import threading
+from contextvars import ContextVar
+
+import pytest
+
+from app.core.bridge import await_only, in_bridge, run_blocking, run_sync
+from app.core.singleflight import SingleFlight
+
+request_id: ContextVar[str] = ContextVar("request_id", default="")
+
+
+def test_run_sync_awaits_and_raises():
+    """ Test awaited results and errors are given back to the blocking style code """
+    async def failing():
+        raise ValueError("Invalid cursor")
+
+    def query(value):
+        result = await_only(asyncio.sleep(0, value))
+        with pytest.raises(ValueError):
+            await_only(failing())
+        return result
+
+    assert asyncio.run(run_sync(query, "books")) == "books"
+
+def test_await_only_outside_run_sync():
+    """ Test awaiting from code not run with run_sync is refused """
+    coroutine = asyncio.sleep(0)
+    with pytest.raises(RuntimeError):
+        await_only(coroutine)
+    coroutine.close()
+    assert not in_bridge()
+
+def test_run_sync_sees_the_context_of_the_caller():
+    """ Test context variables of the caller are visible and changes do not leak back """
+    def read():
+        value = request_id.get()
+        request_id.set("changed")
+        return value
+
+    async def scenario():
+        request_id.set("42")
+        return await run_sync(read), request_id.get()
+
+    assert asyncio.run(scenario()) == ("42", "42")
+
+def test_run_blocking_keeps_the_event_loop_free():
+    """ Test a blocking call made from run_sync lets the other coroutines run """
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(run_sync(run_blocking, release.wait, 5))
+        # Runs while the call above blocks its thread
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.wait_for(blocked, timeout=5)
+
+    assert asyncio.run(scenario())
+
+def test_singleflight_coalesces_bridged_calls():
+    """ Test the calls run with run_sync wait for the identical call in flight without blocking the loop """
+    group = SingleFlight(timeout=5)
+    executions = 0
+
+    def load():
+        nonlocal executions
+        executions += 1
+        await_only(asyncio.sleep(0.05))
+        return "books"
+
+    async def scenario():
+        return await asyncio.gather(*(run_sync(group.do, "page", load) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == ["books"] * 3
+    assert executions == 1
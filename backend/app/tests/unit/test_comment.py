@@ -2,7 +2,8 @@
 from unittest.mock import MagicMock
 
 from app.crud.rating import (
-    create_rating, get_ratings, get_rating_by_id, delete_rating
+    create_rating, get_ratings, get_rating_by_id, delete_rating,
+    apply_rating_delta
 )
 
 
@@ -41,4 +42,16 @@ def test_delete_rating(db, comment_id):
     db.execute.assert_called_once_with(
         "DELETE FROM CommentRatingPerBook WHERE IdCommentRating = %s",
         (comment_id,)
-    )
\ No newline at end of file
+    )
+
+def test_apply_rating_delta():
+    """ Test a rating is applied to the book aggregates without reading every rating."""
+    db = MagicMock()
+    db.fetchone.return_value = (4.0,)
+
+    apply_rating_delta(cursor=db, book_id=3, rating_sum=-5, rating_count=-1)
+
+    query, params = db.execute.call_args_list[0][0]
+    assert "RatingSum = RatingSum + %s" in query
+    assert "AVG" not in query
+    assert params == (-5, -1, 3)
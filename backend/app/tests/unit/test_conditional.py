@@ -0,0 +1,94 @@
+""" Tests the conditional requests of the catalog routes """
+import asyncio
+from email.utils import formatdate
+from unittest.mock import MagicMock
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app import crud
+from app.api.cache import CacheControl
+from app.api.deps import get_db
+from app.api.routes import books
+from app.core.db import transaction
+from app.core.response_cache import response_cache
+from app.core.versions import TagVersions
+
+ROW = (1, "Dune", "Frank Herbert", None, None, "Sci-fi", 4.5, None, None, None, None)
+
+
+def test_versions_change_with_their_tags():
+    """ Test the ETag of a response only changes when one of its tags is written """
+    versions = TagVersions(period=3600)
+    book, _ = versions.validators(["book", "book:1"])
+    catalog, _ = versions.validators(["books"])
+
+    versions.bump(["book:1"])
+
+    assert versions.validators(["book", "book:1"])[0] != book
+    assert versions.validators(["books"])[0] == catalog
+    assert book.startswith('W/"')
+
+def test_book_is_revalidated_without_the_database():
+    """ Test a matching If-None-Match is answered with a 304 until the book is written """
+    session = MagicMock()
+    session.cursor.return_value.fetchone.return_value = ROW
+    app = FastAPI()
+    app.include_router(books.router, prefix="/books", dependencies=[Depends(CacheControl("public, no-cache"))])
+    app.dependency_overrides[get_db] = lambda: session
+    response_cache.clear()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/books/book/1")
+            etag = first.headers["ETag"]
+            not_modified = await client.get("/books/book/1", headers={"If-None-Match": etag})
+            crud.rating.apply_rating_delta(cursor=MagicMock(), book_id=1, rating_sum=4, rating_count=1)
+            modified = await client.get("/books/book/1", headers={"If-None-Match": etag})
+            since = await client.get("/books/book/1", headers={"If-Modified-Since": formatdate(usegmt=True)})
+        return first, not_modified, modified, since
+
+    first, not_modified, modified, since = asyncio.run(scenario())
+
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "public, no-cache"
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == first.headers["ETag"]
+    assert not_modified.headers["Cache-Control"] == "public, no-cache"
+    assert modified.status_code == 200
+    assert modified.headers["ETag"] != first.headers["ETag"]
+    assert since.status_code == 304
+    assert session.cursor.call_count == 2
+
+def test_invalid_requests_are_not_revalidated():
+    """ Test a conditional request with invalid parameters is rejected instead of answered with a 304 """
+    session = MagicMock()
+    app = FastAPI()
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_db] = lambda: session
+    headers = {"If-None-Match": "*"}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return (
+                await client.get("/books/", params={"sort": "title"}, headers=headers),
+                await client.get("/books/", params={"after": "not-a-cursor"}, headers=headers),
+                await client.get("/books/book/one", headers=headers),
+            )
+
+    bad_sort, bad_cursor, bad_id = asyncio.run(scenario())
+
+    assert bad_sort.status_code == 422
+    assert bad_cursor.status_code == 400
+    assert bad_id.status_code == 422
+
+def test_versions_are_bumped_after_commit():
+    """ Test the ETag of a book only changes once the write commits """
+    etag, _ = response_cache.versions.validators(["book:1"])
+
+    with transaction(MagicMock()):
+        crud.rating.apply_rating_delta(cursor=MagicMock(), book_id=1, rating_sum=4, rating_count=1)
+        assert response_cache.versions.validators(["book:1"])[0] == etag
+    assert response_cache.versions.validators(["book:1"])[0] != etag
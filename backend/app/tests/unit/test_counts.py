@@ -0,0 +1,37 @@
+""" Tests the cached table row counts """
+from unittest.mock import MagicMock
+
+from app.crud.counts import CountCache
+
+
+def test_count_is_cached():
+    """ Test the table is only counted once while the count is fresh """
+    db = MagicMock()
+    db.fetchone.return_value = (10,)
+    cache = CountCache(ttl=60)
+
+    assert cache.get(cursor=db, table="Books") == 10
+    assert cache.get(cursor=db, table="Books") == 10
+
+    db.execute.assert_called_once_with("SELECT COUNT(1) FROM Books")
+
+def test_count_is_adjusted():
+    """ Test inserts and deletes are applied to the cached count """
+    db = MagicMock()
+    db.fetchone.return_value = (10,)
+    cache = CountCache(ttl=60)
+    cache.get(cursor=db, table="users")
+
+    cache.adjust("users", 2)
+    cache.adjust("users", -1)
+
+    assert cache.get(cursor=db, table="users") == 11
+
+def test_count_expires():
+    """ Test the table is counted again once the ttl is over """
+    db = MagicMock()
+    db.fetchone.side_effect = [(10,), (12,)]
+    cache = CountCache(ttl=0)
+
+    assert cache.get(cursor=db, table="Books") == 10
+    assert cache.get(cursor=db, table="Books") == 12
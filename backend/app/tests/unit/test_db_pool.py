@@ -0,0 +1,80 @@
+""" Tests the MySQL connection pool """
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.db import ConnectionPool, PoolTimeoutError, after_commit, transaction
+
+
+def test_pool_reuses_connections():
+    """ Test a released connection is handed out again """
+    creator = MagicMock(side_effect=lambda: MagicMock())
+    pool = ConnectionPool(creator=creator, size=1, max_overflow=0)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert creator.call_count == 1
+    first.rollback.assert_called()
+
+def test_pool_closes_overflow_connections():
+    """ Test overflow connections are closed when returned """
+    creator = MagicMock(side_effect=lambda: MagicMock())
+    pool = ConnectionPool(creator=creator, size=1, max_overflow=1)
+
+    first = pool.acquire()
+    second = pool.acquire()
+    assert pool.stats()["in_use"] == 2
+
+    pool.release(first)
+    pool.release(second)
+
+    second.close.assert_called_once()
+    assert pool.stats()["idle"] == 1
+
+def test_pool_times_out_when_exhausted():
+    """ Test waiting for a connection is bounded by the timeout """
+    pool = ConnectionPool(creator=MagicMock, size=1, max_overflow=0, timeout=0.01)
+
+    pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+def test_pool_replaces_dead_connections():
+    """ Test pre-ping discards connections that are no longer alive """
+    creator = MagicMock(side_effect=lambda: MagicMock())
+    pool = ConnectionPool(creator=creator, size=1, max_overflow=0)
+
+    dead = pool.acquire()
+    pool.release(dead)
+    dead.ping.side_effect = PoolTimeoutError()
+
+    alive = pool.acquire()
+
+    assert alive is not dead
+    dead.close.assert_called_once()
+
+def test_transaction_runs_callbacks_after_commit():
+    """ Test the after commit callbacks wait for the commit and are dropped on errors """
+    connection = MagicMock()
+    calls = []
+    connection.commit.side_effect = lambda: calls.append("commit")
+
+    with transaction(connection):
+        after_commit(calls.append, "callback")
+        assert calls == []
+    assert calls == ["commit", "callback"]
+
+    with pytest.raises(ValueError):
+        with transaction(connection):
+            after_commit(calls.append, "dropped")
+            raise ValueError
+    assert calls == ["commit", "callback"]
+
+    after_commit(calls.append, "now")
+    assert calls[-1] == "now"
@@ -0,0 +1,24 @@
+""" Tests the compiled email templates """
+from jinja2 import FileSystemLoader
+
+from app import utils
+
+
+def test_templates_are_compiled_once(tmp_path, monkeypatch):
+    """ Test the templates are compiled at startup and reused by single and batch renders """
+    (tmp_path / "welcome.html").write_text("<p>Hello {{ username }}</p>")
+    monkeypatch.setattr(utils.email_templates, "loader", FileSystemLoader(tmp_path))
+    compiled = []
+    compile_template = utils.email_templates._compile
+    monkeypatch.setattr(
+        utils.email_templates, "_compile",
+        lambda source, filename: compiled.append(filename) or compile_template(source, filename)
+    )
+
+    assert utils.compile_email_templates() == 1
+
+    assert utils.render_email_template(template_name="welcome.html", context={"username": "ana"}) == "<p>Hello ana</p>"
+    assert utils.render_email_templates(
+        template_name="welcome.html", contexts=[{"username": "ana"}, {"username": "joan"}]
+    ) == ["<p>Hello ana</p>", "<p>Hello joan</p>"]
+    assert len(compiled) <= 1
@@ -0,0 +1,96 @@
+""" Tests the password hashing pool """
+import threading
+import time
+
+import bcrypt
+import pytest
+
+from app.core import hashing
+from app.core.hashing import HashingBusyError, PasswordHasher, hash_rounds
+
+
+def test_hash_and_verify():
+    """ Test a hash made by the pool is a bcrypt hash of the password """
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    try:
+        hashed = hasher.hash("secret")
+
+        assert bcrypt.checkpw(b"secret", hashed.encode("utf-8"))
+        assert hasher.verify("secret", hashed)
+        assert not hasher.verify("wrong", hashed)
+
+        stats = hasher.stats()
+        assert stats["completed"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["avg_hash_time"] > 0
+    finally:
+        hasher.shutdown()
+
+def test_rejects_when_saturated(monkeypatch):
+    """ Test operations beyond the workers and the queue fail right away """
+    release = threading.Event()
+
+    def slow_check(password, hashed, rounds):
+        release.wait(5)
+        return (True, None), time.time(), 0.0
+
+    monkeypatch.setattr(hashing, "_check_password", slow_check)
+    hasher = PasswordHasher(workers=1, queue_size=0)
+    busy = threading.Thread(target=hasher.verify, args=("secret", "hash"))
+    busy.start()
+    try:
+        while hasher.stats()["in_flight"] == 0:
+            time.sleep(0.01)
+
+        with pytest.raises(HashingBusyError):
+            hasher.verify("secret", "hash")
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        release.set()
+        busy.join()
+        hasher.shutdown()
+
+def test_unknown_executor():
+    """ Test only thread and process pools are accepted """
+    with pytest.raises(ValueError):
+        PasswordHasher(executor="fiber")
+
+def test_rehash_on_lower_rounds():
+    """ Test a matching password hashed with a lower work factor gets a new hash """
+    hasher = PasswordHasher(workers=1, rounds=5)
+    try:
+        old_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode("utf-8")
+
+        assert hasher.verify_and_update("wrong", old_hash) == (False, None)
+        matches, new_hash = hasher.verify_and_update("secret", old_hash)
+        assert matches
+        assert hash_rounds(new_hash) == 5
+        assert hasher.verify_and_update("secret", new_hash) == (True, None)
+        assert hasher.stats()["rehashes"] == 1
+        assert hasher.stats()["hashes_by_rounds"] == {5: 1}
+    finally:
+        hasher.shutdown()
+
+def test_no_rehash_on_higher_rounds():
+    """ Test a hash made with a higher work factor, e.g. by another worker, is kept """
+    hasher = PasswordHasher(workers=1, rounds=4)
+    try:
+        stored_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt(5)).decode("utf-8")
+
+        assert hasher.verify_and_update("secret", stored_hash) == (True, None)
+        assert hasher.stats()["rehashes"] == 0
+    finally:
+        hasher.shutdown()
+
+def test_calibrate():
+    """ Test the work factor grows with the time budget and stays within its bounds """
+    hasher = PasswordHasher(workers=1, min_rounds=4, max_rounds=31, target_time=0.0001)
+    try:
+        assert hasher.calibrate() == 4
+        hasher.target_time = 60
+        assert 4 < hasher.calibrate() < 31
+
+        fixed = PasswordHasher(workers=1, rounds=6, target_time=60)
+        assert fixed.calibrate() == 6
+    finally:
+        hasher.shutdown()
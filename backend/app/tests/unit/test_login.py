@@ -0,0 +1,102 @@
+""" Tests the cached login lookups, the login metrics and the cached token verification """
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.deps import get_current_user
+from app.core.db import transaction
+from app.core.metrics import PhaseTimer
+from app.core.security import create_access_token
+from app.crud.user import (
+    forget_login_credentials, get_login_credentials, login_cache,
+    token_user_cache, update_user
+)
+from app.models import UserUpdate
+
+
+def test_login_credentials_are_cached():
+    """ Test repeated logins with an email look the user up once """
+    login_cache.clear()
+    db = MagicMock()
+    db.fetchone.return_value = (3, "hash")
+
+    assert get_login_credentials(cursor=db, email="Test@Test") == (3, "hash")
+    assert get_login_credentials(cursor=db, email="test@test") == (3, "hash")
+
+    db.execute.assert_called_once()
+
+def test_unknown_email_is_cached_until_signup():
+    """ Test failed attempts with an unknown email are cached until the account is created """
+    login_cache.clear()
+    db = MagicMock()
+    db.fetchone.return_value = None
+
+    assert get_login_credentials(cursor=db, email="new@test") is None
+    assert get_login_credentials(cursor=db, email="new@test") is None
+    assert db.execute.call_count == 1
+
+    forget_login_credentials(email="new@test")
+    db.fetchone.return_value = (4, "hash")
+    assert get_login_credentials(cursor=db, email="new@test") == (4, "hash")
+
+def test_forget_login_credentials_of_user():
+    """ Test a password change drops the cached lookups of the user only """
+    login_cache.clear()
+    db = MagicMock()
+    db.fetchone.side_effect = [(1, "a"), (2, "b"), (1, "c")]
+    get_login_credentials(cursor=db, email="one@test")
+    get_login_credentials(cursor=db, email="two@test")
+
+    forget_login_credentials(user_id=1)
+
+    assert get_login_credentials(cursor=db, email="two@test") == (2, "b")
+    assert get_login_credentials(cursor=db, email="one@test") == (1, "c")
+
+def test_phase_timer():
+    """ Test outcomes are counted and phase durations aggregated """
+    timer = PhaseTimer()
+    timer.record("success", {"lookup": 0.1, "total": 0.3})
+    timer.record("wrong_password", {"lookup": 0.3, "total": 0.5})
+
+    stats = timer.stats()
+    assert stats["outcomes"] == {"success": 1, "wrong_password": 1}
+    assert stats["phases"]["lookup"]["count"] == 2
+    assert abs(stats["phases"]["lookup"]["avg_time"] - 0.2) < 1e-9
+    assert stats["phases"]["total"]["max_time"] == 0.5
+
+def test_current_user_is_cached_until_updated(monkeypatch):
+    """ Test a verified token is served from the cache until its user is updated """
+    token_user_cache.clear()
+    token = create_access_token(7, expires_delta=timedelta(minutes=5))
+    pool = MagicMock()
+    monkeypatch.setattr("app.api.deps.get_pool", lambda: pool)
+    session = pool.connection.return_value.__enter__.return_value
+    cursor = session.cursor.return_value
+    cursor.fetchone.return_value = {"id_user": 7, "name": "Test"}
+
+    assert get_current_user(token)["name"] == "Test"
+    assert get_current_user(token)["name"] == "Test"
+    # A cached token checks out no connection
+    assert pool.connection.call_count == 1
+    assert cursor.execute.call_count == 1
+
+    connection = MagicMock()
+    with transaction(connection):
+        update_user(cursor=MagicMock(), user_id=7, user_in=UserUpdate(name="Other", username="other"))
+        # The entries are dropped once the update is committed
+        assert get_current_user(token)["name"] == "Test"
+    cursor.fetchone.return_value = {"id_user": 7, "name": "Other"}
+    assert get_current_user(token)["name"] == "Other"
+    assert cursor.execute.call_count == 2
+
+def test_expired_token_is_not_cached():
+    """ Test an expired token is rejected and never cached """
+    token_user_cache.clear()
+    token = create_access_token(7, expires_delta=timedelta(minutes=-1))
+
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(token)
+    assert exc_info.value.status_code == 403
+    assert len(token_user_cache) == 0
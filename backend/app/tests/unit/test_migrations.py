@@ -0,0 +1,51 @@
+""" Tests the migrations of the MySQL schema """
+from unittest.mock import MagicMock, patch
+
+from app.core import migrations
+
+
+def test_only_pending_migrations_are_applied():
+    """ Test the recorded migrations are skipped and the new ones recorded once applied """
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [("0001_first",)]
+    first, second = MagicMock(), MagicMock()
+
+    with patch.object(migrations, "MIGRATIONS", [("0001_first", first), ("0002_second", second)]):
+        assert migrations.migrate(connection) == ["0002_second"]
+
+    first.assert_not_called()
+    second.assert_called_once_with(cursor)
+    cursor.execute.assert_called_with("INSERT INTO SchemaMigrations (Name) VALUES (%s)", ("0002_second",))
+    connection.commit.assert_called_once()
+
+def test_rating_aggregates_are_added_once():
+    """ Test the aggregate columns are only added when missing and always backfilled """
+    cursor = MagicMock()
+    # RatingSum exists already, RatingCount does not
+    cursor.fetchone.side_effect = [(1,), None]
+
+    with patch("app.crud.rating.recalculate_rating_aggregates") as recalculate:
+        migrations.add_rating_aggregates(cursor)
+
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    assert "ALTER TABLE Books ADD COLUMN RatingCount INT NOT NULL DEFAULT 0" in statements
+    assert not any("ADD COLUMN RatingSum" in statement for statement in statements)
+    recalculate.assert_called_once_with(cursor=cursor)
+
+def test_book_genres_are_backfilled():
+    """ Test every genre of the books is created once, whatever its case, and linked to its books """
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [(1, "Fantasy, Adventure"), (2, "fantasy"), (3, None)],
+        [("Adventure", 10), ("Fantasy", 11)],
+    ]
+
+    migrations.add_book_genres(cursor)
+
+    (genres_query, genres), (_, book_genres) = (
+        call.args for call in cursor.executemany.call_args_list
+    )
+    assert genres_query == "INSERT IGNORE INTO Genres (Name) VALUES (%s)"
+    assert genres == [("Adventure",), ("Fantasy",)]
+    assert sorted(book_genres) == [(10, 1), (11, 1), (11, 2)]
@@ -0,0 +1,116 @@
+""" Tests the background email outbox """
+import time
+from unittest.mock import MagicMock
+
+from app.core.outbox import EmailOutbox
+
+
+def make_outbox(deliver, **kwargs) -> tuple[EmailOutbox, MagicMock]:
+    connect = MagicMock()
+    return EmailOutbox(connect=connect, deliver=deliver, **kwargs), connect
+
+
+def test_messages_share_a_connection():
+    """ Test due messages are sent in order over a single SMTP connection """
+    deliver = MagicMock()
+    outbox, connect = make_outbox(deliver)
+    outbox.enqueue(email_to="a@test", subject="A", html_content="<p>a</p>")
+    outbox.enqueue(email_to="b@test", subject="B", html_content="<p>b</p>")
+
+    assert outbox.deliver_due() is None
+
+    connect.assert_called_once()
+    assert [call.kwargs["email_to"] for call in deliver.call_args_list] == ["a@test", "b@test"]
+    assert outbox.stats() == {"pending": 0, "dead": 0, "sent": 2, "failed_attempts": 0, "connections": 1}
+
+def test_failed_message_is_retried_with_backoff():
+    """ Test a failed message waits before its retry, on a new connection """
+    deliver = MagicMock(side_effect=[OSError("relay down"), None])
+    outbox, connect = make_outbox(deliver, retry_delay=0.05)
+    outbox.enqueue(email_to="a@test", subject="A", html_content="")
+
+    next_due = outbox.deliver_due()
+    assert 0 < next_due <= 0.05
+    assert outbox.stats()["pending"] == 1
+
+    time.sleep(next_due)
+    assert outbox.deliver_due() is None
+    assert connect.call_count == 2
+    assert outbox.stats()["sent"] == 1
+
+def test_dead_letters():
+    """ Test a message failing every attempt ends in the dead letters and can be queued again """
+    deliver = MagicMock(side_effect=OSError("mailbox unavailable"))
+    outbox, _ = make_outbox(deliver, max_attempts=2, retry_delay=0)
+    outbox.enqueue(email_to="a@test", subject="A", html_content="")
+
+    outbox.deliver_due()
+    outbox.deliver_due()
+
+    assert outbox.dead_letters() == [
+        {"id": 1, "email_to": "a@test", "subject": "A", "attempts": 2, "last_error": "mailbox unavailable"}
+    ]
+    assert outbox.stats()["pending"] == 0
+
+    deliver.side_effect = None
+    assert outbox.retry_dead_letters() == 1
+    outbox.deliver_due()
+    assert outbox.dead_letters() == []
+    assert outbox.stats()["sent"] == 1
+
+def test_background_sender():
+    """ Test enqueued messages are sent by the background thread """
+    deliver = MagicMock()
+    outbox, _ = make_outbox(deliver)
+    outbox.start()
+    try:
+        outbox.enqueue(email_to="a@test", subject="A", html_content="")
+        deadline = time.monotonic() + 2
+        while outbox.stats()["sent"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        outbox.stop()
+
+    deliver.assert_called_once()
+
+def test_persistent_outbox(tmp_path):
+    """ Test messages stored in a SQLite file survive a restart """
+    path = str(tmp_path / "outbox.sqlite")
+    outbox, _ = make_outbox(MagicMock(), path=path)
+    outbox.enqueue(email_to="a@test", subject="A", html_content="")
+
+    deliver = MagicMock()
+    restarted, _ = make_outbox(deliver, path=path)
+    restarted.deliver_due()
+
+    deliver.assert_called_once()
+
+def test_shared_outbox_sends_once(tmp_path):
+    """ Test two processes sharing an outbox file never send the same message twice """
+    path = str(tmp_path / "outbox.sqlite")
+    first_deliver, second_deliver = MagicMock(), MagicMock()
+    first, _ = make_outbox(first_deliver, path=path)
+    second, _ = make_outbox(second_deliver, path=path)
+    first.enqueue(email_to="a@test", subject="A", html_content="")
+
+    # The second process claims the message while the first one is about to send it
+    first_deliver.side_effect = lambda *args, **kwargs: second.deliver_due()
+    first.deliver_due()
+
+    first_deliver.assert_called_once()
+    second_deliver.assert_not_called()
+    assert first.stats()["pending"] == 0
+
+def test_expired_claim_is_retried():
+    """ Test a message claimed by a process that died is sent once the claim expires """
+    deliver = MagicMock()
+    outbox, _ = make_outbox(deliver, claim_timeout=0.05)
+    message_id = outbox.enqueue(email_to="a@test", subject="A", html_content="")
+    assert outbox._claim(message_id)
+
+    assert 0 < outbox.deliver_due() <= 0.05
+    deliver.assert_not_called()
+
+    time.sleep(0.05)
+    assert outbox.deliver_due() is None
+    deliver.assert_called_once()
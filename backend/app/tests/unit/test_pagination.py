@@ -0,0 +1,89 @@
+""" Tests keyset pagination helpers """
+import sqlite3
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.crud.book import get_all_books
+from app.crud.pagination import SortKey, encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip():
+    """ Test a cursor gives back the sort key and id it was built from """
+    token = encode_cursor(sort="rating", key=Decimal("4.50"), last_id=42)
+
+    assert decode_cursor(token, sort="rating") == ("4.50", 42)
+
+def test_cursor_with_date_key():
+    """ Test dates are stored in ISO format """
+    token = encode_cursor(sort="publication_date", key=date(2024, 11, 5), last_id=7)
+
+    assert decode_cursor(token, sort="publication_date") == ("2024-11-05", 7)
+
+def test_invalid_cursor():
+    """ Test malformed cursors are rejected """
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", sort="id")
+
+def test_cursor_for_another_sort():
+    """ Test cursors can not be reused with a different order """
+    token = encode_cursor(sort="id", key=3, last_id=3)
+
+    with pytest.raises(ValueError):
+        decode_cursor(token, sort="rating")
+
+def test_sort_key_after():
+    """ Test the keyset condition follows the sort direction """
+    sort_key = SortKey(column="Rating", id_column="IdBook", descending=True)
+
+    condition, params = sort_key.after(4.5, 10)
+
+    assert condition == "(Rating < %s OR (Rating = %s AND IdBook < %s))"
+    assert params == (4.5, 4.5, 10)
+    assert sort_key.order_by() == "ORDER BY Rating DESC, IdBook DESC"
+
+def test_get_all_books_next_cursor():
+    """ Test a full page returns the cursor of the following one """
+    db = MagicMock()
+    db.fetchall.return_value = [
+        (book_id, "Title", "Author", None, None, "Genre", 3.0, None, None, date(2024, 1, book_id), None)
+        for book_id in (1, 2)
+    ]
+
+    books = get_all_books(cursor=db, limit=2, include_count=False)
+    assert decode_cursor(books.next_cursor, sort="id") == (2, 2)
+
+    get_all_books(cursor=db, limit=2, after=books.next_cursor, include_count=False)
+    query, params = db.execute.call_args[0]
+    assert "WHERE IdBook > %s" in query
+    assert params == (2, 2)
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_include_null_keys(descending):
+    """ Test walking the pages of a nullable key returns every row once, NULL keys in MySQL order """
+    sort_key = SortKey(column="PublicationDate", id_column="IdBook", descending=descending, nullable=True)
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE Books (IdBook INTEGER PRIMARY KEY, PublicationDate TEXT)")
+    db.executemany("INSERT INTO Books VALUES (?, ?)", [
+        (1, "2020-01-01"), (2, None), (3, "2021-05-01"), (4, None), (5, "2020-01-01"), (6, None),
+    ])
+
+    seen, after = [], None
+    while True:
+        where, params = sort_key.after(*after) if after else ("1 = 1", ())
+        rows = db.execute(
+            f"SELECT IdBook, PublicationDate FROM Books WHERE {where} {sort_key.order_by()} LIMIT 2".replace("%s", "?"),
+            params
+        ).fetchall()
+        if not rows:
+            break
+        seen += [book_id for book_id, _ in rows]
+        after = (rows[-1][1], rows[-1][0])
+
+    # SQLite sorts NULL below every value, as MySQL does
+    expected = [book_id for book_id, _ in db.execute(
+        f"SELECT IdBook, PublicationDate FROM Books {sort_key.order_by()}").fetchall()]
+    assert seen == expected
+    assert sorted(seen) == [1, 2, 3, 4, 5, 6]
@@ -0,0 +1,72 @@
+""" Tests the user profile assembled from concurrent queries """
+import json
+import threading
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+from app.api.responses import FastJSONResponse
+from app.core import profile
+from app.crud.book import book_from_row
+from app.models import BooksOut
+
+ROW = (1, "Dune", "Frank Herbert", None, None, "Sci-fi", 4.5, None, None, None, None)
+
+
+def fake_pool():
+    """ Pool handing out mocked connections """
+    pool = MagicMock()
+
+    @contextmanager
+    def connection():
+        yield MagicMock()
+
+    pool.connection = connection
+    return pool
+
+
+def test_profile_queries_sections_concurrently(monkeypatch):
+    """ Test the user and every section are queried at the same time on their own connections """
+    barrier = threading.Barrier(5, timeout=5)
+
+    def query(result):
+        def run(**_kwargs):
+            barrier.wait()
+            return result
+        return run
+
+    monkeypatch.setattr(profile, "get_pool", fake_pool)
+    monkeypatch.setattr(profile.crud.user, "get_user_by_id", query((3, "Ana", None, "ana", "ana@test")))
+    monkeypatch.setattr(profile.crud.mybooks, "get_mybooks_books", query(BooksOut(data=[], count=0)))
+    monkeypatch.setattr(profile.crud.readbooks, "get_readbooks_books", query(BooksOut(data=[book_from_row(ROW)], count=1)))
+    monkeypatch.setattr(profile.crud.rating, "get_books_with_ratings_by_user", query(
+        {"data": [{"book": book_from_row(ROW), "user_rating": 5}], "count": 1, "next_cursor": None}))
+    monkeypatch.setattr(profile.crud.stats, "get_user_stats", query({"rating_count": 1}))
+
+    user_profile = json.loads(FastJSONResponse(profile.get_user_profile(user_id=3)).body)
+
+    assert user_profile["user"]["username"] == "ana"
+    assert user_profile["mybooks"] == {"data": [], "count": 0, "next_cursor": None}
+    assert user_profile["readbooks"]["data"][0]["title"] == "Dune"
+    assert user_profile["ratings"]["data"][0]["user_rating"] == 5
+    assert user_profile["stats"] == {"rating_count": 1}
+
+def test_profile_only_returns_requested_sections(monkeypatch):
+    """ Test the sections not requested are neither queried nor returned """
+    get_user_stats = MagicMock()
+    monkeypatch.setattr(profile, "get_pool", fake_pool)
+    monkeypatch.setattr(profile.crud.user, "get_user_by_id", MagicMock(return_value=(3, "Ana", None, "ana", "a@b")))
+    monkeypatch.setattr(profile.crud.readbooks, "get_readbooks_books", MagicMock(return_value=BooksOut(data=[], count=0)))
+    monkeypatch.setattr(profile.crud.stats, "get_user_stats", get_user_stats)
+
+    user_profile = profile.get_user_profile(user_id=3, sections=["readbooks"])
+
+    assert set(user_profile) == {"user", "readbooks"}
+    get_user_stats.assert_not_called()
+
+def test_profile_of_unknown_user(monkeypatch):
+    """ Test no profile is returned for a user that does not exist """
+    monkeypatch.setattr(profile, "get_pool", fake_pool)
+    monkeypatch.setattr(profile.crud.user, "get_user_by_id", MagicMock(return_value=None))
+    monkeypatch.setattr(profile.crud.stats, "get_user_stats", MagicMock())
+
+    assert profile.get_user_profile(user_id=3, sections=["stats"]) is None
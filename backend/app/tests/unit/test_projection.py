@@ -0,0 +1,53 @@
+""" Tests the column projections of the book listings """
+import json
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.api.responses import FastJSONResponse
+from app.crud.book import book_projection, get_all_books
+from app.crud.pagination import decode_cursor
+from app.crud.rating import get_books_with_ratings_by_user
+
+
+def test_projection_selects_only_the_fields():
+    """ Test a projection selects the ID and the given fields, and maps its rows to partial books """
+    projection = book_projection(["image", "rating", "title"])
+
+    assert projection is book_projection(["title", "rating", "image"])
+    assert projection.select("b") == "b.IdBook, b.Title, b.Rating, b.Image"
+
+    book = projection.from_row((7, "Dune", Decimal("4.50"), "dune.jpg"))
+    assert json.loads(FastJSONResponse(book).body) == {
+        "id_book": 7, "title": "Dune", "rating": 4.5, "image": "dune.jpg"
+    }
+
+def test_projection_rejects_unknown_fields():
+    """ Test an unknown field is reported """
+    with pytest.raises(ValueError):
+        book_projection(["title", "password"])
+
+def test_all_books_projection_keeps_sort_key():
+    """ Test a projected listing still selects its sort key for the next cursor """
+    db = MagicMock()
+    db.fetchall.return_value = [(1, "Dune", date(1965, 8, 1)), (2, "Emma", date(1815, 12, 23))]
+
+    books = get_all_books(cursor=db, limit=2, sort="publication_date", include_count=False, fields=["title"])
+
+    assert "SELECT IdBook, Title, PublicationDate FROM Books" in db.execute.call_args[0][0]
+    assert books.data[1].publication_date == "1815-12-23"
+    assert decode_cursor(books.next_cursor, sort="publication_date") == ("1815-12-23", 2)
+
+def test_rated_books_projection():
+    """ Test the books rated by a user are mapped with the projection, followed by their rating """
+    db = MagicMock()
+    db.fetchall.return_value = [(3, "Dune", 5, 40, 40)]
+    db.fetchone.return_value = (1,)
+
+    result = get_books_with_ratings_by_user(cursor=db, user_id=1, limit=1, fields=["title"])
+
+    assert result["data"][0]["book"].title == "Dune"
+    assert result["data"][0]["user_rating"] == 5
+    assert decode_cursor(result["next_cursor"], sort="id") == (40, 40)
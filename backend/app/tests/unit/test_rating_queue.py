@@ -0,0 +1,124 @@
+""" Tests the write-behind rating queue """
+import asyncio
+import time
+from contextlib import nullcontext
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import books
+from app.core.db import transaction
+from app.core.rating_queue import RatingAggregator
+from app.crud import rating
+
+
+def make_aggregator(**kwargs) -> tuple[RatingAggregator, MagicMock, MagicMock]:
+    """ Creates an enabled aggregator writing to a mocked connection """
+    apply_delta = MagicMock()
+    connection = MagicMock()
+    aggregator = RatingAggregator(
+        apply_delta=apply_delta,
+        connection_factory=lambda: nullcontext(connection),
+        enabled=True,
+        flush_interval=60,
+        **kwargs
+    )
+    aggregator.start()
+    return aggregator, apply_delta, connection
+
+def test_deltas_are_coalesced_per_book():
+    """ Test several ratings of a book are applied with one update """
+    aggregator, apply_delta, connection = make_aggregator()
+
+    aggregator.submit(book_id=1, rating_sum=5, rating_count=1)
+    aggregator.submit(book_id=1, rating_sum=3, rating_count=1)
+    aggregator.submit(book_id=2, rating_sum=4, rating_count=1)
+    aggregator.stop()
+
+    assert apply_delta.call_count == 2
+    apply_delta.assert_any_call(cursor=connection.cursor(), book_id=1, rating_sum=8, rating_count=2)
+    connection.commit.assert_called_once()
+    assert aggregator.stats()["coalesced"] == 1
+
+def test_full_queue_rejects():
+    """ Test a full queue gives the delta back to the caller """
+    aggregator, _, _ = make_aggregator(max_pending=1, put_timeout=0)
+
+    assert aggregator.accepts(1)
+    aggregator.submit(book_id=1, rating_sum=5, rating_count=1)
+    # Another delta of a waiting book is coalesced, a new book has to wait
+    assert aggregator.accepts(1)
+    assert not aggregator.accepts(2)
+    assert aggregator.stats()["rejected"] == 1
+    aggregator.stop()
+
+def test_disabled_aggregator():
+    """ Test nothing is queued unless the write-behind mode is enabled """
+    aggregator = RatingAggregator(apply_delta=MagicMock(), connection_factory=MagicMock())
+    aggregator.start()
+
+    assert not aggregator.accepts(1)
+
+def test_failed_flush_is_retried():
+    """ Test deltas are kept when the flush fails """
+    aggregator, apply_delta, _ = make_aggregator()
+    apply_delta.side_effect = [RuntimeError("db down"), None]
+
+    aggregator.submit(book_id=1, rating_sum=5, rating_count=1)
+    try:
+        aggregator.flush()
+    except RuntimeError:
+        pass
+    assert aggregator.stats()["pending_books"] == 1
+
+    aggregator.stop()
+    assert aggregator.stats()["pending_books"] == 0
+
+def test_full_queue_does_not_wait_on_the_event_loop():
+    """ Test the queue gives up at once instead of blocking the event loop """
+    aggregator, _, _ = make_aggregator(max_pending=1, put_timeout=5)
+    aggregator.submit(book_id=1, rating_sum=5, rating_count=1)
+
+    async def accepts():
+        return aggregator.accepts(2)
+
+    start = time.monotonic()
+    assert not asyncio.run(accepts())
+    assert time.monotonic() - start < 1
+    aggregator.stop()
+
+def test_delta_is_queued_after_commit():
+    """ Test a delta is only queued once the transaction of the comment commits """
+    aggregator, _, _ = make_aggregator()
+    connection = MagicMock()
+
+    with patch.object(rating, "rating_aggregator", aggregator):
+        with pytest.raises(RuntimeError):
+            with transaction(connection):
+                rating.record_rating_delta(cursor=MagicMock(), book_id=1, rating_sum=5, rating_count=1)
+                raise RuntimeError("rolled back")
+        assert aggregator.stats()["pending_books"] == 0
+
+        with transaction(connection):
+            rating.record_rating_delta(cursor=MagicMock(), book_id=1, rating_sum=5, rating_count=1)
+            assert aggregator.stats()["pending_books"] == 0
+        assert aggregator.stats()["pending_books"] == 1
+    aggregator.stop()
+
+def test_concurrent_delete_removes_the_rating_once():
+    """ Test only the request whose delete removed the comment subtracts its rating """
+    session = MagicMock()
+    cursor = session.cursor.return_value
+    cursor.fetchone.return_value = (1, 5, 3)
+
+    with patch.object(rating, "record_rating_delta") as record_rating_delta:
+        cursor.rowcount = 1
+        books.delete_comment(session, 10)
+        # A concurrent request deleted the comment between the lookup and the delete
+        cursor.rowcount = 0
+        with pytest.raises(HTTPException) as exc_info:
+            books.delete_comment(session, 10)
+
+    assert exc_info.value.status_code == 404
+    record_rating_delta.assert_called_once_with(cursor=cursor, book_id=1, rating_sum=-5, rating_count=-1)
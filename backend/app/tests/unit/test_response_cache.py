@@ -0,0 +1,126 @@
+""" Tests the response cache of the catalog routes """
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app import crud
+from app.api.deps import get_db
+from app.api.routes import books
+from app.core.db import transaction
+from app.core.response_cache import MemoryBackend, RedisBackend, ResponseCache, response_cache
+from app.core.versions import TagVersions
+
+ROW = (1, "Dune", "Frank Herbert", None, None, "Sci-fi", 4.5, None, None, None, None)
+
+
+def test_memory_backend_evicts_by_size():
+    """ Test the least recently used bodies are evicted once the size limit is exceeded """
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"1234", tags=["books"], ttl=60)
+    backend.set("b", b"1234", tags=["books"], ttl=60)
+    backend.get("a")
+    backend.set("c", b"1234", tags=["book:1"], ttl=60)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1234"
+    assert backend.stats() == {"entries": 2, "size_bytes": 8, "evictions": 1}
+
+def test_cache_invalidates_by_tag():
+    """ Test only the responses cached under an invalidated tag are dropped """
+    cache = ResponseCache(MemoryBackend(max_bytes=1000), ttl=60)
+    cache.set("list", b"[]", tags=["books"])
+    cache.set("detail", b"{}", tags=["book", "book:1"])
+
+    cache.invalidate("book:1")
+
+    assert cache.get("list") == b"[]"
+    assert cache.get("detail") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["hits"] == 1
+
+def test_redis_backend_invalidates_by_tag():
+    """ Test the Redis backend against an in-memory Redis """
+    fakeredis = pytest.importorskip("fakeredis")
+    backend = RedisBackend(fakeredis.FakeRedis())
+    backend.set("list", b"[]", tags=["books"], ttl=60)
+    backend.set("detail", b"{}", tags=["book:1"], ttl=60)
+
+    assert backend.invalidate(["book:1"]) == 1
+    assert backend.get("list") == b"[]"
+    assert backend.get("detail") is None
+
+def test_route_is_served_from_cache_until_invalidated():
+    """ Test a cached route skips the database until a write invalidates it """
+    session = MagicMock()
+    session.cursor.return_value.fetchone.return_value = ROW
+    app = FastAPI()
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_db] = lambda: session
+    response_cache.clear()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/books/book/1")
+            second = await client.get("/books/book/1")
+            crud.book.delete_book(cursor=MagicMock(), book_id=1)
+            third = await client.get("/books/book/1")
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert [first.headers["X-Cache"], second.headers["X-Cache"], third.headers["X-Cache"]] == ["MISS", "HIT", "MISS"]
+    assert second.json() == first.json()
+    assert session.cursor.call_count == 2
+
+def test_writes_invalidate_after_commit():
+    """ Test a write drops the cached responses only once its transaction commits """
+    cache = ResponseCache(MemoryBackend(max_bytes=1000), ttl=60)
+    cache.set("book", b"{}", tags=["book:1"])
+    connection = MagicMock()
+
+    with patch.object(crud.book, "response_cache", cache):
+        with transaction(connection):
+            crud.book.delete_book(cursor=MagicMock(), book_id=1)
+            assert cache.get("book") == b"{}"
+        assert cache.get("book") is None
+
+def test_response_read_before_a_commit_is_not_cached():
+    """ Test a response rendered while a write commits is not cached after its invalidation """
+    session = MagicMock()
+
+    def read_then_commit():
+        # Another request commits an update of the book once this one has read it
+        response_cache.invalidate("books", "book:1")
+        return ROW
+
+    session.cursor.return_value.fetchone.side_effect = read_then_commit
+    app = FastAPI()
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[get_db] = lambda: session
+    response_cache.clear()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/books/book/1")
+            second = await client.get("/books/book/1")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert [first.headers["X-Cache"], second.headers["X-Cache"]] == ["MISS", "MISS"]
+    assert session.cursor.call_count == 2
+
+def test_set_skips_invalidated_snapshot():
+    """ Test a body is only cached if its tags were not invalidated since the snapshot """
+    cache = ResponseCache(MemoryBackend(max_bytes=1000), ttl=60, versions=TagVersions(period=0))
+    snapshot = cache.snapshot(["book:1"])
+    cache.invalidate("book:1")
+
+    assert not cache.set("book", b"{}", tags=["book:1"], snapshot=snapshot)
+    assert cache.get("book") is None
+    assert cache.set("book", b"{}", tags=["book:1"], snapshot=cache.snapshot(["book:1"]))
@@ -0,0 +1,31 @@
+""" Tests the fast serialization of the listings """
+import json
+from datetime import date
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app.api.responses import FastJSONResponse
+from app.crud.book import book_from_row
+from app.crud.user import user_from_row
+from app.models import BookOut, BooksOut, UsersOut
+
+ROW = (1, "Dune", "Frank Herbert", None, None, "Sci-fi", Decimal("4.50"), None, None, date(1965, 8, 1), None)
+
+
+def test_book_from_row_matches_validated_model():
+    """ Test the unvalidated book built from a row equals the validated one """
+    book = book_from_row(ROW)
+
+    assert book == BookOut(
+        id_book=1, title="Dune", authors="Frank Herbert", genres="Sci-fi", rating=4.5, publication_date="1965-08-01"
+    )
+    assert isinstance(book.rating, float)
+
+def test_fast_response_matches_default_encoding():
+    """ Test the orjson response encodes the listings like FastAPI does """
+    books = BooksOut(data=[book_from_row(ROW)], count=1)
+    users = UsersOut(data=[user_from_row((3, "Ana", None, "ana", "ana@test"))], count=None)
+
+    for content in (books, users, [book_from_row(ROW)]):
+        assert json.loads(FastJSONResponse(content).body) == jsonable_encoder(content)
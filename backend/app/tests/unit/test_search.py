@@ -0,0 +1,92 @@
+""" Tests the in-process book search index """
+from unittest.mock import MagicMock
+
+from app.core.search import BookSearchIndex, normalize
+
+
+def build_index(rating_weight: float = 0.0) -> BookSearchIndex:
+    """ Builds an index over a small catalog """
+    db = MagicMock()
+    db.fetchall.return_value = [
+        (1, "La ciutat i els gossos", "Mario Vargas Llosa", "Seix Barral", "Lima", 4.0),
+        (2, "Cien años de soledad", "Gabriel García Márquez", "Sudamericana", "Macondo", 5.0),
+        (3, "El amor en los tiempos del cólera", "Gabriel García Márquez", None, None, 3.0),
+        (4, "Cançó de Nadal", "Charles Dickens", None, "Una història de Nadal", 2.0),
+    ]
+    index = BookSearchIndex(ttl=60, rating_weight=rating_weight)
+    index.build(cursor=db)
+    return index
+
+def test_normalize():
+    """ Test accents and case are folded """
+    assert normalize("Cançó ÀÉÏ") == "canco aei"
+
+def test_search_every_word():
+    """ Test only the books containing every word are returned """
+    ids, count = build_index().search("garcia soledad")
+
+    assert ids == [2]
+    assert count == 1
+
+def test_search_prefix_and_accents():
+    """ Test the last word matches as a prefix, ignoring accents """
+    ids, _ = build_index().search("canco de nad")
+
+    assert ids == [4]
+
+def test_search_ranks_title_first():
+    """ Test a match in the title ranks above a match in the synopsis """
+    index = build_index()
+    index.add_book(5, title="Contes d'hivern", authors="Anon", synopsis="Nadal", rating=5.0)
+
+    ids, _ = index.search("nadal")
+
+    assert ids == [4, 5]
+
+def test_search_blends_rating():
+    """ Test the rating breaks ties between equally relevant books """
+    ids, _ = build_index(rating_weight=0.5).search("marquez")
+
+    assert ids == [2, 3]
+
+def test_search_pagination():
+    """ Test results can be paginated """
+    index = build_index(rating_weight=0.5)
+
+    assert index.search("marquez", skip=1, limit=1) == ([3], 2)
+
+def test_index_updates():
+    """ Test created and deleted books are reflected without rebuilding """
+    index = build_index()
+
+    index.add_book(5, title="Soledad", authors="Anon", rating=1.0)
+    assert index.search("soledad")[1] == 2
+
+    index.remove_book(2)
+    assert index.search("soledad") == ([5], 1)
+
+def test_updates_during_a_rebuild_are_kept():
+    """ Test a book added while the catalog is read is in the rebuilt index """
+    index = build_index()
+    db = MagicMock()
+    # The book is committed after the rebuild read the catalog
+    db.fetchall.side_effect = lambda: index.add_book(5, title="Soledad", authors="Anon") or [
+        (2, "Cien años de soledad", "Gabriel García Márquez", "Sudamericana", "Macondo", 5.0),
+    ]
+
+    index.build(cursor=db)
+
+    assert index.search("soledad") == ([2, 5], 2)
+
+def test_invalidate_rebuilds_lazily_without_refresh():
+    """ Test an invalidated index is rebuilt on the next search when no background refresh runs """
+    index = build_index()
+    db = MagicMock()
+    db.fetchall.return_value = [(7, "Soledad", None, None, None, 1.0)]
+
+    index.ensure_built(cursor=db)
+    db.execute.assert_not_called()
+
+    index.invalidate()
+    index.ensure_built(cursor=db)
+    assert index.search("soledad") == ([7], 1)
@@ -0,0 +1,104 @@
+""" Tests the coalescing of identical concurrent calls """
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.singleflight import SingleFlight, coalesced
+from app.core.versions import TagVersions
+
+
+def test_concurrent_calls_share_one_execution():
+    """ Test the callers arriving while a call runs get its result """
+    group = SingleFlight(timeout=5)
+    release = threading.Event()
+    function = MagicMock(side_effect=lambda: release.wait() and "books")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(group.do, "page", function) for _ in range(4)]
+        while group.stats()["calls"] < 4:
+            threading.Event().wait(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["books"] * 4
+    assert function.call_count == 1
+    assert group.stats() == {
+        "enabled": True, "in_flight": 0, "calls": 4, "executions": 1, "coalesced": 3, "timeouts": 0
+    }
+
+def test_waiting_callers_get_the_error():
+    """ Test an error of the call in flight is raised to every caller waiting for it """
+    group = SingleFlight(timeout=5)
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait()
+        raise ValueError("Invalid cursor")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(group.do, "page", failing)
+        started.wait()
+        follower = executor.submit(group.do, "page", MagicMock())
+        while group.stats()["calls"] < 2:
+            threading.Event().wait(0.001)
+        release.set()
+
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+def test_waiting_is_bounded_by_the_timeout():
+    """ Test a caller runs the function itself once the call in flight takes too long """
+    group = SingleFlight(timeout=0.01)
+    release = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(group.do, "page", lambda: release.wait() and "slow")
+        while not group.stats()["in_flight"]:
+            threading.Event().wait(0.001)
+
+        assert group.do("page", lambda: "fast") == "fast"
+        release.set()
+        assert leader.result() == "slow"
+    assert group.stats()["timeouts"] == 1
+
+def test_coalesced_keys_ignore_the_cursor():
+    """ Test the key of a CRUD call is made of its arguments but the cursor, defaults included """
+    group = MagicMock()
+    read = coalesced(group)(lambda *, cursor, genres, limit=100: None)
+
+    read(cursor=MagicMock(), genres=["Fantasy"])
+    read(cursor=MagicMock(), genres=["Fantasy"], limit=100)
+
+    first, second = (call.args[0] for call in group.do.call_args_list)
+    assert first == second
+    assert hash(first)
+
+def test_coalesced_calls_do_not_join_flights_older_than_a_write():
+    """ Test a call made after its tags were invalidated starts its own flight """
+    group = SingleFlight(timeout=5)
+    versions = TagVersions(period=0)
+    release = threading.Event()
+    reads = []
+
+    @coalesced(group, versions=versions, tags=("books",))
+    def list_books(*, cursor, skip: int):
+        reads.append(cursor)
+        if cursor == "first":
+            release.wait()
+        return len(reads)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        before = executor.submit(list_books, cursor="first", skip=0)
+        while group.stats()["in_flight"] < 1:
+            threading.Event().wait(0.001)
+        # A write commits while the first read is in flight
+        versions.bump(["books"])
+        after = list_books(cursor="second", skip=0)
+        release.set()
+
+    assert reads == ["first", "second"]
+    assert (before.result(), after) == (2, 2)
@@ -0,0 +1,76 @@
+""" Tests the in-memory autocomplete indexes """
+from unittest.mock import MagicMock
+
+from app.core.typeahead import PrefixIndex, word_suffixes
+
+
+def build_index() -> PrefixIndex:
+    """ Builds an index over a small catalog """
+    db = MagicMock()
+    db.fetchall.return_value = [
+        (1, 4.0, "Cien años de soledad", "Gabriel García Márquez"),
+        (2, 5.0, "El amor en los tiempos del cólera", "Gabriel García Márquez"),
+        (3, 3.0, "Cançó de Nadal", "Charles Dickens"),
+    ]
+    index = PrefixIndex(query="SELECT", ttl=60)
+    index.build(cursor=db)
+    return index
+
+def test_word_suffixes():
+    """ Test a text is indexed from each of its words """
+    assert word_suffixes("Cançó de Nadal") == {"canco de nadal", "de nadal", "nadal"}
+
+def test_complete_best_score_first():
+    """ Test matches are ranked by score """
+    assert build_index().complete("gab") == [2, 1]
+
+def test_complete_folds_accents_and_case():
+    """ Test accents and case are ignored in both the prefix and the texts """
+    assert build_index().complete("CANÇO") == [3]
+    assert build_index().complete("marquez") == [2, 1]
+
+def test_complete_inner_words():
+    """ Test consecutive words in the middle of a title are found """
+    assert build_index().complete("anos de sol") == [1]
+
+def test_complete_limit():
+    """ Test the number of completions is bounded """
+    assert build_index().complete("g", limit=1) == [2]
+
+def test_index_updates():
+    """ Test writes are reflected in the completions """
+    index = build_index()
+    assert index.complete("g") == [2, 1]
+
+    index.add(4, ["Gent de Barcelona", None], 4.5)
+    index.set_score(1, 5.5)
+    assert index.complete("g") == [1, 2, 4]
+
+    index.remove(1)
+    assert index.complete("g") == [2, 4]
+
+def test_updates_during_a_rebuild_are_kept():
+    """ Test an item added while the items are read is in the rebuilt index """
+    index = build_index()
+    db = MagicMock()
+    # The item is committed after the rebuild read the table
+    db.fetchall.side_effect = lambda: index.add(4, ["Gent de Barcelona"], 4.5) or [
+        (1, 4.0, "Cien años de soledad", "Gabriel García Márquez"),
+    ]
+
+    index.build(cursor=db)
+
+    assert index.complete("g") == [4, 1]
+
+def test_invalidate_rebuilds_lazily_without_refresh():
+    """ Test an invalidated index is rebuilt on next use when no background refresh runs """
+    index = build_index()
+    db = MagicMock()
+    db.fetchall.return_value = [(7, 1.0, "Gent de Barcelona", None)]
+
+    index.ensure_built(cursor=db)
+    db.execute.assert_not_called()
+
+    index.invalidate()
+    index.ensure_built(cursor=db)
+    assert index.complete("g") == [7]
@@ -0,0 +1,87 @@
+""" Tests the profile statistics of a user """
+import asyncio
+from unittest.mock import MagicMock
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.deps import get_db
+from app.api.routes import users
+from app.crud.stats import get_user_stats, invalidate_user_stats, user_stats_cache
+from app.models import MyBookCreate
+from app import crud
+
+ROWS = [
+    ("stars", None, 5, 2),
+    ("stars", None, 2, 1),
+    ("stars", None, 4, 1),
+    ("rated", "Fantasy", 5, 2),
+    ("rated", "Fantasy", 2, 1),
+    ("rated", "Horror", 4, 1),
+    ("read", "Fantasy", None, 3),
+    ("read", "Romance", None, 1),
+    ("saved", "Horror", None, 2),
+]
+
+
+def test_get_user_stats():
+    """ Test the grouped rows are turned into the profile statistics """
+    user_stats_cache.clear()
+    db = MagicMock()
+    db.fetchall.return_value = ROWS
+
+    stats = get_user_stats(cursor=db, user_id=1)
+
+    assert stats.rating_count == 4
+    assert stats.rating_distribution == {1: 0, 2: 1, 3: 0, 4: 1, 5: 2}
+    assert [(item.genre, item.count, item.average_rating) for item in stats.rated_genres] == [
+        ("Fantasy", 3, 4.0),
+        ("Horror", 1, 4.0),
+    ]
+    assert [(item.genre, item.count) for item in stats.read_genres] == [("Fantasy", 3), ("Romance", 1)]
+    assert [(item.genre, item.count) for item in stats.saved_genres] == [("Horror", 2)]
+    db.execute.assert_called_once()
+
+def test_user_stats_are_cached_until_a_shelf_changes():
+    """ Test the statistics are computed once and again after the user saves a book """
+    user_stats_cache.clear()
+    db = MagicMock()
+    db.fetchall.return_value = ROWS
+
+    get_user_stats(cursor=db, user_id=2)
+    get_user_stats(cursor=db, user_id=2)
+    assert db.execute.call_count == 1
+
+    crud.mybooks.create_mybook(cursor=MagicMock(), mybook_in=MyBookCreate(id_user=2, id_book=7))
+    get_user_stats(cursor=db, user_id=2)
+    assert db.execute.call_count == 2
+
+    invalidate_user_stats(2)
+    get_user_stats(cursor=db, user_id=2)
+    assert db.execute.call_count == 3
+
+def test_books_without_genres_only_count_in_the_distribution():
+    """ Test ratings of books without genres are counted without adding a genre """
+    user_stats_cache.clear()
+    db = MagicMock()
+    db.fetchall.return_value = [("stars", None, 3, 2), ("rated", "Horror", 3, 1)]
+
+    stats = get_user_stats(cursor=db, user_id=3)
+
+    assert stats.rating_count == 2
+    assert [(item.genre, item.count) for item in stats.rated_genres] == [("Horror", 1)]
+
+def test_stats_of_unknown_user():
+    """ Test the statistics of a user that does not exist are a 404 """
+    session = MagicMock()
+    session.cursor.return_value.fetchone.return_value = None
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    app.dependency_overrides[get_db] = lambda: session
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/users/404/stats")
+
+    assert asyncio.run(scenario()).status_code == 404
@@ -5,11 +5,22 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any
 
-import emails  # type: ignore
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from jose import JWTError, jwt
 
 from app.core.config import settings
+from app.core.outbox import email_outbox
+
+
+EMAIL_TEMPLATES_DIR = Path(__file__).parent / "email-templates" / "build"
+
+# Templates are compiled once and kept in memory, their bytecode is also cached on disk so
+# that other processes and restarts skip the compilation. Locally, edited templates are reloaded.
+email_templates = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATES_DIR),
+    bytecode_cache=FileSystemBytecodeCache(settings.EMAIL_TEMPLATES_CACHE_DIR),
+    auto_reload=settings.ENVIRONMENT == "local",
+)
 
 
 @dataclass
@@ -32,11 +43,37 @@ def render_email_template(*, template_name: str, context: dict[str, Any]) -> str
     Returns:
         str: The rendered HTML content of the email.
     """
-    template_str = (
-        Path(__file__).parent / "email-templates" / "build" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
-    return html_content
+    return email_templates.get_template(template_name).render(context)
+
+
+def render_email_templates(*, template_name: str, contexts: list[dict[str, Any]]) -> list[str]:
+    """
+    Renders an email template once per context, e.g. for a campaign to many users.
+
+    Args:
+        template_name (str): The name of the template to render.
+        contexts (list[dict]): The context of each email.
+
+    Returns:
+        list[str]: The rendered HTML content of each email, in the order of the contexts.
+    """
+    template = email_templates.get_template(template_name)
+    return [template.render(context) for context in contexts]
+
+
+def compile_email_templates() -> int:
+    """
+    Compiles every built email template, so that the first emails do not pay for it.
+
+    Returns:
+        int: The number of templates compiled.
+    """
+    template_names = email_templates.list_templates(extensions=["html"])
+    if not template_names:
+        logging.warning("No email templates in %s, build them from src", EMAIL_TEMPLATES_DIR)
+    for template_name in template_names:
+        email_templates.get_template(template_name)
+    return len(template_names)
 
 
 def send_email(
@@ -46,7 +83,7 @@ def send_email(
     html_content: str = "",
 ) -> None:
     """
-    Sends an email with the specified content.
+    Queues an email with the specified content, to be sent in the background by the outbox.
 
     Args:
         email_to (str): The recipient's email address.
@@ -57,22 +94,8 @@ def send_email(
         AssertionError: If email sending is not enabled in settings.
     """
     assert settings.emails_enabled, "no provided configuration for email variables"
-    message = emails.Message(
-        subject=subject,
-        html=html_content,
-        mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL),
-    )
-    smtp_options = {"host": settings.SMTP_HOST, "port": settings.SMTP_PORT}
-    if settings.SMTP_TLS:
-        smtp_options["tls"] = True
-    elif settings.SMTP_SSL:
-        smtp_options["ssl"] = True
-    if settings.SMTP_USER:
-        smtp_options["user"] = settings.SMTP_USER
-    if settings.SMTP_PASSWORD:
-        smtp_options["password"] = settings.SMTP_PASSWORD
-    response = message.send(to=email_to, smtp=smtp_options)
-    logging.info("Send email result: %s", response)
+    message_id = email_outbox.enqueue(email_to=email_to, subject=subject, html_content=html_content)
+    logging.info("Queued email %s to %s", message_id, email_to)
 
 
 def generate_test_email(email_to: str) -> EmailData:
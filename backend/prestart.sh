@@ -6,5 +6,8 @@ python /app/app/backend_pre_start.py
 # Run migrations
 alembic upgrade head
 
+# Run the migrations of the MySQL schema
+python -m app.migrate_db
+
 # Create initial data in DB
 python /app/app/initial_data.py
@@ -29,7 +29,7 @@ class BookService {
       }
     }
 
-    const path = '/api/v1/books/' + keyword
+    const path = '/api/v1/books/complete/' + keyword
 
     return http.get(path, config)
       .then((res) => {
@@ -112,10 +112,14 @@ class BookService {
         return Promise.reject(error)
       })
   }
-  readMyBooks (idUser) {
+  readMyBooks (idUser, skip = 0, limit = 100) {
     const config = {
       headers: {
         'accept': 'application/json'
+      },
+      params: {
+        skip: skip,
+        limit: limit
       }
     }
 
@@ -129,10 +133,14 @@ class BookService {
         return Promise.reject(error)
       })
   }
-  myReadBooks (idUser) {
+  myReadBooks (idUser, skip = 0, limit = 100) {
     const config = {
       headers: {
         'accept': 'application/json'
+      },
+      params: {
+        skip: skip,
+        limit: limit
       }
     }
 
@@ -146,6 +154,43 @@ class BookService {
         return Promise.reject(error)
       })
   }
+  // Reads every page of a shelf, the shelves are returned 'limit' books at a time
+  readAllPages (readPage, limit = 100) {
+    const books = []
+    const readFrom = (skip) => readPage(skip, limit)
+      .then((res) => {
+        books.push(...res.data.data)
+        if (res.data.data.length < limit || books.length >= res.data.count) {
+          return books
+        }
+        return readFrom(skip + limit)
+      })
+
+    return readFrom(0)
+  }
+  readAllMyBooks (idUser) {
+    return this.readAllPages((skip, limit) => this.readMyBooks(idUser, skip, limit))
+  }
+  readAllReadBooks (idUser) {
+    return this.readAllPages((skip, limit) => this.myReadBooks(idUser, skip, limit))
+  }
+  isInReadBooks (idUser, idBook) {
+    const config = {
+      headers: {
+        'accept': 'application/json'
+      }
+    }
+
+    const path = `/api/v1/readbooks/${idUser}/${idBook}`
+
+    return http.get(path, config)
+      .then((res) => {
+        return res
+      })
+      .catch((error) => {
+        return Promise.reject(error)
+      })
+  }
   deleteComment (commentId) {
     const config = {
       headers: {